@@ -6,47 +6,69 @@ import unicodedata
 import logging
 from typing import List
 
-import fitz  # PyMuPDF
-from google.oauth2.credentials import Credentials
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
 from tinydb import Query, TinyDB
 from pydantic import ValidationError
 
-from drive.authenticate import TOKEN_FILE
 from ai_prompts import GroqClient
+from prompt_templates import PromptTemplate, register
+from profiler import stage, start_profiling, stop_profiling
 from models.opening import Opening
 
 # ---------- CONFIGURAÇÃO DE LOGGING ----------
-# Configura um logger para registrar informações e erros em um arquivo.
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(levelname)s - %(message)s',
-    filename='processing.log',
-    filemode='w'
-)
-# Adiciona um handler para também exibir os logs no console.
-console_handler = logging.StreamHandler()
-console_handler.setLevel(logging.INFO)
-formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
-console_handler.setFormatter(formatter)
-logging.getLogger().addHandler(console_handler)
+def configure_logging():
+    """Registra os logs em processing.log e no console (só ao executar o script)."""
+    # Configura um logger para registrar informações e erros em um arquivo.
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(levelname)s - %(message)s',
+        filename='processing.log',
+        filemode='w'
+    )
+    # Adiciona um handler para também exibir os logs no console.
+    console_handler = logging.StreamHandler()
+    console_handler.setLevel(logging.INFO)
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    console_handler.setFormatter(formatter)
+    logging.getLogger().addHandler(console_handler)
 
 
 # ---------- CONFIGURAÇÃO ----------
-config = configparser.ConfigParser()
-config.read('config.ini')
-OPENINGS_FOLDER_ID = config['GOOGLE_DRIVE']['OPENINGS_FOLDER_ID']
-
 SCOPES = ["https://www.googleapis.com/auth/drive.readonly"]
-creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
-service = build("drive", "v3", credentials=creds)
-
 DB_FILE = "openings_db.json"
-db_openings = TinyDB(DB_FILE, indent=2, ensure_ascii=False)
-openings_table = db_openings.table('openings')
 
-groq = GroqClient()
+# Configuração, credenciais, serviço do Drive, banco e cliente da IA são
+# criados no primeiro uso: importar o módulo não exige credenciais.
+_service = None
+_openings_table = None
+_groq = None
+
+def get_openings_folder_id() -> str:
+    config = configparser.ConfigParser()
+    config.read('config.ini')
+    return config['GOOGLE_DRIVE']['OPENINGS_FOLDER_ID']
+
+def get_service():
+    global _service
+    if _service is None:
+        from google.oauth2.credentials import Credentials
+        from googleapiclient.discovery import build
+        from drive.authenticate import TOKEN_FILE
+        creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
+        _service = build("drive", "v3", credentials=creds)
+    return _service
+
+def get_openings_table():
+    global _openings_table
+    if _openings_table is None:
+        db_openings = TinyDB(DB_FILE, indent=2, ensure_ascii=False)
+        _openings_table = db_openings.table('openings')
+    return _openings_table
+
+def get_groq() -> GroqClient:
+    global _groq
+    if _groq is None:
+        _groq = GroqClient()
+    return _groq
 
 # ---------- FUNÇÕES DE LEITURA ----------
 
@@ -55,8 +77,9 @@ def read_drive_file(file_id: str, file_name: str) -> str:
     Baixa o conteúdo de um arquivo do Google Drive e tenta decodificá-lo
     com uma lista de encodings comuns.
     """
+    from googleapiclient.http import MediaIoBaseDownload
     fh = io.BytesIO()
-    downloader = MediaIoBaseDownload(fh, service.files().get_media(fileId=file_id))
+    downloader = MediaIoBaseDownload(fh, get_service().files().get_media(fileId=file_id))
     done = False
     while not done:
         _, done = downloader.next_chunk()
@@ -64,6 +87,7 @@ def read_drive_file(file_id: str, file_name: str) -> str:
 
     if file_name.endswith(".pdf"):
         try:
+            import fitz  # PyMuPDF
             doc = fitz.open(stream=fh.read(), filetype="pdf")
             return "\n".join(page.get_text() for page in doc)
         except Exception as e:
@@ -86,7 +110,7 @@ def read_drive_file(file_id: str, file_name: str) -> str:
 
 
 def list_drive_folder(folder_id: str):
-    results = service.files().list(
+    results = get_service().files().list(
         q=f"'{folder_id}' in parents and trashed=false",
         fields="files(id, name, mimeType)"
     ).execute()
@@ -121,24 +145,21 @@ def safe_json_parse(raw_text: str) -> dict:
         logging.error(f"Erro de decodificação JSON: {e}\nTexto recebido: {json_str}")
         return {}
 
-def build_prompt(folder_name: str, file_name: str, text: str, add_infos: str) -> str:
-    # O prompt permanece o mesmo, pois sua estrutura já é bem definida.
-    return f"""
+# Instruções fixas primeiro e os dados do arquivo no fim: o prefixo longo
+# é o mesmo em todas as vagas e pode ser servido do cache de prompt do provedor
+OPENING_TEMPLATE = register(PromptTemplate(
+    "opening",
+    static="""
         **Sua única função é extrair dados e retornar um único e válido objeto JSON.**
         Você receberá o conteúdo de arquivos sobre uma vaga de emprego. Analise os dados de entrada e preencha a estrutura JSON.
         **NUNCA, em nenhuma circunstância, retorne código Python, explicações, comentários ou qualquer texto que não seja o JSON final.**
         A estrutura do JSON de saída deve ser **exatamente** esta:
-        {{
+        {
             "id": 0, "title": "", "intro": "", "main_activities": "", "add_infos": "", "pre_requisites": "",
             "soft_skills": ["Exemplo: Comunicacao", "Exemplo: Trabalho em Equipe"],
             "hard_skills": ["Exemplo: C#", "Exemplo: .NET", "Exemplo: SQL"],
             "local": "", "disponibilidade": "", "folder": ""
-        }}
-        ### Dados de Entrada para Análise:
-        - Nome do Arquivo: {file_name}
-        - Conteúdo Principal (do PDF/TXT): {text}
-        - Informações Adicionais (do TXT): {add_infos}
-        - Nome da Pasta: {folder_name}
+        }
         ### Regras de Preenchimento:
         1. **id e title**: Extraia diretamente do "Nome do Arquivo".
         2. **intro ("Descrição Sumária"), main_activities ("Descrição das atividades"), pre_requisites ("Requisitos" "Formação" "Desejável"), soft_skills ("Competências Comportamentais"), hard_skills ("Competências Técnicas")**: Extraia do "Conteúdo Principal" de maneira integral - Descrição de Cargo.
@@ -146,18 +167,31 @@ def build_prompt(folder_name: str, file_name: str, text: str, add_infos: str) ->
         4. **folder**: Use o "Nome da Pasta" fornecido.
         5. **Valores Padrão**: Se "add_infos" estiver vazio, use `local: "Juiz de Fora - MG"` e `disponibilidade: "Híbrido"`.
         6. **Formato**: Se não encontrar informação, use `""` para strings ou `[]` para listas.
-        **Lembre-se: Sua resposta deve ser APENAS o objeto JSON, começando com `{{` e terminando com `}}`.**
+""",
+    variable="""        ### Dados de Entrada para Análise:
+        - Nome do Arquivo: $file_name
+        - Conteúdo Principal (do PDF/TXT): $text
+        - Informações Adicionais (do TXT): $add_infos
+        - Nome da Pasta: $folder_name
+        **Lembre-se: Sua resposta deve ser APENAS o objeto JSON, começando com `{` e terminando com `}`.**
     """
+))
+
+def build_prompt(folder_name: str, file_name: str, text: str, add_infos: str) -> str:
+    return OPENING_TEMPLATE.render(folder_name=folder_name, file_name=file_name, text=text, add_infos=add_infos)
 
 def extract_opening_data_with_groq(folder_name: str, file_name: str, text: str, add_infos: str) -> dict:
     logging.info("Enviando dados para a IA para extração...")
     prompt = build_prompt(folder_name, file_name, text, add_infos)
     result = {}
     for i in range(5): # Tenta até 5 vezes
-        raw_response = groq.generate_response(prompt)
-        result = safe_json_parse(raw_response)
+        with stage("llm"):
+            raw_response = get_groq().generate_response(prompt, prompt_version=OPENING_TEMPLATE.version)
+        with stage("parse"):
+            result = safe_json_parse(raw_response)
         if "title" in result and result.get("title"): # Verifica se um campo essencial foi preenchido
             logging.info(f"IA retornou um JSON válido na tentativa {i + 1}.")
+            result["prompt_version"] = OPENING_TEMPLATE.version
             return result
         logging.warning(f"Tentativa {i + 1} de extração com IA falhou ou retornou JSON inválido.")
     return result
@@ -171,13 +205,15 @@ def process_opening_file(sector_name: str, file_name: str, file_id: str, file_di
         logging.info(f"Arquivo '{file_name}' não é um arquivo principal de vaga. Pulando.")
         return None
 
-    text = read_drive_file(file_id, file_name)
+    with stage("drive_read", file_name):
+        text = read_drive_file(file_id, file_name)
     if not text:
         logging.warning(f"Nenhum texto extraído do arquivo {file_name}. Pulando.")
         return None
 
     # Normaliza o texto antes de enviar para a IA
-    text = remove_accents_and_special_chars(text)
+    with stage("normalize", file_name):
+        text = remove_accents_and_special_chars(text)
 
     file_id_prefix = file_name.split("_")[0]
     add_infos_name = file_id_prefix + "_add_infos.txt"
@@ -185,13 +221,16 @@ def process_opening_file(sector_name: str, file_name: str, file_id: str, file_di
     if add_infos_name in file_dict:
         logging.info(f"Encontrado arquivo de informações adicionais: {add_infos_name}")
         add_infos_id = file_dict[add_infos_name]
-        add_infos_text = read_drive_file(add_infos_id, add_infos_name)
-        add_infos_text = remove_accents_and_special_chars(add_infos_text)
+        with stage("drive_read", add_infos_name):
+            add_infos_text = read_drive_file(add_infos_id, add_infos_name)
+        with stage("normalize", add_infos_name):
+            add_infos_text = remove_accents_and_special_chars(add_infos_text)
     else:
         logging.info(f"Nenhum arquivo de informações adicionais encontrado para '{file_name}'.")
 
     # Extrai os dados usando a IA
-    extracted_data = extract_opening_data_with_groq(sector_name, file_name, text, add_infos_text)
+    with stage("ai_extract", file_name):
+        extracted_data = extract_opening_data_with_groq(sector_name, file_name, text, add_infos_text)
 
     # Adiciona o nome da pasta e preenche valores padrão se necessário
     extracted_data["folder"] = sector_name
@@ -212,7 +251,8 @@ def process_opening_file(sector_name: str, file_name: str, file_id: str, file_di
         logging.info(f"Validação Pydantic bem-sucedida para a vaga '{opening.title}'.")
         
         # Salva no banco de dados
-        openings_table.upsert(opening.model_dump(), Query().id == opening.id)
+        with stage("save", file_name):
+            get_openings_table().upsert(opening.model_dump(), Query().id == opening.id)
         logging.info(f"SUCESSO: Vaga '{opening.title}' (ID: {opening.id}) processada e salva.")
         return opening
     except ValidationError as e:
@@ -225,13 +265,13 @@ def process_opening_file(sector_name: str, file_name: str, file_id: str, file_di
 
 def clear_openings_table():
     logging.info("Limpando a tabela de vagas ('openings') no openings_db.json...")
-    openings_table.truncate()
+    get_openings_table().truncate()
     logging.info("Tabela 'openings' limpa.")
 
 def read_openings_from_drive() -> List[Opening]:
     openings_list = []
     logging.info("Iniciando varredura de vagas no Google Drive...")
-    folders = list_drive_folder(OPENINGS_FOLDER_ID)
+    folders = list_drive_folder(get_openings_folder_id())
     for sector in folders:
         if sector["mimeType"] != "application/vnd.google-apps.folder":
             continue
@@ -248,9 +288,23 @@ def read_openings_from_drive() -> List[Opening]:
 
 # ---------- EXECUÇÃO ----------
 if __name__ == "__main__":
-    clear_openings_table()
-    lista_de_vagas = read_openings_from_drive()
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Lê as vagas do Google Drive, extrai os dados com a IA e grava em openings_db.json.")
+    parser.add_argument("--profile", action="store_true", help="Perfil de CPU e memória por estágio e tipo de arquivo; grava profiles/add_openings-<data>/.")
+    parser.add_argument("--profile-top", type=int, default=20, metavar="N", help="Linhas de cada lista de pontos quentes no resumo do --profile (padrão: 20).")
+    args = parser.parse_args()
+    configure_logging()
+    if args.profile:
+        start_profiling("add_openings", top_n=args.profile_top)
+    try:
+        clear_openings_table()
+        lista_de_vagas = read_openings_from_drive()
+    finally:
+        if args.profile:
+            stop_profiling()
     logging.info("=======================================================")
     logging.info("===== PROCESSO DE EXTRAÇÃO DE VAGAS FINALIZADO =====")
     logging.info(f"    Total de vagas salvas com sucesso: {len(lista_de_vagas)}")
+    logging.info(f"    Cache de prompt do provedor: {get_groq().prompt_cache.metrics()}")
     logging.info("=======================================================")
\ No newline at end of file
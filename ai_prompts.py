@@ -3,12 +3,11 @@ import re
 import json
 import unicodedata
 import random
-from typing import Optional, Dict, Any
-from dotenv import load_dotenv
-from langchain_groq import ChatGroq
+import threading
+from typing import Optional, Dict, Any, Tuple
 import logging
-
-load_dotenv()
+from prompt_templates import PromptTemplate, PromptCacheStats, register
+from profiler import stage
 
 # Configuração de logging
 logger = logging.getLogger(__name__)
@@ -68,83 +67,48 @@ def normalize_text(text: str) -> str:
     
     return text.strip()
 
-# ------------------ CLIENTE GROQ COMPATÍVEL -----------------
-class GroqClient:
-    def __init__(self, model_id: str ='openai/gpt-oss-20b') -> None: # Linha alterada
-        self.client = ChatGroq(
-            model=model_id,
-            max_tokens=6000,
-            temperature=0.1
-        )
-        self.last_request_time = 0
-        self.min_interval = 10.0
-        self.request_count = 0
-        
-        # Cache para análises completas
-        self._full_analysis_cache = {}
-
-    def _wait_for_rate_limit(self):
-        current_time = time.time()
-        elapsed = current_time - self.last_request_time
-        
-        dynamic_interval = self.min_interval + (self.request_count * 0.1)
-        
-        if elapsed < dynamic_interval:
-            sleep_time = dynamic_interval - elapsed
-            logger.info(f"Intervalo mínimo não atingido. Aguardando {sleep_time:.2f}s...")
-            time.sleep(sleep_time)
-        
-        self.last_request_time = time.time()
-        self.request_count += 1
-
-    def generate_response(self, prompt: str, max_retries: int = 5) -> str:
-        base_wait_time = 2
-        for attempt in range(max_retries):
-            try:
-                self._wait_for_rate_limit()
-
-                response = self.client.invoke(prompt)
-                if hasattr(response, "content") and response.content:
-                    return response.content.strip()
-                    
-            except Exception as e:
-                error_msg = str(e).lower()
-                logger.warning(f"Erro na API (tentativa {attempt+1}/{max_retries}): {e}")
-                
-                # Checa se o erro é de rate limit
-                if any(keyword in error_msg for keyword in ["rate limit", "too many requests", "quota"]):
-                    wait_time = base_wait_time * (2 ** attempt) + random.uniform(0, 1)
-                    logger.info(f"Rate limit detectado. Tentativa {attempt+1}. Aguardando {wait_time:.2f}s...")
-                    time.sleep(wait_time)
-                elif "timeout" in error_msg:
-                    time.sleep(10)
-                else:
-                    time.sleep(5)
-                    
-        return ""
-
-    def _get_or_create_full_analysis(self, cv_text: str, opening_json: str) -> Optional[Dict[str, Any]]:
-        """
-        Gera análise completa uma única vez e cacheia o resultado
-        """
-        # Cria chave de cache
-        cache_key = hash(cv_text + opening_json)
-        
-        if cache_key in self._full_analysis_cache:
-            return self._full_analysis_cache[cache_key]
-        
-        # Limita tamanho dos inputs
-        cv_text = cv_text[:3500] if len(cv_text) > 3500 else cv_text
-        
-        # Parse da vaga
-        try:
-            opening_data = json.loads(opening_json)
-            # Adiciona o nível na descrição da vaga para a IA ter como referência
-            opening_text = f"Vaga: {opening_data.get('title', '')}\nNível exigido: {opening_data.get('nivel', 'não especificado')}\nDescrição: {opening_data.get('description', '')}"
-        except:
-            opening_text = opening_json[:1500]
-        
-        prompt = f"""
+# ------------------ FORMATOS DE SAÍDA DA ANÁLISE ------------------
+# Formato original: conclusão em markdown livre gerada pela IA
+_FULL_OUTPUT_FORMAT = """            {
+            "score": [número entre 0.0 e 10.0],
+            "total_experience_years": [número de anos],
+            "structured_data": {
+                "name": "[Nome completo]",
+                "formal_education": "[Formação principal]",
+                "hard_skills": ["[máx. 12 skills]"],
+                "soft_skills": ["[máx. 8 skills]"]
+            },
+            "conclusion": "## Pontos de Alinhamento\\n- [3-4 pontos específicos]\\n\\n## Pontos de Desalinhamento\\n- [2-3 pontos específicos]\\n\\n## Pontos de Atenção\\n- [2-3 observações importantes]"
+            } """
+
+# Formato compacto: chaves curtas, listas de tamanho limitado e a conclusão
+# montada localmente (render_conclusion). Gera bem menos tokens de saída.
+_COMPACT_OUTPUT_FORMAT = """            {"s": [nota entre 0.0 e 10.0], "y": [anos de experiência], "n": "[nome completo]", "e": "[formação principal]", "h": ["[máx. 12 hard skills]"], "k": ["[máx. 8 soft skills]"], "a": ["[3-4 pontos de alinhamento, máx. 12 palavras cada]"], "m": ["[2-3 pontos de desalinhamento, máx. 12 palavras cada]"], "t": ["[2-3 pontos de atenção, máx. 12 palavras cada]"]} """
+
+# Formato de fatos: a IA só extrai os fatos e a nota é calculada
+# localmente pela rubrica (rubric.score_facts), com pesos configuráveis
+_FACTS_OUTPUT_FORMAT = """            {"y": [anos de experiência profissional], "r": [0.0 a 1.0: relevância da experiência profissional para a vaga], "hm": ["[hard skills exigidas pela vaga presentes no CV]"], "hx": ["[hard skills exigidas pela vaga ausentes no CV]"], "ed": [0.0 a 1.0: relação da formação com a vaga], "d": ["[diferenciais: certificações, cursos, projetos extras]"], "n": "[nome completo]", "e": "[formação principal]", "h": ["[máx. 12 hard skills]"], "k": ["[máx. 8 soft skills]"], "a": ["[3-4 pontos de alinhamento, máx. 12 palavras cada]"], "m": ["[2-3 pontos de desalinhamento, máx. 12 palavras cada]"], "t": ["[2-3 pontos de atenção, máx. 12 palavras cada]"]} """
+
+# Pedido extra feito ao modelo rápido da cascata (cascade.Cascade): a
+# confiança decide se a nota provisória precisa do modelo grande
+_CONFIDENCE_INSTRUCTION = {
+    False: '            CONFIANÇA: inclua também no JSON a chave "confidence" (número entre 0.0 e 1.0) com a sua confiança na nota atribuída. ',
+    True: '            CONFIANÇA: inclua também no JSON a chave "c" (número entre 0.0 e 1.0) com a sua confiança na nota atribuída. ',
+}
+
+# Seções da conclusão e as chaves compactas que as alimentam
+CONCLUSION_SECTIONS = (
+    ("a", "Pontos de Alinhamento", 4),
+    ("m", "Pontos de Desalinhamento", 3),
+    ("t", "Pontos de Atenção", 3),
+)
+
+RESPONSE_MODES = ("full", "compact", "facts")
+
+# ------------------ MODELOS DE PROMPT ------------------
+# Ordem pensada para o cache de prompt do provedor: instruções e rubrica
+# (fixas) primeiro, depois a vaga e por último o CV.
+_ANALYSIS_INSTRUCTIONS = """
             SISTEMA: Você é um especialista em RH, rigoroso e justo, responsável por analisar currículos e atribuir notas de forma precisa, evitando dar notas muito semelhantes. A pontuação deve refletir principalmente o alinhamento do candidato à **senioridade exigida pela vaga**. 
 
             ATENÇÃO: 
@@ -154,24 +118,10 @@ class GroqClient:
 
             TAREFA: Compare o CV com a VAGA e retorne **APENAS JSON válido** (sem explicações, sem markdown, sem texto extra). 
 
-            CURRÍCULO: 
-            {cv_text} 
-
-            VAGA: 
-            {opening_text} 
-
             FORMATO DE SAÍDA: 
-            {{
-            "conclusion": "## Pontos de Alinhamento\\n- [3-4 pontos específicos]\\n\\n## Pontos de Desalinhamento\\n- [2-3 pontos específicos]\\n\\n## Pontos de Atenção\\n- [2-3 observações importantes]",
-            "score": [número entre 0.0 e 10.0],
-            "total_experience_years": [número de anos],
-            "structured_data": {{
-                "name": "[Nome completo]",
-                "formal_education": "[Formação principal]",
-                "hard_skills": ["[máx. 12 skills]"],
-                "soft_skills": ["[máx. 8 skills]"]
-            }}
-            }} 
+"""
+
+_ANALYSIS_CRITERIA = """
 
             ### CRITÉRIOS DE PONTUAÇÃO:
             - **Experiência Profissional Relevante (Peso 2.5):** + até 3.0 se relevante, - até 3.0 se irrelevante. 
@@ -226,14 +176,514 @@ class GroqClient:
             - Candidato ideal (alinhamento perfeito): 7.5–9.0 
             - Desalinhado acima/abaixo: 1.0–3.0 ou 4.0–6.0 conforme o caso. 
 
+"""
+
+_FACTS_INSTRUCTIONS = """
+            SISTEMA: Você é um especialista em RH, rigoroso e objetivo. Você NÃO atribui notas: apenas extrai fatos do currículo em relação à vaga.
+
+            TAREFA: Compare o CV com a VAGA e retorne **APENAS JSON válido** (sem explicações, sem markdown, sem texto extra). 
+
+            FORMATO DE SAÍDA: 
+""" + _FACTS_OUTPUT_FORMAT + """
+
+            ### REGRAS:
+            - "y": soma dos períodos de experiência profissional, em anos (sem contar sobreposições). 
+            - "hm"/"hx": somente hard skills exigidas ou desejadas pela vaga, separando as encontradas no CV das ausentes. 
+            - "r": 1.0 se a experiência é na mesma função da vaga, 0.5 se em área próxima, 0.0 se sem relação. 
+            - "ed": 1.0 se a formação é diretamente relacionada à vaga, 0.0 se não tem relação. 
+            - "d": apenas diferenciais concretos citados no CV. 
+
+"""
+
+_OPENING_CONTEXT = """
+            VAGA: 
+            $opening_text 
+"""
+
+_CV_INPUT = """
+            CURRÍCULO: 
+            $cv_text 
+
             RETORNE SOMENTE O JSON. 
         """
-        response = self.generate_response(prompt, max_retries=4)
+
+
+def _analysis_template(compact: bool, confidence: bool) -> PromptTemplate:
+    output_format = _COMPACT_OUTPUT_FORMAT if compact else _FULL_OUTPUT_FORMAT
+    if confidence:
+        output_format = f"{output_format}\n\n{_CONFIDENCE_INSTRUCTION[compact]}"
+    name = ("compact" if compact else "full") + ("-confidence" if confidence else "")
+    return register(PromptTemplate(name, _ANALYSIS_INSTRUCTIONS + output_format + "\n" + _ANALYSIS_CRITERIA, _OPENING_CONTEXT, _CV_INPUT))
+
+
+ANALYSIS_TEMPLATES = {(compact, confidence): _analysis_template(compact, confidence) for compact in (False, True) for confidence in (False, True)}
+FACTS_TEMPLATE = register(PromptTemplate("facts", _FACTS_INSTRUCTIONS, _OPENING_CONTEXT, _CV_INPUT))
+
+
+def _opening_text(opening_json: str) -> str:
+    try:
+        opening_data = json.loads(opening_json)
+        # Adiciona o nível na descrição da vaga para a IA ter como referência
+        return f"Vaga: {opening_data.get('title', '')}\nNível exigido: {opening_data.get('nivel', 'não especificado')}\nDescrição: {opening_data.get('description', '')}"
+    except:
+        return opening_json[:1500]
+
+
+def render_conclusion(points: Dict[str, Any]) -> str:
+    """Monta a conclusão em markdown (mesmo layout do formato original) a partir das listas de pontos."""
+    sections = []
+    for key, title, limit in CONCLUSION_SECTIONS:
+        items = [str(p).strip() for p in (points.get(key) or []) if str(p).strip()][:limit]
+        sections.append(f"## {title}\n" + "\n".join(f"- {item}" for item in items or ["Nenhum ponto informado."]))
+    return "\n\n".join(sections)
+
+
+def expand_compact_analysis(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Converte a resposta compacta no formato completo usado pelo restante do sistema."""
+    expanded = {
+        "score": data.get("s"),
+        "total_experience_years": data.get("y"),
+        "structured_data": {
+            "name": data.get("n"),
+            "formal_education": data.get("e"),
+            "hard_skills": (data.get("h") or [])[:12],
+            "soft_skills": (data.get("k") or [])[:8],
+        },
+        "conclusion": render_conclusion(data),
+    }
+    if "c" in data:
+        expanded["confidence"] = data["c"]
+    return expanded
+
+def expand_facts_analysis(data: Dict[str, Any], nivel: Optional[str]) -> Dict[str, Any]:
+    """Converte a resposta de fatos no formato completo, com a nota calculada pela rubrica local."""
+    from rubric import facts_from_response, score_one, rubric_version
+    expanded = expand_compact_analysis(data)
+    facts = facts_from_response(data)
+    expanded.update(score=score_one(facts, nivel), facts=facts, rubric_version=rubric_version())
+    return expanded
+
+# ------------------ CLIENTE GROQ COMPATÍVEL -----------------
+class GroqClient:
+    def __init__(self, model_id: str ='openai/gpt-oss-20b') -> None: # Linha alterada
+        self.model_id = model_id
+        # O ChatGroq (e o langchain) só são carregados na primeira chamada à API
+        self._client = None
+        self._client_lock = threading.Lock()
+        self.last_request_time = 0
+        self.min_interval = 10.0
+        self.request_count = 0
+        # Controle adaptativo de concorrência (concurrency.ConcurrencyController).
+        # Quando definido, substitui o intervalo fixo entre requisições.
+        self.limiter = None
+        # Requisições duplicadas para cortar a cauda de latência (hedging.HedgedInvoker)
+        self.hedger = None
+        # Streaming com validação incremental do JSON (json_stream.IncrementalJSONParser)
+        self.streaming = False
+        self._stream_stats = {
+            'streams': 0, 'completed': 0, 'aborted': 0,
+            'first_token_seconds': 0.0, 'first_field_seconds': 0.0, 'total_seconds': 0.0,
+            'aborted_seconds': 0.0, 'with_first_field': 0,
+        }
+        self._stream_stats_lock = threading.Lock()
+        # Formato da resposta da análise ('full', 'compact' ou 'facts') e max_tokens
+        # adaptativo por versão de prompt (token_budget.OutputTokenBudget)
+        self.response_mode = "full"
+        self.token_budget = None
+        # Acertos do cache de prompt do provedor por versão de modelo de prompt
+        self.prompt_cache = PromptCacheStats()
+        # Cascata de modelos: o rápido decide os casos claros, o grande só
+        # as notas na faixa de incerteza (cascade.Cascade)
+        self.cascade = None
+        self._fast_client = None
+        # Limite de gasto da execução (token_budget.RunBudget)
+        self.budget = None
         
+        # Cache para análises completas
+        self._full_analysis_cache = {}
+
+    @property
+    def client(self):
+        if self._client is None:
+            with self._client_lock:
+                if self._client is None:
+                    self._client = self._build_chat_model(self.model_id)
+        return self._client
+
+    def _build_chat_model(self, model_id: str, api_key: Optional[str] = None):
+        from dotenv import load_dotenv
+        from langchain_groq import ChatGroq
+        load_dotenv()
+        kwargs = {"api_key": api_key} if api_key else {}
+        if self.limiter is not None:
+            # Sem retentativas dentro do SDK: cada 429 ou timeout precisa sair do
+            # slot para o controle AIMD reduzir o limite; quem repete é generate_response
+            kwargs["max_retries"] = 0
+        return ChatGroq(
+            model=model_id,
+            max_tokens=6000,
+            temperature=0.1,
+            **kwargs
+        )
+
+    def chat_params(self, compact: Optional[bool] = None) -> Dict[str, Any]:
+        """Parâmetros da chamada de chat (os mesmos do ChatGroq), para requisições montadas à mão."""
+        max_tokens = 6000
+        if self.token_budget is not None:
+            max_tokens = self.token_budget.max_tokens(self.configured_prompt_version(compact))
+        return {"model": self.model_id, "max_tokens": max_tokens, "temperature": 0.1}
+
+    def _is_compact(self, compact: Optional[bool]) -> bool:
+        return self.response_mode == "compact" if compact is None else compact
+
+    def _uses_facts(self, compact: Optional[bool]) -> bool:
+        return compact is None and self.response_mode == "facts"
+
+    def configured_prompt_version(self, compact: Optional[bool] = None) -> str:
+        """Versão do prompt de análise no formato configurado em `response_mode` (ou forçado por `compact`)."""
+        return self.analysis_prompt_version(self._is_compact(compact), facts=self._uses_facts(compact))
+
+    @staticmethod
+    def analysis_prompt_version(compact: bool = False, confidence: bool = False, facts: bool = False) -> str:
+        """Versão do modelo do prompt de análise (muda quando o texto do prompt muda)."""
+        return (FACTS_TEMPLATE if facts else ANALYSIS_TEMPLATES[(compact, confidence)]).version
+
+    def build_analysis_prompt(self, cv_text: str, opening_json: str, compact: Optional[bool] = None) -> str:
+        """Prompt da análise no formato configurado em `response_mode` (ou forçado por `compact`)."""
+        if self._uses_facts(compact):
+            return self.build_facts_prompt(cv_text, opening_json)
+        return self.build_full_analysis_prompt(cv_text, opening_json, compact=self._is_compact(compact))
+
+    def enable_cascade(self, fast_model: str, band: Tuple[float, float], min_confidence: float, shadow: bool = False):
+        """
+        Ativa a cascata de dois níveis: `fast_model` dá uma nota provisória
+        com confiança e só as notas dentro de `band` (ou pouco confiantes)
+        são reavaliadas por `model_id`. Com `shadow`, os dois níveis rodam
+        sempre e as divergências vão para metrics/cascade_shadow.jsonl.
+        """
+        from cascade import Cascade
+        self.cascade = Cascade(fast_model, band=band, min_confidence=min_confidence, shadow=shadow)
+        self._fast_client = self._build_chat_model(fast_model)
+
+    def enable_hedging(self, percentile: float, budget: float, hedge_model: Optional[str] = None):
+        """
+        Ativa o envio de uma cópia das requisições lentas. A cópia usa
+        `hedge_model` (padrão: o mesmo modelo) e a chave GROQ_HEDGE_API_KEY,
+        se definida, para não consumir a cota da chave principal.
+        """
+        import os
+        from hedging import HedgedInvoker
+        primary = self.client
+        hedge_key = os.getenv("GROQ_HEDGE_API_KEY")
+        if hedge_model or hedge_key:
+            hedge = self._build_chat_model(hedge_model or self.model_id, hedge_key)
+        else:
+            hedge = primary
+        self.hedger = HedgedInvoker(primary, hedge, percentile=percentile, budget=budget)
+
+    def _wait_for_rate_limit(self):
+        current_time = time.time()
+        elapsed = current_time - self.last_request_time
+        
+        dynamic_interval = self.min_interval + (self.request_count * 0.1)
+        
+        if elapsed < dynamic_interval:
+            sleep_time = dynamic_interval - elapsed
+            logger.info(f"Intervalo mínimo não atingido. Aguardando {sleep_time:.2f}s...")
+            time.sleep(sleep_time)
+        
+        self.last_request_time = time.time()
+        self.request_count += 1
+
+    def _invoke(self, prompt: str, on_field=None, max_tokens: Optional[int] = None, chat_model=None, on_extra_call=None):
+        kwargs = {"max_tokens": max_tokens} if max_tokens else {}
+        if self.streaming:
+            return self._stream(prompt, on_field, chat_model, **kwargs)
+        if chat_model is not None:
+            return chat_model.invoke(prompt, **kwargs)
+        if self.hedger is not None:
+            # A cópia ocupa um slot e entra no orçamento como qualquer outra requisição
+            return self.hedger.invoke(
+                prompt, limiter=self.limiter, run_budget=self.budget, on_extra_call=on_extra_call, **kwargs
+            )
+        return self.client.invoke(prompt, **kwargs)
+
+    def _stream(self, prompt: str, on_field=None, chat_model=None, **kwargs):
+        """
+        Lê a resposta em streaming validando o JSON a cada token. Encerra o
+        stream assim que o objeto fecha ou deixa de poder ser válido (a
+        resposta abortada volta vazia e conta como uma nova tentativa).
+        """
+        from types import SimpleNamespace
+        from json_stream import IncrementalJSONParser, StreamAbort
+
+        started = time.monotonic()
+        timings = {}
+
+        def field_seen(key, value):
+            timings.setdefault('first_field', time.monotonic() - started)
+            if on_field is not None:
+                on_field(key, value)
+
+        parser = IncrementalJSONParser(field_seen)
+        stream = (chat_model or self.client).stream(prompt, **kwargs)
+        aborted = False
+        metadata, usage = {}, None
+        try:
+            for chunk in stream:
+                metadata.update(getattr(chunk, "response_metadata", None) or {})
+                usage = getattr(chunk, "usage_metadata", None) or usage
+                text = getattr(chunk, "content", None)
+                if not text:
+                    continue
+                timings.setdefault('first_token', time.monotonic() - started)
+                if parser.feed(text):
+                    break
+        except StreamAbort as e:
+            aborted = True
+            logger.warning(f"Resposta abortada após {time.monotonic() - started:.1f}s: {e}")
+        finally:
+            # Fechar o gerador encerra a conexão e a geração no provedor
+            stream.close()
+
+        elapsed = time.monotonic() - started
+        with self._stream_stats_lock:
+            stats = self._stream_stats
+            stats['streams'] += 1
+            stats['first_token_seconds'] += timings.get('first_token', elapsed)
+            if 'first_field' in timings:
+                stats['with_first_field'] += 1
+                stats['first_field_seconds'] += timings['first_field']
+            if aborted:
+                stats['aborted'] += 1
+                stats['aborted_seconds'] += elapsed
+            elif parser.done:
+                stats['completed'] += 1
+                stats['total_seconds'] += elapsed
+        return SimpleNamespace(content="" if aborted else parser.text(), response_metadata=metadata, usage_metadata=usage)
+
+    def stream_metrics(self) -> Dict[str, Any]:
+        """Médias do modo streaming: tempo até o 1º token, até o 1º campo e tempo gasto em respostas abortadas."""
+        with self._stream_stats_lock:
+            stats = dict(self._stream_stats)
+        streams = stats['streams'] or 1
+        return {
+            'streams': stats['streams'],
+            'completed': stats['completed'],
+            'aborted': stats['aborted'],
+            'avg_first_token_seconds': round(stats['first_token_seconds'] / streams, 3),
+            'avg_first_field_seconds': round(stats['first_field_seconds'] / (stats['with_first_field'] or 1), 3),
+            'avg_total_seconds': round(stats['total_seconds'] / (stats['completed'] or 1), 3),
+            'avg_aborted_seconds': round(stats['aborted_seconds'] / (stats['aborted'] or 1), 3),
+        }
+
+    def generate_response(
+        self,
+        prompt: str,
+        max_retries: int = 5,
+        on_field=None,
+        prompt_version: Optional[str] = None,
+        mode: str = "full",
+        chat_model=None
+    ) -> str:
+        """
+        Chama a IA com retentativas. Com `prompt_version` e um orçamento de
+        tokens configurado, o `max_tokens` acompanha a distribuição de saída
+        observada para aquela versão do prompt (e dobra se a resposta vier cortada).
+        `chat_model` troca o modelo da chamada (ex.: o modelo rápido da cascata).
+        """
+        base_wait_time = 2
+        max_tokens = None
+        if self.token_budget is not None and prompt_version:
+            max_tokens = self.token_budget.max_tokens(prompt_version)
+
+        def record_tokens(response, latency: float) -> bool:
+            """Registra a saída da chamada no orçamento de tokens. Retorna True se a resposta veio cortada."""
+            truncated = (getattr(response, "response_metadata", None) or {}).get("finish_reason") == "length"
+            usage = getattr(response, "usage_metadata", None) or {}
+            self.token_budget.record(
+                prompt_version, mode,
+                output_tokens=usage.get("output_tokens") or len(getattr(response, "content", None) or "") // 4,
+                latency=latency,
+                max_tokens=max_tokens,
+                truncated=truncated,
+                input_tokens=usage.get("input_tokens"),
+            )
+            return truncated
+
+        # Requisição perdedora do hedging que chegou a terminar (a cobrança fica com o HedgedInvoker)
+        on_extra_call = record_tokens if max_tokens else None
+        for attempt in range(max_retries):
+            started = time.monotonic()
+            try:
+                if self.limiter is None:
+                    self._wait_for_rate_limit()
+                    if self.budget is not None and not self.budget.reserve():
+                        return ""
+                    response = self._invoke(prompt, on_field, max_tokens, chat_model, on_extra_call)
+                else:
+                    # O backoff abaixo acontece fora do slot, liberando-o para os demais workers
+                    started_slot = self.limiter.acquire()
+                    # Reservada com o slot ocupado: só as chamadas que vão sair agora contam.
+                    # Sem orçamento, o slot volta como 'cancelled' (não é uma chamada rápida bem-sucedida)
+                    if self.budget is not None and not self.budget.reserve():
+                        self.limiter.release(started_slot, 'cancelled')
+                        return ""
+                    with self.limiter.slot(started_slot):
+                        response = self._invoke(prompt, on_field, max_tokens, chat_model, on_extra_call)
+                content = getattr(response, "content", None)
+                if prompt_version:
+                    self.prompt_cache.record(prompt_version, response)
+                if self.budget is not None:
+                    usage = getattr(response, "usage_metadata", None) or {}
+                    model = (getattr(response, "response_metadata", None) or {}).get("model_name") or self.model_id
+                    self.budget.charge(model, usage.get("input_tokens") or len(prompt) // 4, usage.get("output_tokens") or len(content or "") // 4)
+                if max_tokens:
+                    truncated = record_tokens(response, time.monotonic() - started)
+                    if truncated and max_tokens < 6000:
+                        max_tokens = min(6000, max_tokens * 2)
+                        logger.warning(f"Resposta cortada pelo limite de tokens. Repetindo com max_tokens={max_tokens}.")
+                        continue
+                if content:
+                    return content.strip()
+                    
+            except Exception as e:
+                error_msg = str(e).lower()
+                logger.warning(f"Erro na API (tentativa {attempt+1}/{max_retries}): {e}")
+                
+                # Checa se o erro é de rate limit
+                if any(keyword in error_msg for keyword in ["rate limit", "too many requests", "quota"]):
+                    wait_time = base_wait_time * (2 ** attempt) + random.uniform(0, 1)
+                    logger.info(f"Rate limit detectado. Tentativa {attempt+1}. Aguardando {wait_time:.2f}s...")
+                    time.sleep(wait_time)
+                elif "timeout" in error_msg:
+                    time.sleep(10)
+                else:
+                    time.sleep(5)
+                    
+        return ""
+
+    def _get_or_create_full_analysis(self, cv_text: str, opening_json: str, on_field=None, compact: Optional[bool] = None) -> Optional[Dict[str, Any]]:
+        """
+        Gera análise completa uma única vez e cacheia o resultado
+        """
+        facts = self._uses_facts(compact)
+        compact = self._is_compact(compact)
+        # Cria chave de cache (a versão do prompt separa respostas de textos de prompt diferentes)
+        cache_key = hash((self.analysis_prompt_version(compact, facts=facts), cv_text, opening_json))
+        
+        if cache_key in self._full_analysis_cache:
+            return self._full_analysis_cache[cache_key]
+        
+        if facts or self.cascade is None:
+            # No formato de fatos a nota é local: não há nota provisória para a cascata
+            parsed_json = self._run_analysis(cv_text, opening_json, compact, on_field, facts=facts)
+        else:
+            parsed_json = self._run_cascade(cv_text, opening_json, compact, on_field)
+        if parsed_json is None:
+            return None
+        
+        # Cacheia resultado
+        self._full_analysis_cache[cache_key] = parsed_json
+        return parsed_json
+
+    def _run_analysis(
+        self,
+        cv_text: str,
+        opening_json: str,
+        compact: bool,
+        on_field=None,
+        fast: bool = False,
+        facts: bool = False
+    ) -> Optional[Dict[str, Any]]:
+        """Uma análise em um dos níveis; o resultado registra o nível e o modelo que o produziram."""
+        from cascade import FAST, LARGE
+        if facts:
+            prompt, mode = self.build_facts_prompt(cv_text, opening_json), "facts"
+        else:
+            prompt = self.build_full_analysis_prompt(cv_text, opening_json, compact=compact, confidence=fast)
+            mode = "compact" if compact else "full"
+        prompt_version = self.analysis_prompt_version(compact, confidence=fast, facts=facts)
+        response = self.generate_response(
+            prompt, max_retries=2 if fast else 4, on_field=on_field,
+            prompt_version=prompt_version,
+            mode=f"{mode}:{FAST}" if fast else mode,
+            chat_model=self._fast_client if fast else None
+        )
+        with stage("parse"):
+            parsed_json = self.parse_full_analysis(response, opening_json)
+        if parsed_json is not None:
+            parsed_json["prompt_version"] = prompt_version
+            parsed_json["tier"] = FAST if fast else LARGE
+            parsed_json["model"] = self.cascade.fast_model if fast else self.model_id
+        return parsed_json
+
+    def _run_cascade(self, cv_text: str, opening_json: str, compact: bool, on_field=None) -> Optional[Dict[str, Any]]:
+        """
+        Nota provisória do modelo rápido; o modelo grande só entra quando a
+        nota cai na faixa de incerteza, a confiança é baixa ou o rápido falha.
+        """
+        from cascade import FAST, LARGE
+        cascade = self.cascade
+        started = time.monotonic()
+        provisional = self._run_analysis(cv_text, opening_json, compact, on_field, fast=True)
+        cascade.record_call(FAST, time.monotonic() - started, failed=provisional is None)
+        if provisional is not None and not cascade.shadow and not cascade.needs_escalation(provisional):
+            cascade.record_result(FAST)
+            return provisional
+
+        started = time.monotonic()
+        final = self._run_analysis(cv_text, opening_json, compact, on_field)
+        cascade.record_call(LARGE, time.monotonic() - started, failed=final is None)
+        if final is None:
+            if provisional is not None:
+                logger.warning("Modelo grande sem resposta válida; mantendo a nota provisória do modelo rápido.")
+                cascade.record_result(FAST)
+            return provisional
+        if cascade.shadow and provisional is not None:
+            cascade.record_shadow(provisional, final, cv_text, opening_json)
+        cascade.record_result(LARGE)
+        return final
+
+    @staticmethod
+    def build_full_analysis_prompt(cv_text: str, opening_json: str, compact: bool = False, confidence: bool = False) -> str:
+        """
+        Prompt da análise completa (usado na chamada direta e no modo batch).
+        Com `compact=True`, pede o formato de saída compacto; com
+        `confidence=True`, pede também a confiança na nota (cascata).
+        """
+        # Limita tamanho dos inputs
+        cv_text = cv_text[:3500] if len(cv_text) > 3500 else cv_text
+        return ANALYSIS_TEMPLATES[(compact, confidence)].render(opening_text=_opening_text(opening_json), cv_text=cv_text)
+
+    @staticmethod
+    def build_facts_prompt(cv_text: str, opening_json: str) -> str:
+        """
+        Prompt do formato de fatos: a IA não calcula nota, só extrai os
+        fatos que a rubrica local (rubric.py) pondera.
+        """
+        cv_text = cv_text[:3500] if len(cv_text) > 3500 else cv_text
+        return FACTS_TEMPLATE.render(opening_text=_opening_text(opening_json), cv_text=cv_text)
+
+    @staticmethod
+    def parse_full_analysis(response: str, opening_json: Optional[str] = None) -> Optional[Dict[str, Any]]:
+        """
+        Converte a resposta da IA na análise normalizada (ou None se inválida).
+        Aceita os três formatos de saída (completo, compacto e fatos); no de
+        fatos a nota vem da rubrica local, com o nível da vaga de `opening_json`.
+        """
         if not response:
             return None
             
         parsed_json = _safe_json_parse(response)
+        if parsed_json and "hm" in parsed_json and "score" not in parsed_json:
+            try:
+                nivel = json.loads(opening_json or "{}").get('nivel')
+            except (json.JSONDecodeError, AttributeError):
+                nivel = None
+            parsed_json = expand_facts_analysis(parsed_json, nivel)
+        elif parsed_json and "s" in parsed_json and "score" not in parsed_json:
+            parsed_json = expand_compact_analysis(parsed_json)
         
         if not parsed_json or not all(k in parsed_json for k in ["conclusion", "score", "structured_data"]):
             return None
@@ -241,6 +691,13 @@ class GroqClient:
         # Normaliza dados
         try:
             parsed_json["score"] = _clamp(float(parsed_json["score"]), 0.0, 10.0)
+            if parsed_json.get("confidence") is not None:
+                try:
+                    parsed_json["confidence"] = _clamp(float(parsed_json["confidence"]), 0.0, 1.0)
+                except (TypeError, ValueError):
+                    # Confiança fora do formato numérico: descartada (a cascata escala a análise)
+                    logger.warning(f"Confiança inválida descartada: {parsed_json['confidence']!r}")
+                    parsed_json.pop("confidence")
             
             if "structured_data" in parsed_json:
                 struct_data = parsed_json["structured_data"]
@@ -254,8 +711,6 @@ class GroqClient:
         except Exception as e:
             logger.error(f"Erro na normalização: {e}")
         
-        # Cacheia resultado
-        self._full_analysis_cache[cache_key] = parsed_json
         return parsed_json
 
     # ------------------ MÉTODOS COMPATÍVEIS (ANTIGOS) ------------------
@@ -301,9 +756,11 @@ class GroqClient:
 
     # ------------------ MÉTODOS NOVOS ------------------
     
-    def generate_full_cv_analysis(self, cv_text: str, opening_text: str) -> Optional[Dict[str, Any]]:
+    def generate_full_cv_analysis(self, cv_text: str, opening_text: str, on_field=None, compact: Optional[bool] = None) -> Optional[Dict[str, Any]]:
         """
-        Método principal: análise completa otimizada
+        Método principal: análise completa otimizada.
+        No modo streaming, `on_field(chave, valor)` recebe cada campo assim que ele chega.
+        `compact` força o formato de resposta (padrão: `response_mode`).
         """
         # Converte opening_text para formato JSON se necessário
         if not opening_text.strip().startswith('{'):
@@ -311,7 +768,7 @@ class GroqClient:
         else:
             opening_json = opening_text
             
-        return self._get_or_create_full_analysis(cv_text, opening_json)
+        return self._get_or_create_full_analysis(cv_text, opening_json, on_field=on_field, compact=compact)
 
     def extract_structured_data(self, cv_text: str) -> Dict[str, Any]:
         """
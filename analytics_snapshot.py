@@ -0,0 +1,283 @@
+import os
+import glob
+import json
+import time
+import uuid
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Dict, Any, List, Optional, Iterable
+
+import pyarrow as pa
+import pyarrow.compute as pc
+
+from models.records import AnalysisRecord, analysis_records
+
+try:
+    import fcntl
+except ImportError:  # Windows: apenas o lock entre threads
+    fcntl = None
+
+logger = logging.getLogger(__name__)
+
+# ---------- CONFIGURAÇÃO ----------
+SNAPSHOT_DIR = "analytics"
+SNAPSHOT_FILE = "analyses.arrow"
+SEGMENTS_DIR = "segments"
+# Compacta automaticamente quando houver mais segmentos do que isso
+MAX_SEGMENTS = 32
+# Linhas acumuladas em memória antes de gravar um segmento
+FLUSH_ROWS = 200
+
+SCHEMA = pa.schema([
+    pa.field("id", pa.string()),
+    pa.field("opening_id", pa.string()),
+    pa.field("brief_id", pa.string()),
+    pa.field("cv_digest", pa.string()),
+    pa.field("name", pa.string()),
+    pa.field("formal_education", pa.string()),
+    pa.field("hard_skills", pa.list_(pa.string())),
+    pa.field("soft_skills", pa.list_(pa.string())),
+    pa.field("score", pa.float64()),
+    pa.field("total_experience_years", pa.float64()),
+    pa.field("updated_at", pa.float64()),
+])
+
+
+def _to_str(value) -> Optional[str]:
+    return None if value is None else str(value)
+
+
+def flatten_analysis(analysis: Dict[str, Any]) -> Dict[str, Any]:
+    """Converte uma linha de análise do TinyDB no formato colunar do snapshot."""
+    record = analysis if isinstance(analysis, AnalysisRecord) else AnalysisRecord.from_row(analysis)
+    return {
+        "id": _to_str(record.id),
+        "opening_id": _to_str(record.opening_id),
+        "brief_id": _to_str(record.brief_id),
+        "cv_digest": _to_str(record.cv_digest),
+        "name": _to_str(record.name),
+        "formal_education": _to_str(record.formal_education),
+        "hard_skills": list(record.hard_skills),
+        "soft_skills": list(record.soft_skills),
+        "score": record.score,
+        "total_experience_years": record.total_experience_years,
+        "updated_at": time.time(),
+    }
+
+
+def records_table(records: List[AnalysisRecord], updated_at: Optional[float] = None) -> pa.Table:
+    """
+    Tabela no SCHEMA do snapshot montada coluna a coluna a partir dos
+    registros (sem dicionários intermediários). As colunas numéricas vão
+    para o pandas sem cópia (`to_pandas`).
+    """
+    updated_at = time.time() if updated_at is None else updated_at
+    column = lambda attr: [getattr(r, attr) for r in records]
+    as_str = lambda attr: [None if v is None else str(v) for v in column(attr)]
+    return pa.Table.from_arrays([
+        pa.array(as_str('id'), pa.string()),
+        pa.array(as_str('opening_id'), pa.string()),
+        pa.array(as_str('brief_id'), pa.string()),
+        pa.array(as_str('cv_digest'), pa.string()),
+        pa.array(as_str('name'), pa.string()),
+        pa.array(as_str('formal_education'), pa.string()),
+        pa.array(column('hard_skills'), pa.list_(pa.string())),
+        pa.array(column('soft_skills'), pa.list_(pa.string())),
+        pa.array(column('score'), pa.float64()),
+        pa.array(column('total_experience_years'), pa.float64()),
+        pa.array([updated_at] * len(records), pa.float64()),
+    ], schema=SCHEMA)
+
+
+class AnalyticsSnapshot:
+    """
+    Snapshot colunar (Arrow IPC) das análises.
+
+    Novas análises são acumuladas e gravadas em pequenos segmentos; a
+    compactação junta tudo em um único arquivo ordenado por vaga, com um
+    record batch por vaga e um índice vaga → batches nos metadados. O
+    arquivo é lido com memory-map, então abrir uma vaga lê só as colunas e
+    os batches necessários.
+    """
+
+    def __init__(self, base_dir: str = SNAPSHOT_DIR):
+        self.base_dir = base_dir
+        self.snapshot_path = os.path.join(base_dir, SNAPSHOT_FILE)
+        self.segments_dir = os.path.join(base_dir, SEGMENTS_DIR)
+        self._lock_path = os.path.join(base_dir, ".lock")
+        self._buffer: List[Dict[str, Any]] = []
+        self._buffer_lock = threading.Lock()
+        os.makedirs(self.segments_dir, exist_ok=True)
+
+    @contextmanager
+    def _file_lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(self._lock_path, 'a') as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    # ---------- ESCRITA ----------
+    def append(self, analysis: Dict[str, Any]):
+        """Acumula uma análise; grava um segmento a cada `FLUSH_ROWS` linhas."""
+        with self._buffer_lock:
+            self._buffer.append(flatten_analysis(analysis))
+            full = len(self._buffer) >= FLUSH_ROWS
+        if full:
+            self.flush()
+
+    def flush(self):
+        """Grava as linhas acumuladas em um novo segmento (e compacta se necessário)."""
+        with self._buffer_lock:
+            rows, self._buffer = self._buffer, []
+        if rows:
+            table = pa.Table.from_pylist(rows, schema=SCHEMA)
+            name = f"part-{time.time_ns()}-{uuid.uuid4().hex[:8]}.arrow"
+            self._write_atomic(table, os.path.join(self.segments_dir, name))
+        if len(self._segment_paths()) > MAX_SEGMENTS:
+            self.compact()
+
+    def _write_atomic(self, table: pa.Table, path: str, batches: Optional[Iterable[pa.RecordBatch]] = None, metadata: Optional[Dict[str, str]] = None):
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        schema = SCHEMA.with_metadata(metadata) if metadata else SCHEMA
+        with pa.OSFile(tmp_path, 'wb') as sink:
+            with pa.ipc.new_file(sink, schema) as writer:
+                for batch in batches if batches is not None else table.to_batches():
+                    writer.write_batch(batch)
+        os.replace(tmp_path, path)
+
+    def _segment_paths(self) -> List[str]:
+        return sorted(glob.glob(os.path.join(self.segments_dir, "part-*.arrow")))
+
+    def compact(self, exclude_openings: Iterable = ()):
+        """
+        Junta o snapshot e os segmentos em um único arquivo, mantendo a versão
+        mais recente de cada análise e descartando as vagas em `exclude_openings`.
+        """
+        with self._file_lock():
+            segments = self._segment_paths()
+            tables = [self._read_file(p) for p in ([self.snapshot_path] if os.path.exists(self.snapshot_path) else []) + segments]
+            tables = [t for t in tables if t is not None and t.num_rows]
+            table = pa.concat_tables(tables) if tables else SCHEMA.empty_table()
+
+            excluded = pa.array([str(o) for o in exclude_openings], pa.string())
+            if len(excluded):
+                table = table.filter(pc.invert(pc.is_in(table['opening_id'], value_set=excluded)))
+
+            # Mantém a última versão de cada análise (por id)
+            if table.num_rows:
+                table = table.append_column("_row", pa.array(range(table.num_rows), pa.int64()))
+                last = table.group_by("id", use_threads=False).aggregate([("_row", "max")])["_row_max"]
+                table = table.take(last).drop_columns(["_row"])
+                table = table.sort_by([("opening_id", "ascending"), ("score", "descending")])
+
+            batches, index = [], {}
+            if table.num_rows:
+                opening_ids = table['opening_id'].to_pylist()
+                start = 0
+                for i in range(1, len(opening_ids) + 1):
+                    if i == len(opening_ids) or opening_ids[i] != opening_ids[start]:
+                        index[opening_ids[start] or ""] = len(batches)
+                        batches.extend(table.slice(start, i - start).combine_chunks().to_batches())
+                        start = i
+            self._write_atomic(table, self.snapshot_path, batches=batches, metadata={"opening_index": json.dumps(index)})
+            for path in segments:
+                os.remove(path)
+        logger.info(f"Snapshot de análises compactado: {table.num_rows} linhas, {len(index)} vagas.")
+
+    def rebuild(self, analyses: Iterable[Dict[str, Any]]):
+        """Recria o snapshot do zero a partir das linhas de análise do TinyDB."""
+        with self._file_lock():
+            for path in self._segment_paths():
+                os.remove(path)
+            if os.path.exists(self.snapshot_path):
+                os.remove(self.snapshot_path)
+        table = records_table(analysis_records(analyses))
+        self._write_atomic(table, os.path.join(self.segments_dir, f"part-{time.time_ns()}-rebuild.arrow"))
+        self.compact()
+
+    # ---------- LEITURA ----------
+    @staticmethod
+    def _read_file(path: str, columns: Optional[List[str]] = None, batch_indices: Optional[List[int]] = None) -> Optional[pa.Table]:
+        try:
+            source = pa.memory_map(path, 'r')
+        except FileNotFoundError:
+            return None
+        reader = pa.ipc.open_file(source)
+        if batch_indices is None:
+            table = reader.read_all()
+        else:
+            batches = [reader.get_batch(i) for i in batch_indices]
+            table = pa.Table.from_batches(batches, schema=reader.schema)
+        return table.select(columns) if columns else table
+
+    def read(self, opening_id=None, columns: Optional[List[str]] = None) -> pa.Table:
+        """
+        Lê o snapshot (opcionalmente de uma única vaga), incluindo segmentos
+        ainda não compactados. Retorna uma `pyarrow.Table` com as colunas pedidas.
+        """
+        wanted = list(columns) if columns else SCHEMA.names
+        read_cols = list(dict.fromkeys(wanted + ["id", "opening_id", "updated_at"]))
+        tables = []
+
+        if os.path.exists(self.snapshot_path):
+            batch_indices = None
+            if opening_id is not None:
+                with pa.memory_map(self.snapshot_path, 'r') as source:
+                    metadata = pa.ipc.open_file(source).schema.metadata or {}
+                index = json.loads(metadata.get(b"opening_index", b"{}"))
+                batch_indices = [index[str(opening_id)]] if str(opening_id) in index else []
+            main = self._read_file(self.snapshot_path, read_cols, batch_indices)
+            if main is not None:
+                tables.append(main)
+
+        for path in self._segment_paths():
+            segment = self._read_file(path, read_cols)
+            if segment is None:
+                continue
+            if opening_id is not None:
+                segment = segment.filter(pc.equal(segment['opening_id'], str(opening_id)))
+            tables.append(segment)
+
+        tables = [t for t in tables if t.num_rows]
+        if not tables:
+            return SCHEMA.empty_table().select(wanted)
+        table = pa.concat_tables(tables) if len(tables) > 1 else tables[0]
+        if len(tables) > 1:
+            # Segmentos podem conter versões novas de análises já compactadas
+            table = table.append_column("_row", pa.array(range(table.num_rows), pa.int64()))
+            last = table.group_by("id", use_threads=False).aggregate([("_row", "max")])["_row_max"]
+            table = table.take(last.take(pc.sort_indices(last)))
+        return table.select(wanted)
+
+    def export_parquet(self, path: str, opening_id=None):
+        """Exporta o snapshot (ou uma vaga) para Parquet."""
+        import pyarrow.parquet as pq
+        pq.write_table(self.read(opening_id), path)
+        logger.info(f"Snapshot exportado para {path}.")
+
+
+if __name__ == "__main__":
+    import argparse
+    from database import AnalysisDatabase
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Gerencia o snapshot colunar das análises.")
+    parser.add_argument("--rebuild", action="store_true", help="Recria o snapshot a partir de applicants.json.")
+    parser.add_argument("--compact", action="store_true", help="Compacta os segmentos pendentes.")
+    parser.add_argument("--export", metavar="ARQUIVO.parquet", help="Exporta o snapshot para Parquet.")
+    parser.add_argument("--opening-id", help="Restringe a exportação a uma vaga.")
+    args = parser.parse_args()
+
+    snapshot = AnalyticsSnapshot()
+    if args.rebuild:
+        snapshot.rebuild(AnalysisDatabase(db_path='applicants.json').analysis.all())
+    if args.compact:
+        snapshot.compact()
+    if args.export:
+        snapshot.export_parquet(args.export, args.opening_id)
@@ -0,0 +1,283 @@
+import os
+import json
+import time
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+
+import process_cvs
+from process_cvs import (
+    CV_BASE_DIR,
+    build_folder_to_opening,
+    build_opening_json,
+    collect_tasks,
+    extract_cv_text,
+    pending_tasks,
+    save_analysis,
+)
+from utils_cv import file_digest
+from blob_store import get_blob_store
+from openings_db_manager import get_catalog, opening_version
+from scheduler import schedule_tasks
+from sharding import Shard, select_shard
+
+logger = logging.getLogger(__name__)
+
+# ---------- CONFIGURAÇÃO ----------
+BATCH_DIR = "batch_jobs"
+DEFAULT_BASE_URL = "https://api.groq.com/openai/v1"
+COMPLETION_WINDOW = "24h"
+POLL_INTERVAL = 30.0
+# Estados finais de um batch na API compatível com a da OpenAI
+FINAL_STATES = ("completed", "failed", "expired", "cancelled")
+
+
+class BatchAPI:
+    """Cliente mínimo da API de batch (arquivos + batches) compatível com a da OpenAI/Groq."""
+
+    def __init__(self, base_url: Optional[str] = None, api_key: Optional[str] = None):
+        from dotenv import load_dotenv
+        load_dotenv()
+        self.base_url = (base_url or os.getenv("GROQ_BATCH_BASE_URL") or DEFAULT_BASE_URL).rstrip('/')
+        self.api_key = api_key or os.getenv("GROQ_API_KEY", "")
+
+    def _request(self, method: str, path: str, **kwargs):
+        import requests
+        response = requests.request(
+            method, f"{self.base_url}{path}",
+            headers={"Authorization": f"Bearer {self.api_key}"},
+            timeout=kwargs.pop('timeout', 300),
+            **kwargs
+        )
+        response.raise_for_status()
+        return response
+
+    def upload(self, path: str) -> str:
+        with open(path, 'rb') as f:
+            response = self._request("POST", "/files", files={"file": (os.path.basename(path), f, "application/jsonl")}, data={"purpose": "batch"})
+        return response.json()["id"]
+
+    def create_batch(self, input_file_id: str) -> Dict[str, Any]:
+        return self._request("POST", "/batches", json={
+            "input_file_id": input_file_id,
+            "endpoint": "/v1/chat/completions",
+            "completion_window": COMPLETION_WINDOW,
+        }).json()
+
+    def get_batch(self, batch_id: str) -> Dict[str, Any]:
+        return self._request("GET", f"/batches/{batch_id}").json()
+
+    def download(self, file_id: str, dest: str):
+        """Baixa o conteúdo de um arquivo em streaming (arquivo temporário + rename)."""
+        tmp_path = f"{dest}.tmp"
+        with self._request("GET", f"/files/{file_id}/content", stream=True) as response, open(tmp_path, 'wb') as f:
+            for chunk in response.iter_content(chunk_size=1 << 16):
+                f.write(chunk)
+        os.replace(tmp_path, dest)
+
+
+# ---------- PREPARAÇÃO ----------
+def custom_id(cv_digest: str, opening_data: Dict[str, Any]) -> str:
+    """Id estável de uma requisição: mesmo CV, vaga e versão da vaga geram o mesmo id."""
+    return f"{cv_digest[:32]}-{opening_data.get('id')}-{opening_version(opening_data)[:12]}"
+
+
+def render_batch(tasks: List[Tuple[str, Dict[str, Any]]], requests_path: str, manifest_path: str) -> int:
+    """
+    Grava um JSONL com uma requisição de chat por par (CV, vaga) e um
+    manifesto com o que é preciso para persistir cada resposta. Os textos
+    extraídos vão para o blob store, então a ingestão não reabre os CVs.
+    """
+    client = process_cvs.get_groq_client()
+    blob_store = get_blob_store()
+    seen = set()
+    count = 0
+    with open(requests_path, 'w', encoding='utf-8') as requests_file, open(manifest_path, 'w', encoding='utf-8') as manifest_file:
+        for cv_path, opening_data in tasks:
+            extracted = extract_cv_text(cv_path)
+            if extracted is None:
+                continue
+            raw_text, cv_text, cleaned_cv_text = extracted
+            cv_digest = file_digest(cv_path)
+            request_id = custom_id(cv_digest, opening_data)
+            if request_id in seen:
+                continue
+            seen.add(request_id)
+            prompt = client.build_analysis_prompt(cleaned_cv_text, build_opening_json(opening_data))
+            requests_file.write(json.dumps({
+                "custom_id": request_id,
+                "method": "POST",
+                "url": "/v1/chat/completions",
+                "body": {**client.chat_params(), "messages": [{"role": "user", "content": prompt}]},
+            }, ensure_ascii=False) + "\n")
+            manifest_file.write(json.dumps({
+                "custom_id": request_id,
+                "cv_path": cv_path,
+                "cv_digest": cv_digest,
+                "opening_id": str(opening_data.get('id')),
+                "raw_text_ref": blob_store.put(raw_text),
+                "cv_text_ref": blob_store.put(cv_text),
+                "prompt_version": client.configured_prompt_version(),
+            }, ensure_ascii=False) + "\n")
+            count += 1
+    logger.info(f"{count} requisições gravadas em '{requests_path}'.")
+    return count
+
+
+def _state_path(batch_id: str) -> str:
+    return os.path.join(BATCH_DIR, f"{batch_id}.json")
+
+
+def _save_state(state: Dict[str, Any]):
+    tmp_path = f"{_state_path(state['batch_id'])}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        json.dump(state, f, indent=2)
+    os.replace(tmp_path, _state_path(state['batch_id']))
+
+
+def _load_state(batch_id: str) -> Dict[str, Any]:
+    with open(_state_path(batch_id), 'r', encoding='utf-8') as f:
+        return json.load(f)
+
+
+# ---------- ENVIO E ACOMPANHAMENTO ----------
+def submit(api: BatchAPI, requests_path: str, manifest_path: str) -> str:
+    """Envia o JSONL e cria o batch. O estado fica em batch_jobs/<batch_id>.json."""
+    file_id = api.upload(requests_path)
+    batch = api.create_batch(file_id)
+    _save_state({
+        "batch_id": batch["id"],
+        "status": batch.get("status"),
+        "input_file_id": file_id,
+        "requests": requests_path,
+        "manifest": manifest_path,
+        "created_at": time.time(),
+    })
+    logger.info(f"Batch {batch['id']} criado ({batch.get('status')}).")
+    return batch["id"]
+
+
+def poll(api: BatchAPI, batch_id: str, interval: float = POLL_INTERVAL) -> Dict[str, Any]:
+    """Aguarda o batch chegar a um estado final."""
+    state = _load_state(batch_id)
+    while True:
+        batch = api.get_batch(batch_id)
+        status = batch.get("status")
+        if status != state.get("status"):
+            counts = batch.get("request_counts") or {}
+            logger.info(f"Batch {batch_id}: {status} ({counts.get('completed', 0)}/{counts.get('total', '?')} concluídas).")
+            state.update(status=status, output_file_id=batch.get("output_file_id"), error_file_id=batch.get("error_file_id"))
+            _save_state(state)
+        if status in FINAL_STATES:
+            return batch
+        time.sleep(interval)
+
+
+# ---------- INGESTÃO ----------
+def _response_content(line: Dict[str, Any]) -> Optional[str]:
+    response = line.get("response") or {}
+    if line.get("error") or response.get("status_code") != 200:
+        return None
+    choices = (response.get("body") or {}).get("choices") or []
+    if not choices:
+        return None
+    return (choices[0].get("message") or {}).get("content")
+
+
+def _ingest_line(client, blob_store, manifest: Dict[str, Dict[str, Any]], line: Dict[str, Any]) -> Optional[bool]:
+    """Persiste uma linha de resultado. Retorna True (salva), False (falha) ou None (par já analisado)."""
+    entry = manifest.get(line.get("custom_id"))
+    opening_data = get_catalog().by_id(entry["opening_id"]) if entry else None
+    if opening_data is None:
+        logger.warning(f"Resultado {line.get('custom_id')} sem vaga ou entrada no manifesto. Ignorando.")
+        return False
+    if not pending_tasks([(entry["cv_path"], opening_data)]):
+        return None
+    full_analysis = client.parse_full_analysis(_response_content(line), build_opening_json(opening_data))
+    if not full_analysis or 'conclusion' not in full_analysis or 'score' not in full_analysis:
+        logger.error(f"Resposta inválida para {os.path.basename(entry['cv_path'])} (vaga {entry['opening_id']}).")
+        return False
+    full_analysis["prompt_version"] = entry.get("prompt_version")
+    raw_text = blob_store.get(entry["raw_text_ref"]) or ""
+    cv_text = blob_store.get(entry["cv_text_ref"]) or ""
+    # Digest gravado na renderização: o CV pode ter sido movido ou editado desde então
+    save_analysis(entry["cv_path"], opening_data, raw_text, cv_text, full_analysis, cv_digest=entry.get("cv_digest"))
+    return True
+
+
+def ingest(api: BatchAPI, batch_id: str) -> Tuple[int, int]:
+    """
+    Baixa o arquivo de resultados e passa cada resposta pelo mesmo
+    caminho de parsing e persistência do processamento normal.
+    Pode ser repetido: pares já analisados são ignorados.
+    Retorna (análises salvas, falhas).
+    """
+    state = _load_state(batch_id)
+    if not state.get("output_file_id"):
+        logger.error(f"Batch {batch_id} sem arquivo de resultados (status: {state.get('status')}).")
+        return 0, 0
+
+    output_path = os.path.join(BATCH_DIR, f"{batch_id}.output.jsonl")
+    if not os.path.exists(output_path):
+        api.download(state["output_file_id"], output_path)
+    with open(state["manifest"], 'r', encoding='utf-8') as f:
+        manifest = {entry["custom_id"]: entry for entry in map(json.loads, f)}
+
+    client = process_cvs.get_groq_client()
+    blob_store = get_blob_store()
+    saved = failed = 0
+    with open(output_path, 'r', encoding='utf-8') as f:
+        for raw_line in f:
+            if not raw_line.strip():
+                continue
+            try:
+                outcome = _ingest_line(client, blob_store, manifest, json.loads(raw_line))
+            except Exception as e:
+                # Uma linha com problema (JSON corrompido, erro ao salvar) não interrompe o restante
+                logger.error(f"Falha ao ingerir um resultado do batch {batch_id}: {e}")
+                outcome = False
+            if outcome is True:
+                saved += 1
+            elif outcome is False:
+                failed += 1
+
+    state.update(status="ingested", saved=saved, failed=failed)
+    _save_state(state)
+    logger.info(f"Batch {batch_id} ingerido: {saved} análises salvas, {failed} falhas.")
+    return saved, failed
+
+
+def run_batch(
+    batch_id: Optional[str] = None,
+    boosts: Optional[Dict[str, float]] = None,
+    per_opening_cap: Optional[int] = None,
+    poll_interval: float = POLL_INTERVAL,
+    shard: Optional[Shard] = None
+):
+    """
+    Modo batch: gera o JSONL dos pares (CV, vaga) pendentes, envia para a
+    API de batch, aguarda e ingere os resultados. Com `batch_id`, retoma o
+    acompanhamento de um batch já enviado. Com `shard`, só os pares daquele
+    shard entram no batch.
+    """
+    os.makedirs(BATCH_DIR, exist_ok=True)
+    api = BatchAPI()
+    if batch_id is None:
+        tasks = schedule_tasks(select_shard(pending_tasks(collect_tasks(CV_BASE_DIR, build_folder_to_opening())), shard), boosts, per_opening_cap)
+        if not tasks:
+            logger.info("Nenhum currículo pendente para o batch. Finalizando.")
+            return
+        name = time.strftime("%Y%m%d-%H%M%S")
+        requests_path = os.path.join(BATCH_DIR, f"{name}.requests.jsonl")
+        manifest_path = os.path.join(BATCH_DIR, f"{name}.manifest.jsonl")
+        if not render_batch(tasks, requests_path, manifest_path):
+            return
+        batch_id = submit(api, requests_path, manifest_path)
+
+    batch = poll(api, batch_id, poll_interval)
+    if batch.get("status") != "completed":
+        logger.error(f"Batch {batch_id} terminou com status '{batch.get('status')}'.")
+        if not batch.get("output_file_id"):
+            return
+        # Batches expirados ainda entregam os resultados parciais
+    ingest(api, batch_id)
+    process_cvs.finalize_run(get_catalog().all())
@@ -0,0 +1,115 @@
+import os
+import gzip
+import uuid
+import hashlib
+import logging
+from typing import Optional, Dict, Any
+
+from tinydb import Query
+
+logger = logging.getLogger(__name__)
+
+# ---------- CONFIGURAÇÃO ----------
+BLOB_DIR = "cv_texts"
+COMPRESS_LEVEL = 6
+
+
+def text_digest(text: str) -> str:
+    """SHA-256 do texto (UTF-8): chave do blob."""
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()
+
+
+class BlobStore:
+    """
+    Armazenamento endereçado por conteúdo para os textos dos CVs.
+
+    Cada texto é gravado uma única vez, comprimido com gzip, em
+    `cv_texts/<2 primeiros hex>/<digest>.gz`. Os briefs guardam apenas o
+    digest e o texto é lido sob demanda.
+    """
+
+    def __init__(self, base_dir: str = BLOB_DIR):
+        self.base_dir = base_dir
+
+    def _path(self, digest: str) -> str:
+        return os.path.join(self.base_dir, digest[:2], f"{digest}.gz")
+
+    def exists(self, digest: str) -> bool:
+        return os.path.exists(self._path(digest))
+
+    def put(self, text: str) -> str:
+        """Grava o texto (se ainda não existir) e retorna seu digest."""
+        digest = text_digest(text)
+        path = self._path(digest)
+        if os.path.exists(path):
+            return digest
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{uuid.uuid4().hex}.tmp"
+        with gzip.open(tmp_path, 'wb', compresslevel=COMPRESS_LEVEL) as f:
+            f.write(text.encode('utf-8'))
+        os.replace(tmp_path, path)
+        return digest
+
+    def get(self, digest: str) -> Optional[str]:
+        """Lê o texto de um digest, ou None se ele não existir."""
+        try:
+            with gzip.open(self._path(digest), 'rb') as f:
+                return f.read().decode('utf-8')
+        except FileNotFoundError:
+            logger.warning(f"Texto {digest} não encontrado em '{self.base_dir}'.")
+            return None
+
+
+_default_store: Optional[BlobStore] = None
+
+
+def get_blob_store() -> BlobStore:
+    global _default_store
+    if _default_store is None:
+        _default_store = BlobStore()
+    return _default_store
+
+
+def use_blob_dir(base_dir: str) -> BlobStore:
+    """Troca a pasta do blob store padrão do processo (ex.: a de um shard)."""
+    global _default_store
+    _default_store = BlobStore(base_dir)
+    return _default_store
+
+
+def brief_text(brief: Dict[str, Any], raw: bool = False, store: Optional[BlobStore] = None) -> str:
+    """
+    Texto do CV de um brief, carregado sob demanda do blob store.
+    Aceita briefs antigos que ainda guardam `cv_text` inline.
+    """
+    if not brief:
+        return ""
+    ref = brief.get('raw_text_ref' if raw else 'cv_text_ref')
+    if ref:
+        return (store or get_blob_store()).get(ref) or ""
+    return brief.get('cv_text', "")
+
+
+def migrate_database(database, store: Optional[BlobStore] = None) -> int:
+    """Move o `cv_text` inline dos briefs existentes para o blob store."""
+    store = store or get_blob_store()
+
+    def move_text(brief):
+        brief['cv_text_ref'] = store.put(brief.pop('cv_text') or "")
+
+    with database.write_lock():
+        migrated = len(database.briefs.update(move_text, Query().cv_text.exists()))
+    logger.info(f"{migrated} briefs migrados para '{store.base_dir}'.")
+    return migrated
+
+
+if __name__ == "__main__":
+    import argparse
+    from database import AnalysisDatabase
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Gerencia o armazenamento de textos dos CVs.")
+    parser.add_argument("--migrate", action="store_true", help="Move o texto dos CVs de applicants.json para o blob store.")
+    args = parser.parse_args()
+    if args.migrate:
+        migrate_database(AnalysisDatabase(db_path='applicants.json'))
@@ -0,0 +1,173 @@
+import os
+import json
+import time
+import hashlib
+import threading
+import logging
+from typing import Dict, Any, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+# ---------- CONFIGURAÇÃO ----------
+DEFAULT_FAST_MODEL = "llama-3.1-8b-instant"
+# Notas dentro desta faixa são sempre reavaliadas pelo modelo grande
+UNCERTAINTY_BAND = (4.0, 8.0)
+MIN_CONFIDENCE = 0.6
+# Diferença de nota a partir da qual os dois níveis "discordam" no modo sombra
+DISAGREEMENT_TOLERANCE = 1.0
+SHADOW_LOG_FILE = os.path.join("metrics", "cascade_shadow.jsonl")
+
+FAST = "fast"
+LARGE = "large"
+
+
+def _short_hash(text: str) -> str:
+    return hashlib.sha256(text.encode('utf-8')).hexdigest()[:12]
+
+
+class Cascade:
+    """
+    Cascata de dois níveis: o modelo rápido dá uma nota provisória com
+    confiança; só notas dentro de `band` (ou com confiança abaixo de
+    `min_confidence`) sobem para o modelo grande.
+
+    No modo sombra os dois níveis rodam para todo CV (vale a nota do modelo
+    grande) e cada par de notas vai para `metrics/cascade_shadow.jsonl`,
+    para medir com que frequência a cascata teria aceitado uma nota
+    provisória divergente.
+    """
+
+    def __init__(
+        self,
+        fast_model: str = DEFAULT_FAST_MODEL,
+        band: Tuple[float, float] = UNCERTAINTY_BAND,
+        min_confidence: float = MIN_CONFIDENCE,
+        shadow: bool = False,
+        shadow_log: str = SHADOW_LOG_FILE
+    ):
+        self.fast_model = fast_model
+        self.band = (min(band), max(band))
+        self.min_confidence = min_confidence
+        self.shadow = shadow
+        self.shadow_log = shadow_log
+        self._stats = {
+            'analyses': 0, 'fast_only': 0, 'escalated': 0, 'fast_failed': 0,
+            'fast_seconds': 0.0, 'large_seconds': 0.0,
+            'shadow_pairs': 0, 'shadow_disagreements': 0, 'shadow_abs_diff': 0.0,
+        }
+        self._lock = threading.Lock()
+
+    def needs_escalation(self, analysis: Dict[str, Any]) -> bool:
+        try:
+            score = float(analysis.get('score'))
+        except (TypeError, ValueError):
+            return True
+        try:
+            confidence = float(analysis.get('confidence'))
+        except (TypeError, ValueError):
+            # Sem confiança ou ilegível (ex.: "alta"): tratada como baixa
+            return True
+        if confidence < self.min_confidence:
+            return True
+        return self.band[0] <= score <= self.band[1]
+
+    def record_call(self, tier: str, seconds: float, failed: bool = False):
+        with self._lock:
+            self._stats[f'{tier}_seconds'] += seconds
+            if failed and tier == FAST:
+                self._stats['fast_failed'] += 1
+
+    def record_result(self, tier: str):
+        """Conta qual nível produziu a análise final de um par (CV, vaga)."""
+        with self._lock:
+            self._stats['analyses'] += 1
+            self._stats['fast_only' if tier == FAST else 'escalated'] += 1
+
+    def record_shadow(self, fast: Dict[str, Any], large: Dict[str, Any], cv_text: str, opening_json: str):
+        would_escalate = self.needs_escalation(fast)
+        diff = abs(float(fast.get('score') or 0) - float(large.get('score') or 0))
+        disagreement = not would_escalate and diff > DISAGREEMENT_TOLERANCE
+        with self._lock:
+            self._stats['shadow_pairs'] += 1
+            self._stats['shadow_abs_diff'] += diff
+            self._stats['shadow_disagreements'] += disagreement
+            os.makedirs(os.path.dirname(self.shadow_log) or '.', exist_ok=True)
+            with open(self.shadow_log, 'a', encoding='utf-8') as f:
+                f.write(json.dumps({
+                    "ts": time.time(),
+                    "opening": _short_hash(opening_json),
+                    "cv": _short_hash(cv_text),
+                    "fast_score": fast.get('score'),
+                    "fast_confidence": fast.get('confidence'),
+                    "large_score": large.get('score'),
+                    "would_escalate": would_escalate,
+                    "disagreement": disagreement,
+                }) + "\n")
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        analyses = stats['analyses'] or 1
+        metrics = {
+            'analyses': stats['analyses'],
+            'fast_only': stats['fast_only'],
+            'escalated': stats['escalated'],
+            'fast_failed': stats['fast_failed'],
+            'escalation_rate': round(stats['escalated'] / analyses, 3),
+            'avg_seconds_per_cv': round((stats['fast_seconds'] + stats['large_seconds']) / analyses, 3),
+        }
+        if stats['shadow_pairs']:
+            metrics.update({
+                'shadow_pairs': stats['shadow_pairs'],
+                'shadow_disagreement_rate': round(stats['shadow_disagreements'] / stats['shadow_pairs'], 3),
+                'shadow_mean_abs_diff': round(stats['shadow_abs_diff'] / stats['shadow_pairs'], 3),
+            })
+        return metrics
+
+
+def shadow_report(path: str = SHADOW_LOG_FILE, top_k: int = 10) -> Dict[str, Any]:
+    """
+    Resume o log do modo sombra: taxa de escalonamento e de discordância e,
+    por vaga, quantos do top-k pelo modelo grande continuariam no top-k da
+    cascata (nota rápida quando aceita, nota grande quando escalonada).
+    """
+    entries = []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            entries = [json.loads(line) for line in f if line.strip()]
+    except FileNotFoundError:
+        pass
+    if not entries:
+        return {}
+
+    by_opening: Dict[str, List[Dict[str, Any]]] = {}
+    for entry in entries:
+        by_opening.setdefault(entry["opening"], []).append(entry)
+    overlaps = []
+    for rows in by_opening.values():
+        k = min(top_k, len(rows))
+        top_large = {r["cv"] for r in sorted(rows, key=lambda r: -(r["large_score"] or 0))[:k]}
+        cascade_score = lambda r: r["large_score"] if r["would_escalate"] else r["fast_score"]
+        top_cascade = {r["cv"] for r in sorted(rows, key=lambda r: -(cascade_score(r) or 0))[:k]}
+        overlaps.append(len(top_large & top_cascade) / k)
+
+    return {
+        "pairs": len(entries),
+        "escalation_rate": round(sum(e["would_escalate"] for e in entries) / len(entries), 3),
+        "disagreement_rate": round(sum(e["disagreement"] for e in entries) / len(entries), 3),
+        "mean_abs_diff": round(sum(abs((e["fast_score"] or 0) - (e["large_score"] or 0)) for e in entries) / len(entries), 3),
+        f"top{top_k}_overlap": round(sum(overlaps) / len(overlaps), 3),
+        "openings": len(by_opening),
+    }
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Relatório do modo sombra da cascata de modelos.")
+    parser.add_argument("--report", action="store_true", help="Resume metrics/cascade_shadow.jsonl.")
+    parser.add_argument("--top-k", type=int, default=10)
+    args = parser.parse_args()
+    if args.report:
+        report = shadow_report(top_k=args.top_k)
+        print(json.dumps(report, indent=2) if report else f"Nada registrado em '{SHADOW_LOG_FILE}'.")
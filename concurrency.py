@@ -0,0 +1,197 @@
+import os
+import time
+import threading
+import logging
+from contextlib import contextmanager
+from typing import Dict, Any, Optional
+
+logger = logging.getLogger(__name__)
+
+# ---------- CONFIGURAÇÃO ----------
+METRICS_FILE = os.path.join("metrics", "process_cvs.prom")
+# Intervalo mínimo (s) entre duas gravações do arquivo de métricas
+METRICS_INTERVAL = 1.0
+
+
+def is_overload_error(error: Exception) -> bool:
+    """429 / rate limit / quota ou timeout: sinais de que o provedor está saturado."""
+    if getattr(error, 'status_code', None) == 429:
+        return True
+    message = str(error).lower()
+    return any(keyword in message for keyword in ["rate limit", "too many requests", "quota", "429", "timeout", "timed out"])
+
+
+class ConcurrencyController:
+    """
+    Controle adaptativo (AIMD) do número de requisições simultâneas à IA.
+
+    Enquanto a latência recente e a taxa de erros estão saudáveis, o limite
+    sobe +1 a cada `limit` respostas (aumento aditivo). Um 429 ou timeout
+    multiplica o limite por `decrease_factor` (corte multiplicativo), no
+    máximo uma vez por rajada: erros de requisições iniciadas antes do
+    último corte são ignorados.
+    """
+
+    def __init__(
+        self,
+        initial: int = 4,
+        min_limit: int = 1,
+        max_limit: int = 32,
+        decrease_factor: float = 0.5,
+        latency_tolerance: float = 1.5,
+        max_error_rate: float = 0.2,
+        metrics_file: Optional[str] = METRICS_FILE
+    ):
+        self.min_limit = min_limit
+        self.max_limit = max_limit
+        self.decrease_factor = decrease_factor
+        self.latency_tolerance = latency_tolerance
+        self.max_error_rate = max_error_rate
+        self.metrics_file = metrics_file
+        self._limit = float(max(min_limit, min(initial, max_limit)))
+        self._in_flight = 0
+        self._waiting = 0
+        self._last_decrease = 0.0
+        # Médias móveis: latência curta (reage rápido) x longa (referência)
+        self._latency_short: Optional[float] = None
+        self._latency_long: Optional[float] = None
+        self._error_rate = 0.0
+        self._counts = {'ok': 0, 'overload': 0, 'error': 0, 'cancelled': 0}
+        self._last_export = 0.0
+        self._cond = threading.Condition()
+
+    @property
+    def limit(self) -> int:
+        return int(self._limit)
+
+    @property
+    def in_flight(self) -> int:
+        return self._in_flight
+
+    # ---------- SLOTS ----------
+    def acquire(self) -> float:
+        """Espera um slot livre. Retorna o instante de início da requisição."""
+        with self._cond:
+            self._waiting += 1
+            while self._in_flight >= int(self._limit):
+                self._cond.wait()
+            self._waiting -= 1
+            self._in_flight += 1
+            self._export()
+            return time.monotonic()
+
+    def try_acquire(self) -> Optional[float]:
+        """Ocupa um slot só se houver um livre agora. Retorna o instante de início, ou None."""
+        with self._cond:
+            if self._in_flight >= int(self._limit):
+                return None
+            self._in_flight += 1
+            self._export()
+            return time.monotonic()
+
+    def release(self, started: float, outcome: str = 'ok'):
+        """
+        Devolve o slot e ajusta o limite. `outcome`: 'ok', 'overload',
+        'error' ou 'cancelled' (requisição interrompida: não ajusta o limite).
+        """
+        latency = time.monotonic() - started
+        with self._cond:
+            saturated = self._in_flight >= int(self._limit)
+            self._in_flight -= 1
+            self._counts[outcome] += 1
+            if outcome != 'cancelled':
+                self._error_rate = 0.9 * self._error_rate + 0.1 * (outcome == 'error')
+            previous = int(self._limit)
+
+            if outcome == 'overload':
+                if started >= self._last_decrease:
+                    self._limit = max(float(self.min_limit), self._limit * self.decrease_factor)
+                    self._last_decrease = time.monotonic()
+            elif outcome == 'ok':
+                healthy = self._observe_latency(latency) and self._error_rate < self.max_error_rate
+                # Só cresce se o limite atual estava de fato em uso
+                if healthy and saturated:
+                    self._limit = min(float(self.max_limit), self._limit + 1.0 / self._limit)
+
+            if int(self._limit) != previous:
+                logger.info(f"Concorrência da IA: {previous} -> {int(self._limit)} (em andamento: {self._in_flight}, resultado: {outcome}).")
+            self._cond.notify_all()
+            self._export()
+
+    def _observe_latency(self, latency: float) -> bool:
+        if self._latency_short is None:
+            self._latency_short = self._latency_long = latency
+            return True
+        self._latency_short = 0.7 * self._latency_short + 0.3 * latency
+        self._latency_long = 0.95 * self._latency_long + 0.05 * latency
+        return self._latency_short <= self.latency_tolerance * self._latency_long
+
+    @contextmanager
+    def slot(self, started: Optional[float] = None):
+        """
+        Envolve uma chamada à IA: ocupa um slot e classifica o resultado.
+        Com `started` (slot já ocupado por `acquire`), só classifica.
+        """
+        started = self.acquire() if started is None else started
+        try:
+            yield
+        except Exception as e:
+            self.release(started, 'overload' if is_overload_error(e) else 'error')
+            raise
+        self.release(started, 'ok')
+
+    # ---------- MÉTRICAS ----------
+    def metrics(self) -> Dict[str, Any]:
+        with self._cond:
+            return {
+                'limit': int(self._limit),
+                'limit_target': round(self._limit, 3),
+                'in_flight': self._in_flight,
+                'waiting': self._waiting,
+                'latency_short_seconds': self._latency_short,
+                'latency_long_seconds': self._latency_long,
+                'error_rate': round(self._error_rate, 4),
+                'requests': dict(self._counts),
+            }
+
+    def _export(self, force: bool = False):
+        """Grava as métricas no formato texto do Prometheus (chamado com o lock)."""
+        if not self.metrics_file:
+            return
+        now = time.monotonic()
+        if not force and now - self._last_export < METRICS_INTERVAL:
+            return
+        self._last_export = now
+        lines = [
+            "# HELP cv_llm_concurrency_limit Limite atual de requisições simultâneas à IA.",
+            "# TYPE cv_llm_concurrency_limit gauge",
+            f"cv_llm_concurrency_limit {self._limit:.3f}",
+            "# HELP cv_llm_in_flight Requisições à IA em andamento.",
+            "# TYPE cv_llm_in_flight gauge",
+            f"cv_llm_in_flight {self._in_flight}",
+            "# HELP cv_llm_waiting Workers aguardando um slot.",
+            "# TYPE cv_llm_waiting gauge",
+            f"cv_llm_waiting {self._waiting}",
+            "# HELP cv_llm_requests_total Requisições à IA por resultado.",
+            "# TYPE cv_llm_requests_total counter",
+            *(f'cv_llm_requests_total{{outcome="{k}"}} {v}' for k, v in self._counts.items()),
+        ]
+        if self._latency_short is not None:
+            lines += [
+                "# HELP cv_llm_latency_seconds Latência média móvel (curta e longa).",
+                "# TYPE cv_llm_latency_seconds gauge",
+                f'cv_llm_latency_seconds{{window="short"}} {self._latency_short:.3f}',
+                f'cv_llm_latency_seconds{{window="long"}} {self._latency_long:.3f}',
+            ]
+        try:
+            os.makedirs(os.path.dirname(self.metrics_file) or '.', exist_ok=True)
+            tmp_path = f"{self.metrics_file}.{os.getpid()}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                f.write("\n".join(lines) + "\n")
+            os.replace(tmp_path, self.metrics_file)
+        except OSError as e:
+            logger.warning(f"Não foi possível gravar as métricas em '{self.metrics_file}': {e}")
+
+    def flush_metrics(self):
+        with self._cond:
+            self._export(force=True)
@@ -2,6 +2,15 @@ from tinydb import TinyDB, Query
 import os
 import json
 import uuid
+import threading
+from contextlib import contextmanager
+
+from models.records import AnalysisRecord, BriefRecord
+
+try:
+    import fcntl
+except ImportError:  # Windows: apenas o lock entre threads
+    fcntl = None
 
 class AnalysisDatabase(TinyDB):
     def __init__(self, db_path='db.json'):
@@ -10,56 +19,162 @@ class AnalysisDatabase(TinyDB):
         self.briefs = self.table('briefs')
         self.analysis = self.table('analysis')
         self.files = self.table('files')
+        # TinyDB relê e regrava o arquivo inteiro a cada escrita e guarda um
+        # cache de consultas (LRU) por tabela que não é seguro entre threads:
+        # leituras e escritas são serializadas entre threads, e as escritas
+        # também entre processos que usam o mesmo arquivo.
+        self._lock_path = db_path + '.lock'
+        self._thread_lock = threading.RLock()
+        self._held = threading.local()
+
+    def _refresh(self):
+        # Cada instância guarda o próximo id e o cache de consultas de cada tabela:
+        # com o lock tomado, descarta os dois para que a escrita parta do arquivo
+        # em disco (outro processo pode ter inserido documentos).
+        for table in (self.briefs, self.analysis, self.files):
+            table._next_id = None
+            table.clear_cache()
+
+    @contextmanager
+    def _locked(self, exclusive: bool):
+        with self._thread_lock:
+            if getattr(self._held, 'depth', 0):
+                # Já dentro de um lock desta thread (o flock não é reentrante)
+                self._held.depth += 1
+                try:
+                    yield
+                finally:
+                    self._held.depth -= 1
+                return
+            self._held.depth = 1
+            try:
+                if fcntl is None:
+                    if exclusive:
+                        self._refresh()
+                    yield
+                    return
+                with open(self._lock_path, 'a') as lock_file:
+                    fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+                    try:
+                        if exclusive:
+                            self._refresh()
+                        yield
+                    finally:
+                        fcntl.flock(lock_file, fcntl.LOCK_UN)
+            finally:
+                self._held.depth = 0
+
+    def write_lock(self):
+        """Lock exclusivo (threads e processos) para escritas."""
+        return self._locked(exclusive=True)
+
+    def read_lock(self):
+        """Lock para leituras: exclui as escritas e as demais leituras desta instância."""
+        return self._locked(exclusive=False)
 
     # Add brief data
-    def add_brief_data(self, content, file_path):
+    def add_brief_data(self, brief_data, file_path):
         brief_id = str(uuid.uuid4())
-        self.briefs.insert({
-            "id": brief_id,
-            "content": content,
-            "file": file_path
-        })
+        with self.write_lock():
+            self.briefs.insert({
+                "id": brief_id,
+                **brief_data,
+                "file": file_path
+            })
         return brief_id
 
     # Add analysis data
     def add_analysis_data(self, opening_id, brief_id, analysis_data):
         analysis_id = str(uuid.uuid4())
-        self.analysis.insert({
-            "id": analysis_id,
-            "opening_id": opening_id,
-            "brief_id": brief_id,
-            **analysis_data
-        })
+        with self.write_lock():
+            self.analysis.insert({
+                "id": analysis_id,
+                "opening_id": opening_id,
+                "brief_id": brief_id,
+                **analysis_data
+            })
         return analysis_id
 
+    def import_rows(self, briefs, analyses):
+        """Insere briefs e análises já prontos (com id), ex.: de um shard, sob um único lock."""
+        if not briefs and not analyses:
+            return
+        with self.write_lock():
+            self.briefs.insert_multiple(briefs)
+            self.analysis.insert_multiple(analyses)
+
+    # Update data
+    def replace_analysis(self, analysis_id, analysis_data):
+        """Substitui os campos de uma análise existente em uma única escrita."""
+        analysis = Query()
+        with self.write_lock():
+            return self.analysis.update(analysis_data, analysis.id == analysis_id)
+
+    def update_analyses(self, updates):
+        """Aplica {analysis_id: campos} a várias análises em uma única escrita."""
+        analysis = Query()
+
+        def apply(doc):
+            doc.update(updates[doc['id']])
+
+        with self.write_lock():
+            return self.analysis.update(apply, analysis.id.one_of(list(updates)))
+
+    def update_brief(self, brief_id, brief_data):
+        brief = Query()
+        with self.write_lock():
+            return self.briefs.update(brief_data, brief.id == brief_id)
+
     # Getters
     def get_brief_by_id(self, brief_id):
         brief = Query()
-        result = self.briefs.search(brief.id == brief_id)
+        with self.read_lock():
+            result = self.briefs.search(brief.id == brief_id)
         return result[0] if result else None
     
+    def get_analysis_by_id(self, analysis_id):
+        analysis = Query()
+        with self.read_lock():
+            result = self.analysis.search(analysis.id == analysis_id)
+        return result[0] if result else None
+
     def get_analysis_by_opening_id(self, opening_id):
         analysis = Query()
-        return self.analysis.search(analysis.opening_id == opening_id)
+        with self.read_lock():
+            return self.analysis.search(analysis.opening_id == opening_id)
     
+    # Registros compactos (models/records.py) para leituras em massa
+    def analysis_records(self, opening_id=None):
+        analysis = Query()
+        with self.read_lock():
+            rows = self.analysis.all() if opening_id is None else self.analysis.search(analysis.opening_id == opening_id)
+        return [AnalysisRecord.from_row(row) for row in rows]
+
+    def brief_records(self):
+        with self.read_lock():
+            rows = self.briefs.all()
+        return [BriefRecord.from_row(row) for row in rows]
+
     # You can keep the 'by_title' getters if you need them for some reason,
     # but the new logic is designed to use IDs.
     def get_analysis_by_opening_title(self, opening_title):
         analysis = Query()
-        return self.analysis.search(analysis.opening_title == opening_title)
+        with self.read_lock():
+            return self.analysis.search(analysis.opening_title == opening_title)
 
     # Deletion methods
     def delete_all_briefs_by_opening_id(self, opening_id):
         analysis_q = Query()
-        analyses_to_delete = self.analysis.search(analysis_q.opening_id == opening_id)
-        brief_ids_to_delete = {a.get("brief_id") for a in analyses_to_delete}
-        
         brief_q = Query()
-        self.briefs.remove(brief_q.id.one_of(brief_ids_to_delete))
+        with self.write_lock():
+            analyses_to_delete = self.analysis.search(analysis_q.opening_id == opening_id)
+            brief_ids_to_delete = {a.get("brief_id") for a in analyses_to_delete}
+            self.briefs.remove(brief_q.id.one_of(brief_ids_to_delete))
 
     def delete_all_analysis_by_opening_id(self, opening_id):
         analysis_q = Query()
-        self.analysis.remove(analysis_q.opening_id == opening_id)
+        with self.write_lock():
+            self.analysis.remove(analysis_q.opening_id == opening_id)
 
     def delete_all_files_by_opening_id(self, opening_id):
         # This function should be moved or refactored. The app should handle file deletion
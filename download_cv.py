@@ -1,20 +1,30 @@
 import os
 import configparser
-from googleapiclient.discovery import build
-from googleapiclient.http import MediaIoBaseDownload
-from google.oauth2.credentials import Credentials
-from drive.authenticate import TOKEN_FILE
 
 # ---------- CONFIGURAÇÃO ----------
-config = configparser.ConfigParser()
-config.read('config.ini')
-CV_FOLDER_ID = config['GOOGLE_DRIVE']['CV_FOLDER_ID']
-
 SCOPES = ["https://www.googleapis.com/auth/drive.readonly"]
-creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
-service = build('drive', 'v3', credentials=creds)
+
+# Credenciais e serviço do Drive são criados no primeiro uso
+_service = None
+
+def get_cv_folder_id():
+    config = configparser.ConfigParser()
+    config.read('config.ini')
+    return config['GOOGLE_DRIVE']['CV_FOLDER_ID']
+
+def get_service():
+    global _service
+    if _service is None:
+        from google.oauth2.credentials import Credentials
+        from googleapiclient.discovery import build
+        from drive.authenticate import TOKEN_FILE
+        creds = Credentials.from_authorized_user_file(TOKEN_FILE, SCOPES)
+        _service = build('drive', 'v3', credentials=creds)
+    return _service
 
 def download_folder(folder_id, local_path):
+    from googleapiclient.http import MediaIoBaseDownload
+    service = get_service()
     if not os.path.exists(local_path):
         os.makedirs(local_path)
 
@@ -51,4 +61,4 @@ def download_folder(folder_id, local_path):
                         print(f"  Progresso: {int(status.progress() * 100)}%")
 
 if __name__ == "__main__":
-    download_folder(CV_FOLDER_ID, "./banco-de-talentos")
+    download_folder(get_cv_folder_id(), "./banco-de-talentos")
@@ -0,0 +1,321 @@
+import os
+import json
+import time
+import threading
+import logging
+import multiprocessing
+from typing import Dict, Any, List, Optional, Tuple
+
+from utils_cv import extract_raw_text_from_file, file_digest
+
+logger = logging.getLogger(__name__)
+
+# ---------- CONFIGURAÇÃO ----------
+# Tempo máximo (s) de extração de um arquivo antes de matar o processo
+EXTRACT_TIMEOUT = 60.0
+# Limite de memória (RLIMIT_AS) de cada processo de extração
+MEMORY_LIMIT_MB = 1024
+# Cada processo é trocado por um novo após N arquivos (libera memória fragmentada/vazada)
+MAX_TASKS_PER_WORKER = 50
+# Tempo máximo (s) para um processo novo ficar pronto (spawn + imports)
+STARTUP_TIMEOUT = 30.0
+QUARANTINE_FILE = "quarantine.json"
+
+TIMEOUT = "timeout"
+MEMORY = "memory"
+CRASH = "crash"
+# Falha do ambiente (processo que não inicia): o arquivo não vai para a quarentena
+INFRA = "infra"
+
+
+class WorkerStartError(Exception):
+    """O processo de extração não ficou pronto: problema do ambiente, não do arquivo."""
+
+
+def _limit_memory(memory_mb: int):
+    try:
+        import resource  # só existe em sistemas POSIX
+    except ImportError:
+        return
+    limit = memory_mb * 1024 * 1024
+    try:
+        resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+    except (ValueError, OSError) as e:
+        logger.warning(f"Não foi possível limitar a memória do processo de extração: {e}")
+
+
+def _worker_main(conn, memory_mb: int):
+    """Laço do processo de extração: recebe caminhos e devolve ('ok', texto)."""
+    if memory_mb:
+        _limit_memory(memory_mb)
+    # Avisa o pai que o processo iniciou: falhas antes disso não são culpa de um arquivo
+    conn.send(("ready", os.getpid()))
+    while True:
+        try:
+            cv_path = conn.recv()
+        except (EOFError, KeyboardInterrupt):
+            return
+        if cv_path is None:
+            return
+        try:
+            conn.send(("ok", extract_raw_text_from_file(cv_path)))
+        except MemoryError:
+            conn.send((MEMORY, f"limite de {memory_mb} MB excedido"))
+            return
+        except Exception as e:
+            conn.send(("error", f"{type(e).__name__}: {e}"))
+
+
+class Quarantine:
+    """
+    Arquivos que travaram, estouraram a memória ou derrubaram o processo de
+    extração, por digest do conteúdo (um CV substituído sai da quarentena).
+    Gravado em `quarantine.json` com o motivo da falha.
+    """
+
+    def __init__(self, path: str = QUARANTINE_FILE):
+        self.path = path
+        self._lock = threading.Lock()
+        self._mtime = None
+        self._entries = self._load()
+
+    def _load(self) -> Dict[str, Dict[str, Any]]:
+        try:
+            self._mtime = os.stat(self.path).st_mtime_ns
+            with open(self.path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except json.JSONDecodeError as e:
+            logger.error(f"'{self.path}' inválido ({e}). Quarentena ignorada.")
+            return {}
+
+    def _save(self):
+        tmp_path = f"{self.path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self._entries, f, ensure_ascii=False, indent=2)
+        os.replace(tmp_path, self.path)
+        self._mtime = os.stat(self.path).st_mtime_ns
+
+    def get(self, digest: str) -> Optional[Dict[str, Any]]:
+        # Relido quando outro processo (ou o --release) altera o arquivo
+        try:
+            mtime = os.stat(self.path).st_mtime_ns
+        except FileNotFoundError:
+            mtime = None
+        if mtime != self._mtime:
+            with self._lock:
+                self._entries = self._load()
+        return self._entries.get(digest)
+
+    def add(self, digest: str, cv_path: str, reason: str, detail: str):
+        with self._lock:
+            # Relê o arquivo: outros processos (--queue) podem ter registrado arquivos
+            self._entries = {**self._load(), digest: {
+                "path": cv_path, "reason": reason, "detail": detail, "ts": time.time(),
+            }}
+            self._save()
+
+    def release(self, digest: Optional[str] = None) -> int:
+        """Remove da quarentena os arquivos cujo digest começa com `digest` (ou todos). Retorna quantos saíram."""
+        with self._lock:
+            self._entries = self._load()
+            released = [d for d in self._entries if digest is None or d.startswith(digest)]
+            for d in released:
+                del self._entries[d]
+            self._save()
+        return len(released)
+
+    def entries(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return dict(self._entries)
+
+
+class _Worker:
+    def __init__(self, ctx, memory_mb: int, startup_timeout: float = STARTUP_TIMEOUT):
+        self.conn, child_conn = ctx.Pipe()
+        self.process = ctx.Process(target=_worker_main, args=(child_conn, memory_mb), daemon=True)
+        try:
+            self.process.start()
+        except Exception as e:
+            self.conn.close()
+            raise WorkerStartError(f"falha ao iniciar o processo de extração: {e}") from e
+        finally:
+            child_conn.close()
+        self.tasks = 0
+        try:
+            if self.conn.poll(startup_timeout) and self.conn.recv()[0] == "ready":
+                return
+            detail = f"sem sinal de pronto em {startup_timeout:g}s"
+        except (EOFError, OSError):
+            self.process.join(timeout=1)
+            detail = f"terminou ao iniciar (código {self.process.exitcode})"
+        self.kill()
+        raise WorkerStartError(f"processo de extração {detail}")
+
+    def kill(self):
+        self.process.kill()
+        self.process.join(timeout=1)
+        self.conn.close()
+
+    def close(self):
+        try:
+            self.conn.send(None)
+            self.process.join(timeout=1)
+        except (OSError, ValueError):
+            pass
+        if self.process.is_alive():
+            self.process.kill()
+        self.conn.close()
+
+
+class ExtractionPool:
+    """
+    Extração de texto dos CVs em processos separados e reciclados, para que
+    um PDF corrompido ou malicioso não trave nem derrube as threads do
+    `process_cvs`. Cada arquivo tem `timeout` segundos e cada processo um
+    limite de memória (RLIMIT_AS); quem estoura vai para a quarentena e o
+    processo é substituído.
+
+    Com `isolated=False` a extração roda na própria thread (como antes),
+    mas os arquivos em quarentena continuam sendo pulados.
+    """
+
+    def __init__(
+        self,
+        workers: Optional[int] = None,
+        timeout: float = EXTRACT_TIMEOUT,
+        memory_mb: int = MEMORY_LIMIT_MB,
+        max_tasks_per_worker: int = MAX_TASKS_PER_WORKER,
+        quarantine: Optional[Quarantine] = None
+    ):
+        self.workers = workers or os.cpu_count() or 2
+        self.timeout = timeout
+        self.memory_mb = memory_mb
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.isolated = True
+        self.quarantine = quarantine or Quarantine()
+        # spawn: o processo pai tem várias threads, e fork com threads pode travar
+        self._ctx = multiprocessing.get_context("spawn")
+        self._slots = threading.BoundedSemaphore(self.workers)
+        self._idle: List[_Worker] = []
+        self._lock = threading.Lock()
+        self._stats = {
+            'extracted': 0, 'timeouts': 0, 'memory': 0, 'crashes': 0,
+            'errors': 0, 'skipped_quarantined': 0, 'workers_started': 0,
+            'crash_retries': 0, 'infra_errors': 0,
+        }
+
+    def _count(self, key: str):
+        with self._lock:
+            self._stats[key] += 1
+
+    def _checkout(self, fresh: bool = False) -> _Worker:
+        """Um processo ocioso (ou novo, com `fresh`). Levanta WorkerStartError se o novo não iniciar."""
+        with self._lock:
+            if self._idle and not fresh:
+                return self._idle.pop()
+            self._stats['workers_started'] += 1
+        return _Worker(self._ctx, self.memory_mb)
+
+    def _checkin(self, worker: _Worker):
+        worker.tasks += 1
+        if worker.tasks >= self.max_tasks_per_worker:
+            worker.close()
+            return
+        with self._lock:
+            self._idle.append(worker)
+
+    def _run(self, cv_path: str) -> Tuple[str, Any]:
+        """
+        Extrai em um processo. Uma queda é repetida uma vez em um processo
+        novo (o anterior pode ter sido morto de fora enquanto ocioso); só a
+        segunda queda é atribuída ao arquivo.
+        """
+        for attempt in range(2):
+            try:
+                worker = self._checkout(fresh=attempt > 0)
+            except WorkerStartError as e:
+                return INFRA, str(e)
+            status, payload = self._attempt(worker, cv_path)
+            if status != CRASH or attempt:
+                return status, payload
+            self._count('crash_retries')
+            logger.warning(f"Extração de {os.path.basename(cv_path)} caiu ({payload}). Repetindo em um processo novo.")
+
+    def _attempt(self, worker: _Worker, cv_path: str) -> Tuple[str, Any]:
+        try:
+            worker.conn.send(cv_path)
+            if not worker.conn.poll(self.timeout):
+                worker.kill()
+                return TIMEOUT, f"sem resposta em {self.timeout:g}s"
+            status, payload = worker.conn.recv()
+        except (EOFError, OSError):
+            worker.process.join(timeout=1)
+            exitcode = worker.process.exitcode
+            worker.kill()
+            return CRASH, f"processo de extração terminou (código {exitcode})"
+        if status == MEMORY:
+            worker.kill()
+        else:
+            self._checkin(worker)
+        return status, payload
+
+    def extract(self, cv_path: str) -> Optional[str]:
+        """
+        Texto bruto do CV, ou None se o arquivo está (ou acabou de entrar) em
+        quarentena. Falhas comuns de leitura devolvem "" como a extração direta.
+        """
+        digest = file_digest(cv_path)
+        entry = self.quarantine.get(digest)
+        if entry:
+            self._count('skipped_quarantined')
+            logger.warning(f"CV {os.path.basename(cv_path)} em quarentena ({entry.get('reason')}: {entry.get('detail')}). Pulando.")
+            return None
+        if not self.isolated:
+            return extract_raw_text_from_file(cv_path)
+
+        with self._slots:
+            status, payload = self._run(cv_path)
+        if status == "ok":
+            self._count('extracted')
+            return payload
+        if status == "error":
+            self._count('errors')
+            logger.error(f"Erro ao extrair texto de {os.path.basename(cv_path)}: {payload}")
+            return ""
+        if status == INFRA:
+            # Falha do ambiente: o CV fica fora da quarentena e volta na próxima execução
+            self._count('infra_errors')
+            logger.error(f"Não foi possível extrair {os.path.basename(cv_path)}: {payload}.")
+            return None
+        self._count({TIMEOUT: 'timeouts', MEMORY: 'memory', CRASH: 'crashes'}[status])
+        self.quarantine.add(digest, cv_path, status, payload)
+        logger.error(f"CV {os.path.basename(cv_path)} enviado para a quarentena ({status}: {payload}).")
+        return None
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return dict(self._stats)
+
+    def close(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for worker in idle:
+            worker.close()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Arquivos em quarentena na extração de texto dos CVs.")
+    parser.add_argument("--list", action="store_true", help=f"Lista os arquivos em '{QUARANTINE_FILE}'.")
+    parser.add_argument("--release", metavar="DIGEST", help="Tira um arquivo da quarentena (ou 'all' para todos).")
+    args = parser.parse_args()
+    quarantine = Quarantine()
+    if args.release:
+        released = quarantine.release(None if args.release == "all" else args.release)
+        print(f"{released} arquivo(s) liberado(s) da quarentena.")
+    else:
+        for digest, entry in quarantine.entries().items():
+            print(f"{digest[:12]}  {entry['reason']:<8} {entry['path']}  ({entry.get('detail')})")
@@ -0,0 +1,419 @@
+import re
+import json
+import time
+import uuid
+import random
+import hashlib
+import logging
+import threading
+from dataclasses import dataclass, field
+from email.parser import BytesParser
+from email.policy import default as default_policy
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# ---------- CONFIGURAÇÃO ----------
+DEFAULT_PORT = 8765
+API_PREFIX = "/openai/v1"
+# Tempo (s) que um batch fica "in_progress" antes de ser concluído
+BATCH_DELAY = 2.0
+# Cache de prompt simulado: prefixos em blocos de 512 caracteres (~128 tokens)
+CACHE_BLOCK_CHARS = 512
+
+
+class PromptPrefixCache:
+    """Imita o cache de prompt do provedor: conta como "cacheado" o maior prefixo, em blocos, já visto antes."""
+
+    def __init__(self, block_chars: int = CACHE_BLOCK_CHARS):
+        self.block_chars = block_chars
+        self._seen = set()
+        self._lock = threading.Lock()
+
+    def cached_tokens(self, prompt: str) -> int:
+        blocks = [hashlib.sha256(prompt[:end].encode('utf-8')).digest() for end in range(self.block_chars, len(prompt) + 1, self.block_chars)]
+        with self._lock:
+            hits = next((i for i, block in enumerate(blocks) if block not in self._seen), len(blocks))
+            self._seen.update(blocks)
+        return hits * self.block_chars // 4
+
+
+prompt_cache = PromptPrefixCache()
+
+# Desfechos de uma requisição de chat com falhas injetadas
+OK = "ok"
+RATE_LIMITED = "rate_limited"
+HUNG = "hung"
+MALFORMED = "malformed"
+
+
+@dataclass
+class FaultProfile:
+    """
+    Comportamento das requisições de chat: distribuição da latência e
+    frações de respostas 429, conexões que travam (e caem sem resposta) e
+    respostas com JSON quebrado. `canned` substitui as análises geradas por
+    respostas fixas (escolhidas pelo prompt, no formato que o prompt pede).
+    """
+
+    latency: str = "fixed"  # fixed | uniform | lognormal
+    latency_ms: float = 0.0  # fixed: o valor; uniform: o máximo; lognormal: a mediana
+    latency_sigma: float = 0.5
+    rate_limit_rate: float = 0.0
+    retry_after: float = 1.0
+    hang_rate: float = 0.0
+    hang_seconds: float = 30.0
+    malformed_rate: float = 0.0
+    canned: List[Dict[str, Any]] = field(default_factory=list)
+    seed: Optional[int] = None
+
+    def __post_init__(self):
+        self._rng = random.Random(self.seed)
+        self._lock = threading.Lock()
+
+    def plan(self) -> tuple:
+        """(desfecho, latência em segundos) da próxima requisição."""
+        with self._lock:
+            draw = self._rng.random()
+            if self.latency == "lognormal" and self.latency_ms > 0:
+                delay = self._rng.lognormvariate(0.0, self.latency_sigma) * self.latency_ms
+            elif self.latency == "uniform":
+                delay = self._rng.uniform(0.0, self.latency_ms)
+            else:
+                delay = self.latency_ms
+        for outcome, rate in ((RATE_LIMITED, self.rate_limit_rate), (HUNG, self.hang_rate), (MALFORMED, self.malformed_rate)):
+            if draw < rate:
+                # 429 responde rápido, como o limite do provedor
+                return outcome, 0.0 if outcome == RATE_LIMITED else delay / 1000
+            draw -= rate
+        return OK, delay / 1000
+
+
+def load_canned(path: str) -> List[Dict[str, Any]]:
+    """Respostas fixas de um arquivo JSON (lista) ou JSONL (um objeto por linha)."""
+    with open(path, 'r', encoding='utf-8') as f:
+        text = f.read()
+    try:
+        data = json.loads(text)
+        return data if isinstance(data, list) else [data]
+    except json.JSONDecodeError:
+        return [json.loads(line) for line in text.splitlines() if line.strip()]
+
+
+class RequestStats:
+    """Contadores do servidor: desfechos, latência servida e repetições do mesmo prompt (retentativas)."""
+
+    def __init__(self):
+        self.outcomes = {OK: 0, RATE_LIMITED: 0, HUNG: 0, MALFORMED: 0}
+        self.latencies: List[float] = []
+        self.prompts: Dict[str, int] = {}
+        self.lock = threading.Lock()
+
+    def record(self, prompt: str, outcome: str, seconds: float):
+        key = hashlib.sha256(prompt.encode('utf-8')).hexdigest()
+        with self.lock:
+            self.outcomes[outcome] += 1
+            self.latencies.append(seconds)
+            self.prompts[key] = self.prompts.get(key, 0) + 1
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self.lock:
+            latencies = sorted(self.latencies)
+            requests = sum(self.outcomes.values())
+            unique = len(self.prompts)
+            outcomes = dict(self.outcomes)
+        pct = lambda p: round(latencies[min(len(latencies) - 1, int(p * len(latencies)))] * 1000, 1) if latencies else None
+        return {
+            "requests": requests,
+            **outcomes,
+            "unique_prompts": unique,
+            "repeated_requests": requests - unique,
+            "latency_ms": {"p50": pct(0.50), "p95": pct(0.95), "p99": pct(0.99)},
+        }
+
+
+def fake_analysis(prompt: str) -> Dict[str, Any]:
+    """
+    Análise determinística no formato pedido pelo prompt: o mesmo prompt
+    sempre gera a mesma nota, o que permite comparar execuções.
+    """
+    seed = int(hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:8], 16)
+    cv_part = prompt.split("CURRÍCULO:", 1)[-1].split("VAGA:", 1)[0]
+    words = re.findall(r"[A-Za-zÀ-ÿ]{3,}", cv_part)
+    return {
+        "score": round((seed % 100) / 10, 1),
+        "total_experience_years": seed % 15,
+        "structured_data": {
+            "name": " ".join(words[:2]) or "Candidato",
+            "formal_education": "Graduação",
+            "hard_skills": sorted({w.lower() for w in words[2:40]})[:12],
+            "soft_skills": ["Comunicação", "Trabalho em equipe"],
+        },
+        "conclusion": "## Pontos de Alinhamento\n- Experiência compatível\n\n## Pontos de Desalinhamento\n- Nenhum relevante\n\n## Pontos de Atenção\n- Resposta gerada pelo servidor local",
+    }
+
+
+def fake_compact_analysis(prompt: str) -> Dict[str, Any]:
+    """A mesma análise no formato de resposta compacto."""
+    full = fake_analysis(prompt)
+    data = full["structured_data"]
+    return {
+        "s": full["score"], "y": full["total_experience_years"],
+        "n": data["name"], "e": data["formal_education"], "h": data["hard_skills"], "k": data["soft_skills"],
+        "a": ["Experiência compatível"], "m": ["Nenhum relevante"], "t": ["Resposta gerada pelo servidor local"],
+    }
+
+
+def fake_facts_analysis(prompt: str) -> Dict[str, Any]:
+    """Os fatos da mesma análise (formato de resposta 'facts')."""
+    seed = int(hashlib.sha256(prompt.encode('utf-8')).hexdigest()[16:24], 16)
+    compact = fake_compact_analysis(prompt)
+    skills = compact["h"]
+    split = seed % (len(skills) + 1)
+    facts = {"r": round((seed % 11) / 10, 1), "hm": skills[:split], "hx": skills[split:split + 3], "ed": round((seed % 3) / 2, 1), "d": ["Certificação"] * (seed % 3)}
+    return {"y": compact["y"], **facts, **{k: compact[k] for k in ("n", "e", "h", "k", "a", "m", "t")}}
+
+
+def _prompt(body: Dict[str, Any]) -> str:
+    return "\n".join(m.get("content") or "" for m in body.get("messages", []))
+
+
+def chat_completion(body: Dict[str, Any], canned: Optional[List[Dict[str, Any]]] = None) -> Dict[str, Any]:
+    """Resposta de /chat/completions no formato da API da OpenAI."""
+    prompt = _prompt(body)
+    compact = '{"s":' in prompt
+    if canned:
+        seed = int(hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:8], 16)
+        analysis = dict(canned[seed % len(canned)])
+    elif '"hm":' in prompt:
+        analysis = fake_facts_analysis(prompt)
+    else:
+        analysis = fake_compact_analysis(prompt) if compact else fake_analysis(prompt)
+    if "CONFIANÇA:" in prompt:
+        # Modelo rápido da cascata: confiança determinística a partir do prompt
+        seed = int(hashlib.sha256(prompt.encode('utf-8')).hexdigest()[8:16], 16)
+        analysis["c" if compact else "confidence"] = round(0.4 + (seed % 60) / 100, 2)
+    content = json.dumps(analysis, ensure_ascii=False)
+    return {
+        "id": f"chatcmpl-{uuid.uuid4().hex}",
+        "object": "chat.completion",
+        "created": int(time.time()),
+        "model": body.get("model", "fake"),
+        "choices": [{"index": 0, "message": {"role": "assistant", "content": content}, "finish_reason": "stop"}],
+        "usage": {
+            "prompt_tokens": len(prompt) // 4, "completion_tokens": len(content) // 4, "total_tokens": (len(prompt) + len(content)) // 4,
+            "prompt_tokens_details": {"cached_tokens": prompt_cache.cached_tokens(prompt)},
+        },
+    }
+
+
+class FakeLLMState:
+    """Arquivos e batches mantidos em memória pelo servidor."""
+
+    def __init__(self, batch_delay: float = BATCH_DELAY, faults: Optional[FaultProfile] = None):
+        self.batch_delay = batch_delay
+        self.faults = faults or FaultProfile()
+        self.stats = RequestStats()
+        self.files: Dict[str, bytes] = {}
+        self.batches: Dict[str, Dict[str, Any]] = {}
+        self.lock = threading.Lock()
+
+    def add_file(self, content: bytes) -> str:
+        file_id = f"file_{uuid.uuid4().hex}"
+        with self.lock:
+            self.files[file_id] = content
+        return file_id
+
+    def create_batch(self, input_file_id: str) -> Optional[Dict[str, Any]]:
+        with self.lock:
+            if input_file_id not in self.files:
+                return None
+            total = sum(1 for line in self.files[input_file_id].splitlines() if line.strip())
+            batch = {
+                "id": f"batch_{uuid.uuid4().hex}",
+                "object": "batch",
+                "endpoint": "/v1/chat/completions",
+                "input_file_id": input_file_id,
+                "status": "in_progress",
+                "output_file_id": None,
+                "error_file_id": None,
+                "created_at": int(time.time()),
+                "request_counts": {"total": total, "completed": 0, "failed": 0},
+            }
+            self.batches[batch["id"]] = batch
+        threading.Timer(self.batch_delay, self._complete, args=(batch["id"],)).start()
+        return batch
+
+    def _complete(self, batch_id: str):
+        with self.lock:
+            batch = self.batches[batch_id]
+            lines = []
+            for raw in self.files[batch["input_file_id"]].splitlines():
+                if not raw.strip():
+                    continue
+                request = json.loads(raw)
+                lines.append(json.dumps({
+                    "id": f"batch_req_{uuid.uuid4().hex}",
+                    "custom_id": request["custom_id"],
+                    "response": {"status_code": 200, "request_id": uuid.uuid4().hex, "body": chat_completion(request["body"], self.faults.canned)},
+                    "error": None,
+                }, ensure_ascii=False))
+            output_id = f"file_{uuid.uuid4().hex}"
+            self.files[output_id] = ("\n".join(lines) + "\n").encode('utf-8')
+            batch.update(status="completed", output_file_id=output_id, completed_at=int(time.time()))
+            batch["request_counts"]["completed"] = len(lines)
+
+
+class FakeLLMHandler(BaseHTTPRequestHandler):
+    """Endpoints compatíveis com a API da OpenAI/Groq usados pelo projeto."""
+
+    state: FakeLLMState = None
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def _send_json(self, payload: Dict[str, Any], status: int = 200):
+        data = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+        self.send_response(status)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _read_body(self) -> bytes:
+        return self.rfile.read(int(self.headers.get("Content-Length") or 0))
+
+    def _path(self) -> str:
+        path = self.path.split("?", 1)[0]
+        return path[len(API_PREFIX):] if path.startswith(API_PREFIX) else path
+
+    def do_POST(self):
+        path = self._path()
+        if path == "/files":
+            message = BytesParser(policy=default_policy).parsebytes(
+                f"Content-Type: {self.headers['Content-Type']}\r\n\r\n".encode('utf-8') + self._read_body()
+            )
+            content = next((part.get_payload(decode=True) for part in message.iter_parts() if part.get_filename()), None)
+            if content is None:
+                return self._send_json({"error": {"message": "arquivo ausente"}}, 400)
+            return self._send_json({"id": self.state.add_file(content), "object": "file", "purpose": "batch"})
+        if path == "/batches":
+            body = json.loads(self._read_body() or b"{}")
+            batch = self.state.create_batch(body.get("input_file_id"))
+            if batch is None:
+                return self._send_json({"error": {"message": "input_file_id inválido"}}, 404)
+            return self._send_json(batch)
+        if path == "/chat/completions":
+            return self._chat(json.loads(self._read_body() or b"{}"))
+        self._send_json({"error": {"message": "não encontrado"}}, 404)
+
+    def _chat(self, body: Dict[str, Any]):
+        faults = self.state.faults
+        outcome, delay = faults.plan()
+        self.state.stats.record(_prompt(body), outcome, delay)
+        time.sleep(delay)
+        if outcome == RATE_LIMITED:
+            data = json.dumps({"error": {"message": "Rate limit reached. Please try again later.", "type": "requests", "code": "rate_limit_exceeded"}}).encode('utf-8')
+            self.send_response(429)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Retry-After", f"{faults.retry_after:g}")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+            return
+        if outcome == HUNG:
+            # Segura a conexão e a derruba sem resposta (o cliente vê erro de conexão/timeout)
+            time.sleep(faults.hang_seconds)
+            self.close_connection = True
+            return
+        completion = chat_completion(body, faults.canned)
+        if outcome == MALFORMED:
+            content = completion["choices"][0]["message"]["content"]
+            completion["choices"][0]["message"]["content"] = content[:len(content) // 2]
+        if body.get("stream"):
+            return self._send_stream(completion)
+        self._send_json(completion)
+
+    def _send_stream(self, completion: Dict[str, Any]):
+        """A mesma resposta em server-sent events, em pedaços de 16 caracteres."""
+        self.send_response(200)
+        self.send_header("Content-Type", "text/event-stream")
+        self.end_headers()
+        content = completion["choices"][0]["message"]["content"]
+        base = {k: completion[k] for k in ("id", "created", "model")}
+        for start in range(0, len(content), 16):
+            chunk = {**base, "object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {"content": content[start:start + 16]}, "finish_reason": None}]}
+            self.wfile.write(f"data: {json.dumps(chunk, ensure_ascii=False)}\n\n".encode('utf-8'))
+        last = {**base, "object": "chat.completion.chunk", "choices": [{"index": 0, "delta": {}, "finish_reason": "stop"}], "x_groq": {"usage": completion["usage"]}}
+        self.wfile.write(f"data: {json.dumps(last)}\n\ndata: [DONE]\n\n".encode('utf-8'))
+        self.close_connection = True
+
+    def do_GET(self):
+        path = self._path()
+        if path == "/stats":
+            return self._send_json(self.state.stats.snapshot())
+        match = re.fullmatch(r"/files/([^/]+)/content", path)
+        if match:
+            content = self.state.files.get(match.group(1))
+            if content is None:
+                return self._send_json({"error": {"message": "arquivo não encontrado"}}, 404)
+            self.send_response(200)
+            self.send_header("Content-Type", "application/octet-stream")
+            self.send_header("Content-Length", str(len(content)))
+            self.end_headers()
+            self.wfile.write(content)
+            return
+        match = re.fullmatch(r"/batches/([^/]+)", path)
+        if match and match.group(1) in self.state.batches:
+            with self.state.lock:
+                return self._send_json(dict(self.state.batches[match.group(1)]))
+        self._send_json({"error": {"message": "não encontrado"}}, 404)
+
+
+def make_server(port: int = DEFAULT_PORT, batch_delay: float = BATCH_DELAY, faults: Optional[FaultProfile] = None) -> ThreadingHTTPServer:
+    """Cria o servidor (porta 0 = porta livre qualquer). Use `serve_forever()` para iniciar."""
+    handler = type("Handler", (FakeLLMHandler,), {"state": FakeLLMState(batch_delay, faults)})
+    return ThreadingHTTPServer(("127.0.0.1", port), handler)
+
+
+def add_fault_arguments(parser):
+    """Opções de latência e falhas injetadas (compartilhadas com o load_test.py)."""
+    parser.add_argument("--latency", choices=("fixed", "uniform", "lognormal"), default="fixed", help="Distribuição da latência das respostas de chat.")
+    parser.add_argument("--latency-ms", type=float, default=0.0, help="fixed: a latência; uniform: o máximo; lognormal: a mediana (ms).")
+    parser.add_argument("--latency-sigma", type=float, default=0.5, help="Desvio (em log) da distribuição lognormal.")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0, help="Fração das requisições respondidas com 429.")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Valor do cabeçalho Retry-After dos 429 (s).")
+    parser.add_argument("--hang-rate", type=float, default=0.0, help="Fração das requisições que travam e caem sem resposta.")
+    parser.add_argument("--hang-seconds", type=float, default=30.0, help="Quanto tempo a requisição travada segura a conexão (s).")
+    parser.add_argument("--malformed-rate", type=float, default=0.0, help="Fração das respostas com JSON cortado pela metade.")
+    parser.add_argument("--canned", help="Arquivo JSON/JSONL com respostas fixas, usadas no lugar das geradas.")
+    parser.add_argument("--seed", type=int, help="Semente das falhas e latências (execuções reproduzíveis).")
+
+
+def faults_from_args(args) -> FaultProfile:
+    return FaultProfile(
+        latency=args.latency, latency_ms=args.latency_ms, latency_sigma=args.latency_sigma,
+        rate_limit_rate=args.rate_limit_rate, retry_after=args.retry_after,
+        hang_rate=args.hang_rate, hang_seconds=args.hang_seconds,
+        malformed_rate=args.malformed_rate,
+        canned=load_canned(args.canned) if args.canned else [],
+        seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Servidor local que imita a API da Groq/OpenAI (chat e batch) para testes.")
+    parser.add_argument("--port", type=int, default=DEFAULT_PORT)
+    parser.add_argument("--batch-delay", type=float, default=BATCH_DELAY, help="Segundos até um batch ser concluído.")
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+    server = make_server(args.port, args.batch_delay, faults_from_args(args))
+    logger.info(f"Servidor local em http://127.0.0.1:{server.server_port}{API_PREFIX} (GROQ_BATCH_BASE_URL; GROQ_API_BASE=http://127.0.0.1:{server.server_port}). Contadores em GET /stats.")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,264 @@
+import math
+import time
+import asyncio
+import threading
+import logging
+from collections import deque
+from typing import Callable, Optional, Dict, Any
+
+from concurrency import is_overload_error
+
+logger = logging.getLogger(__name__)
+
+# ---------- CONFIGURAÇÃO ----------
+HEDGE_PERCENTILE = 0.95
+# Fração máxima das requisições que pode virar uma cópia (hedge)
+HEDGE_BUDGET = 0.05
+# Amostras mínimas no histograma antes de começar a duplicar requisições
+MIN_SAMPLES = 20
+# Janela do histograma (últimas N latências)
+WINDOW = 500
+
+
+class LatencyHistogram:
+    """
+    Histograma de latências com baldes em escala logarítmica (~10% de
+    resolução, de 50 ms a 30 min) sobre uma janela deslizante das últimas
+    `window` amostras. Percentis são calculados somando os baldes.
+    """
+
+    MIN_LATENCY = 0.05
+    GROWTH = 1.1
+
+    def __init__(self, window: int = WINDOW):
+        self.window = window
+        self._buckets_count = int(math.log(1800 / self.MIN_LATENCY, self.GROWTH)) + 2
+        self._counts = [0] * self._buckets_count
+        self._samples = deque()
+        self._lock = threading.Lock()
+
+    def _bucket(self, latency: float) -> int:
+        if latency <= self.MIN_LATENCY:
+            return 0
+        return min(int(math.log(latency / self.MIN_LATENCY, self.GROWTH)) + 1, self._buckets_count - 1)
+
+    def _upper_bound(self, bucket: int) -> float:
+        return self.MIN_LATENCY * self.GROWTH ** bucket
+
+    def record(self, latency: float):
+        bucket = self._bucket(latency)
+        with self._lock:
+            self._samples.append(bucket)
+            self._counts[bucket] += 1
+            if len(self._samples) > self.window:
+                self._counts[self._samples.popleft()] -= 1
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, p: float) -> Optional[float]:
+        """Limite superior do balde que contém o percentil `p` (0–1)."""
+        with self._lock:
+            total = len(self._samples)
+            if not total:
+                return None
+            target = max(1, math.ceil(p * total))
+            seen = 0
+            for bucket, count in enumerate(self._counts):
+                seen += count
+                if seen >= target:
+                    return self._upper_bound(bucket)
+        return None
+
+
+class HedgedInvoker:
+    """
+    Envia a requisição ao modelo principal e, se ela passar do percentil
+    `percentile` das latências recentes, dispara uma cópia (hedge) para o
+    cliente alternativo (outra chave ou modelo). A primeira resposta válida
+    vence e a outra é cancelada (a conexão HTTP é fechada).
+
+    As chamadas assíncronas (`ainvoke`) rodam em um único event loop em
+    segundo plano, compartilhado por todas as threads de trabalho. O total
+    de cópias é limitado a `budget` das requisições (balde de créditos).
+
+    A cópia é uma requisição a mais: só sai se houver um slot livre no
+    controle de concorrência e se o orçamento da execução a reservar. A
+    requisição que perde a corrida (cancelada ou inválida) é cobrada aqui;
+    a que é devolvida fica por conta de quem chamou.
+    """
+
+    def __init__(
+        self,
+        primary,
+        hedge=None,
+        percentile: float = HEDGE_PERCENTILE,
+        budget: float = HEDGE_BUDGET,
+        min_samples: int = MIN_SAMPLES
+    ):
+        self.primary = primary
+        self.hedge = hedge or primary
+        self.percentile = percentile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.histogram = LatencyHistogram()
+        self._credits = 1.0
+        self._stats = {'requests': 0, 'hedged': 0, 'hedge_wins': 0}
+        self._lock = threading.Lock()
+        self._loop = None
+        self._loop_lock = threading.Lock()
+
+    # ---------- EVENT LOOP ----------
+    def _get_loop(self) -> asyncio.AbstractEventLoop:
+        if self._loop is None:
+            with self._loop_lock:
+                if self._loop is None:
+                    loop = asyncio.new_event_loop()
+                    threading.Thread(target=loop.run_forever, name="llm-hedging", daemon=True).start()
+                    self._loop = loop
+        return self._loop
+
+    # ---------- ORÇAMENTO ----------
+    def _take_credit(self) -> bool:
+        with self._lock:
+            if self._credits >= 1.0:
+                self._credits -= 1.0
+                self._stats['hedged'] += 1
+                return True
+            return False
+
+    def _refund_credit(self):
+        with self._lock:
+            self._credits += 1.0
+            self._stats['hedged'] -= 1
+
+    def _acquire_hedge(self, limiter, run_budget) -> Optional[float]:
+        """Crédito, slot de concorrência (sem esperar) e orçamento para uma cópia. Retorna o início do slot, ou None."""
+        if not self._take_credit():
+            return None
+        started = limiter.try_acquire() if limiter is not None else time.monotonic()
+        if started is not None and (run_budget is None or run_budget.reserve()):
+            return started
+        if started is not None and limiter is not None:
+            limiter.release(started, 'cancelled')
+        self._refund_credit()
+        return None
+
+    def threshold(self) -> Optional[float]:
+        """Latência a partir da qual uma cópia é enviada (None = ainda sem dados)."""
+        if len(self.histogram) < self.min_samples:
+            return None
+        return self.histogram.percentile(self.percentile)
+
+    def _settle(self, hedge, loser, prompt: str, hedge_started: float, limiter, run_budget, on_extra_call):
+        """
+        Depois da corrida: devolve o slot da cópia (`hedge`) e cobra a
+        requisição que não foi devolvida (`loser`, a cópia ou a principal).
+        """
+        if limiter is not None:
+            if not hedge.done() or hedge.cancelled():
+                outcome = 'cancelled'
+            elif hedge.exception() is not None:
+                outcome = 'overload' if is_overload_error(hedge.exception()) else 'error'
+            else:
+                outcome = 'ok'
+            limiter.release(hedge_started, outcome)
+        if loser.done() and not loser.cancelled() and loser.exception() is not None:
+            return
+        client = self.hedge if loser is hedge else self.primary
+        model = getattr(client, 'model_name', None)
+        if loser.done() and not loser.cancelled():
+            response = loser.result()
+            usage = getattr(response, 'usage_metadata', None) or {}
+            model = (getattr(response, 'response_metadata', None) or {}).get('model_name') or model
+            input_tokens = usage.get('input_tokens') or len(prompt) // 4
+            output_tokens = usage.get('output_tokens') or len(getattr(response, 'content', None) or "") // 4
+            if on_extra_call is not None:
+                on_extra_call(response, time.monotonic() - hedge_started)
+        else:
+            # Cancelada no meio: o provedor já processou o prompt, a saída parcial não é conhecida
+            input_tokens, output_tokens = len(prompt) // 4, 0
+        if run_budget is not None:
+            run_budget.charge(model, input_tokens, output_tokens)
+
+    # ---------- CHAMADA ----------
+    def invoke(
+        self,
+        prompt: str,
+        is_valid: Callable[[Any], bool] = lambda r: bool(getattr(r, 'content', None)),
+        limiter=None,
+        run_budget=None,
+        on_extra_call: Optional[Callable[[Any, float], None]] = None,
+        **kwargs
+    ):
+        """
+        Versão síncrona (para as threads de trabalho) de `_invoke`. `kwargs` vão para a API (ex.: max_tokens).
+
+        A cópia ocupa um slot de `limiter` (concurrency.ConcurrencyController)
+        e é reservada em `run_budget` (token_budget.RunBudget). A requisição
+        perdedora que chegou a terminar é entregue a `on_extra_call(resposta, latência)`.
+        """
+        with self._lock:
+            self._stats['requests'] += 1
+            # Cada requisição rende `budget` créditos; cada cópia custa 1
+            self._credits = min(self._credits + self.budget, 10.0)
+        future = asyncio.run_coroutine_threadsafe(
+            self._invoke(prompt, is_valid, kwargs, limiter, run_budget, on_extra_call), self._get_loop()
+        )
+        return future.result()
+
+    async def _invoke(self, prompt: str, is_valid, kwargs, limiter=None, run_budget=None, on_extra_call=None):
+        started = time.monotonic()
+        primary = asyncio.ensure_future(self.primary.ainvoke(prompt, **kwargs))
+        threshold = self.threshold()
+        done, _ = await asyncio.wait({primary}, timeout=threshold)
+        hedge_started = None if done else self._acquire_hedge(limiter, run_budget)
+        if hedge_started is None:
+            result = await primary
+            self.histogram.record(time.monotonic() - started)
+            return result
+
+        logger.info(f"Requisição passou de {threshold:.1f}s (p{self.percentile * 100:.0f}). Enviando cópia.")
+        hedge = asyncio.ensure_future(self.hedge.ainvoke(prompt, **kwargs))
+        pending = {primary, hedge}
+        # Se nenhuma resposta for válida: devolve a última inválida ou relança o erro
+        fallback, error, returned = None, None, None
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task is primary:
+                        self.histogram.record(time.monotonic() - started)
+                    if task.exception() is not None:
+                        error = task.exception()
+                    elif is_valid(task.result()):
+                        if task is hedge:
+                            with self._lock:
+                                self._stats['hedge_wins'] += 1
+                        returned = task
+                        return task.result()
+                    else:
+                        fallback = task
+            if fallback is None and error is not None:
+                raise error
+            returned = fallback
+            return fallback.result()
+        finally:
+            for task in pending:
+                task.cancel()
+            if primary in pending:
+                # Principal cancelado: registra o tempo até aqui (limite inferior)
+                self.histogram.record(time.monotonic() - started)
+            # Sem resposta devolvida (erro relançado) só a cópia é desta classe
+            loser = primary if returned is hedge else hedge
+            self._settle(hedge, loser, prompt, hedge_started, limiter, run_budget, on_extra_call)
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            stats = dict(self._stats)
+        stats.update({
+            'p50_seconds': self.histogram.percentile(0.5),
+            'p95_seconds': self.histogram.percentile(0.95),
+            'p99_seconds': self.histogram.percentile(0.99),
+        })
+        return stats
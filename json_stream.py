@@ -0,0 +1,120 @@
+import re
+import json
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+# Caracteres permitidos fora de strings em um JSON (números, literais e estrutura)
+_ALLOWED_OUTSIDE_STRINGS = set(" \t\r\n0123456789+-.eE:,{}[]\"truefalsn")
+# Prefixo tolerado antes do objeto: abertura de bloco de código markdown (```, ```json, ...),
+# inclusive incompleta enquanto os caracteres chegam
+_FENCE = re.compile(r"`{1,3}|```[\w+-]*\s*")
+
+
+class StreamAbort(Exception):
+    """A resposta em streaming não pode mais ser um JSON válido."""
+
+
+class IncrementalJSONParser:
+    """
+    Valida um objeto JSON à medida que os tokens chegam.
+
+    Cada campo de primeiro nível é decodificado assim que termina e
+    entregue a `on_field(chave, valor)` (ex.: `score` antes da conclusão).
+    `feed` levanta StreamAbort no primeiro caractere que torna a resposta
+    impossível de ser um objeto JSON (texto antes do `{`, markdown fora de
+    strings, colchetes trocados, campo que não decodifica) e retorna True
+    quando o objeto fecha, para que o chamador encerre o stream.
+    """
+
+    def __init__(self, on_field: Optional[Callable[[str, Any], None]] = None):
+        self.on_field = on_field
+        self.fields: Dict[str, Any] = {}
+        self._prefix = ""
+        self._buf: List[str] = []
+        self._started = False
+        self._done = False
+        self._in_string = False
+        self._escape = False
+        self._stack: List[str] = []
+        self._member_start = 1
+
+    @property
+    def done(self) -> bool:
+        return self._done
+
+    def text(self) -> str:
+        """O objeto JSON recebido até agora."""
+        return "".join(self._buf)
+
+    def feed(self, chunk: str) -> bool:
+        for char in chunk:
+            if self._done:
+                return True
+            if not self._started:
+                self._feed_prefix(char)
+                continue
+            self._feed_char(char)
+        return self._done
+
+    def _feed_prefix(self, char: str):
+        if char == "{":
+            self._started = True
+            self._buf.append(char)
+            self._stack.append("{")
+            return
+        self._prefix += char
+        stripped = self._prefix.lstrip()
+        # Só espaços ou (parte de) uma cerca ``` com ou sem linguagem são aceitos antes do objeto
+        if stripped and not _FENCE.fullmatch(stripped):
+            raise StreamAbort(f"texto antes do JSON: {stripped[:40]!r}")
+
+    def _feed_char(self, char: str):
+        self._buf.append(char)
+        if self._in_string:
+            if self._escape:
+                self._escape = False
+            elif char == "\\":
+                self._escape = True
+            elif char == '"':
+                self._in_string = False
+            return
+
+        if char not in _ALLOWED_OUTSIDE_STRINGS:
+            raise StreamAbort(f"caractere inesperado fora de string: {char!r}")
+        if char == '"':
+            self._in_string = True
+        elif char in "{[":
+            self._stack.append(char)
+        elif char in "}]":
+            expected = "{" if char == "}" else "["
+            if not self._stack or self._stack[-1] != expected:
+                raise StreamAbort(f"'{char}' sem abertura correspondente")
+            self._stack.pop()
+            if not self._stack:
+                self._close_member(len(self._buf) - 1)
+                self._done = True
+        elif char == "," and len(self._stack) == 1:
+            self._close_member(len(self._buf) - 1)
+            self._member_start = len(self._buf)
+
+    def _close_member(self, end: int):
+        """Decodifica o campo de primeiro nível entre `_member_start` e `end`."""
+        member = "".join(self._buf[self._member_start:end]).strip()
+        if not member:
+            return
+        try:
+            decoded = json.loads("{" + member + "}")
+        except json.JSONDecodeError as e:
+            raise StreamAbort(f"campo inválido: {member[:40]!r} ({e})")
+        for key, value in decoded.items():
+            self.fields[key] = value
+            if self.on_field is not None:
+                self.on_field(key, value)
+
+
+def parse_stream(chunks, on_field: Optional[Callable[[str, Any], None]] = None) -> Tuple[str, Dict[str, Any]]:
+    """Consome `chunks` (strings) até o objeto fechar. Retorna (texto do objeto, campos)."""
+    parser = IncrementalJSONParser(on_field)
+    for chunk in chunks:
+        if parser.feed(chunk):
+            break
+    return parser.text(), parser.fields
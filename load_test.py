@@ -0,0 +1,175 @@
+"""
+Teste de carga do caminho de análise sem gastar cota da Groq.
+
+Gera N CVs sintéticos (.docx) e algumas vagas em um diretório temporário,
+sobe o fake_llm_server.py com a latência e as falhas pedidas e roda o
+`process_cvs.main()` de verdade (extração, fila justa, concorrência
+adaptativa, retentativas e gravação no TinyDB) contra ele. Ao final,
+relata vazão, percentis de latência por análise, retentativas e chamadas
+desperdiçadas (requisições que não viraram análise salva).
+
+    python load_test.py --cvs 200 --openings 4 --latency lognormal --latency-ms 800 --rate-limit-rate 0.05
+"""
+import os
+import sys
+import json
+import time
+import random
+import shutil
+import tempfile
+import threading
+import logging
+from typing import Dict, Any, List, Optional
+
+import process_cvs
+import openings_db_manager
+from fake_llm_server import make_server, add_fault_arguments, faults_from_args
+
+logger = logging.getLogger(__name__)
+
+# ---------- CONFIGURAÇÃO ----------
+VOCABULARY = (
+    "vendas negociacao prospeccao crm excel atendimento cliente metas suporte redes linux python sql "
+    "lideranca comunicacao equipe relatorios power bi financeiro contabilidade logistica estoque "
+    "marketing digital projetos scrum java javascript react docker cloud aws seguranca dados"
+).split()
+FIRST_NAMES = ("Ana", "Bruno", "Carla", "Diego", "Elisa", "Fabio", "Gabriela", "Heitor", "Iara", "Joao")
+LAST_NAMES = ("Silva", "Souza", "Oliveira", "Santos", "Lima", "Costa", "Pereira", "Almeida")
+LEVELS = ("Junior (1 a 2 anos)", "Pleno (3 a 5 anos)", "Senior (mais de 5 anos)")
+
+
+def _percentiles(values: List[float]) -> Dict[str, Optional[float]]:
+    ordered = sorted(values)
+    pick = lambda p: round(ordered[min(len(ordered) - 1, int(p * len(ordered)))], 3) if ordered else None
+    return {"p50": pick(0.50), "p95": pick(0.95), "p99": pick(0.99), "max": round(ordered[-1], 3) if ordered else None}
+
+
+def build_openings(count: int, rng: random.Random) -> Dict[str, Any]:
+    openings = {}
+    for i in range(count):
+        skills = rng.sample(VOCABULARY, 8)
+        openings[str(i + 1)] = {
+            "folder": f"setor_{i % max(1, count // 2 or 1)}",
+            "id": 900000 + i,
+            "title": f"Vaga Sintetica {i + 1}",
+            "intro": " ".join(rng.choices(VOCABULARY, k=40)),
+            "main_activities": " ".join(rng.choices(VOCABULARY, k=60)),
+            "add_infos": "",
+            "pre_requisites": " ".join(rng.choices(VOCABULARY, k=20)),
+            "soft_skills": ["Comunicacao", "Trabalho em equipe"],
+            "hard_skills": skills,
+            "nivel": rng.choice(LEVELS),
+            "local": "Juiz de Fora - MG",
+            "disponibilidade": "Híbrido",
+        }
+    return openings
+
+
+def build_cvs(base_dir: str, folders: List[str], count: int, rng: random.Random) -> int:
+    """Grava `count` CVs .docx distribuídos entre as pastas das vagas."""
+    import docx
+    for i in range(count):
+        folder = os.path.join(base_dir, folders[i % len(folders)])
+        os.makedirs(folder, exist_ok=True)
+        document = docx.Document()
+        document.add_paragraph(f"{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}")
+        for _ in range(rng.randint(6, 20)):
+            document.add_paragraph(" ".join(rng.choices(VOCABULARY, k=12)))
+        document.save(os.path.join(folder, f"cv_sintetico_{i:05d}.docx"))
+    return count
+
+
+def run_load_test(cvs: int, openings: int, faults, seed: int = 0, keep: bool = False, stream: bool = False, response_mode: str = "full") -> Dict[str, Any]:
+    rng = random.Random(seed)
+    workdir = tempfile.mkdtemp(prefix="load_test_")
+    server = make_server(0, faults=faults)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    # O cliente da IA é criado no primeiro uso: basta apontar a API para o servidor local
+    os.environ["GROQ_API_BASE"] = f"http://127.0.0.1:{server.server_port}"
+    os.environ["GROQ_API_KEY"] = "load-test"
+    previous_dir = os.getcwd()
+    try:
+        os.chdir(workdir)
+        job_openings = build_openings(openings, rng)
+        catalog = openings_db_manager.OpeningCatalog(os.path.join(workdir, openings_db_manager.DB_FILE))
+        openings_db_manager._catalog = catalog
+        catalog.save_all(job_openings)
+        build_cvs(process_cvs.CV_BASE_DIR, sorted({o["folder"] for o in job_openings.values()}), cvs, rng)
+        pairs = len(process_cvs.collect_tasks(process_cvs.CV_BASE_DIR, process_cvs.build_folder_to_opening(job_openings)))
+
+        client = process_cvs.get_groq_client()
+        client.streaming = stream
+        client.response_mode = response_mode
+
+        # Tempo de cada análise (todas as retentativas incluídas), medido em volta da chamada real
+        latencies: List[float] = []
+        latencies_lock = threading.Lock()
+        request_full_analysis = process_cvs.request_full_analysis
+
+        def timed_request(*args, **kwargs):
+            started = time.monotonic()
+            try:
+                return request_full_analysis(*args, **kwargs)
+            finally:
+                with latencies_lock:
+                    latencies.append(time.monotonic() - started)
+
+        process_cvs.request_full_analysis = timed_request
+        started = time.monotonic()
+        try:
+            process_cvs.main()
+        finally:
+            process_cvs.request_full_analysis = request_full_analysis
+        elapsed = time.monotonic() - started
+
+        analyses = len(process_cvs.get_database().analysis_records())
+        server_stats = server.RequestHandlerClass.state.stats.snapshot()
+        return {
+            "cvs": cvs,
+            "openings": openings,
+            "pairs": pairs,
+            "analyses": analyses,
+            "failed_pairs": pairs - analyses,
+            "wall_seconds": round(elapsed, 2),
+            "throughput_per_minute": round(analyses / elapsed * 60, 1) if elapsed else None,
+            "analysis_latency_seconds": _percentiles(latencies),
+            # Requisições além de uma por par: retentativas do cliente e do SDK (429)
+            "retries": server_stats["requests"] - pairs,
+            # Requisições que não viraram análise salva (429, quedas, JSON inválido, cópias)
+            "wasted_calls": server_stats["requests"] - analyses,
+            "server": server_stats,
+            "concurrency": process_cvs.get_concurrency().metrics(),
+            "workdir": workdir if keep else None,
+        }
+    finally:
+        os.chdir(previous_dir)
+        server.shutdown()
+        if not keep:
+            shutil.rmtree(workdir, ignore_errors=True)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Teste de carga do process_cvs contra o servidor local (fake_llm_server.py).")
+    parser.add_argument("--cvs", type=int, default=100, help="Número de CVs sintéticos (padrão: 100).")
+    parser.add_argument("--openings", type=int, default=4, help="Número de vagas sintéticas (padrão: 4; duas vagas por pasta).")
+    parser.add_argument("--stream", action="store_true", help="Usa respostas em streaming.")
+    parser.add_argument("--response-mode", choices=("full", "compact", "facts"), default="full")
+    parser.add_argument("--keep", action="store_true", help="Mantém o diretório temporário (applicants.json, metrics/) para inspeção.")
+    parser.add_argument("--out", help="Grava o relatório JSON neste arquivo.")
+    parser.add_argument("--verbose", action="store_true", help="Mostra o log do process_cvs.")
+    add_fault_arguments(parser)
+    args = parser.parse_args()
+    # O process_cvs configura o log em INFO ao ser importado
+    logging.getLogger().setLevel(logging.INFO if args.verbose else logging.WARNING)
+    report = run_load_test(
+        args.cvs, args.openings, faults_from_args(args), seed=args.seed or 0,
+        keep=args.keep, stream=args.stream, response_mode=args.response_mode
+    )
+    text = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.out:
+        with open(args.out, 'w', encoding='utf-8') as f:
+            f.write(text)
+    print(text)
+    sys.exit(0 if report["analyses"] else 1)
@@ -0,0 +1,298 @@
+import re
+import json
+import sqlite3
+import hashlib
+import logging
+from contextlib import contextmanager
+from collections import Counter
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+from scipy import sparse
+
+from ai_prompts import normalize_text
+from blob_store import brief_text
+from search_index import normalize_skill
+
+logger = logging.getLogger(__name__)
+
+# ---------- CONFIGURAÇÃO ----------
+MATCH_DB_FILE = "match_matrix.db"
+TOP_K = 3
+# Peso da similaridade textual (TF-IDF) e da cobertura de skills no score final
+TEXT_WEIGHT = 0.6
+SKILL_WEIGHT = 0.4
+# Reconstrói o vocabulário/IDF quando o corpus cresce mais que esta fração
+REBUILD_GROWTH = 0.2
+
+_STOPWORDS = set("""
+a ao aos as com como da das de do dos e em entre na nas no nos o os ou para pela pelas pelo pelos por que se sem sua suas seu seus um uma
+the and of to in for with on at by an is are
+""".split())
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS matches (
+    cv_digest       TEXT NOT NULL,
+    opening_id      TEXT NOT NULL,
+    rank            INTEGER NOT NULL,
+    similarity      REAL NOT NULL,
+    text_similarity REAL NOT NULL,
+    skill_coverage  REAL NOT NULL,
+    PRIMARY KEY (cv_digest, opening_id)
+);
+CREATE TABLE IF NOT EXISTS state (
+    key   TEXT PRIMARY KEY,
+    value TEXT NOT NULL
+);
+"""
+
+
+# ---------- TEXTO ----------
+def tokenize(text: str) -> List[str]:
+    """Tokens normalizados (sem acentos, minúsculos, sem stopwords)."""
+    text = normalize_text(text or "").lower()
+    return [t for t in re.findall(r"[a-z0-9#+.]{2,}", text) if t not in _STOPWORDS]
+
+
+def opening_text(opening: Dict[str, Any]) -> str:
+    return " ".join(str(opening.get(k) or "") for k in (
+        'title', 'intro', 'main_activities', 'add_infos', 'pre_requisites', 'nivel'
+    )) + " " + " ".join(opening.get('hard_skills') or []) + " " + " ".join(opening.get('soft_skills') or [])
+
+
+def openings_digest(openings: Dict[str, Any]) -> str:
+    """Impressão digital do catálogo de vagas (muda quando uma vaga muda)."""
+    payload = json.dumps(sorted(openings.values(), key=lambda o: str(o.get('id'))), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+# ---------- MATRIZES ----------
+def _l2_normalize(matrix: sparse.csr_matrix) -> sparse.csr_matrix:
+    norms = np.sqrt(np.asarray(matrix.multiply(matrix).sum(axis=1)).ravel())
+    norms[norms == 0] = 1.0
+    return sparse.diags(1.0 / norms) @ matrix
+
+
+def build_vocabulary(documents: List[List[str]]) -> Tuple[Dict[str, int], np.ndarray]:
+    """Vocabulário e IDF suavizado (estilo scikit-learn) de uma lista de documentos tokenizados."""
+    df = Counter()
+    for tokens in documents:
+        df.update(set(tokens))
+    vocabulary = {term: i for i, term in enumerate(sorted(df))}
+    n_docs = len(documents)
+    counts = np.array([df[term] for term in sorted(df)], dtype=np.float64)
+    idf = np.log((1 + n_docs) / (1 + counts)) + 1.0
+    return vocabulary, idf
+
+
+def tfidf_matrix(documents: List[List[str]], vocabulary: Dict[str, int], idf: np.ndarray) -> sparse.csr_matrix:
+    """Matriz esparsa TF-IDF (linhas normalizadas em L2); termos fora do vocabulário são ignorados."""
+    rows, cols, values = [], [], []
+    for row, tokens in enumerate(documents):
+        counts = Counter(vocabulary[t] for t in tokens if t in vocabulary)
+        for col, tf in counts.items():
+            rows.append(row)
+            cols.append(col)
+            values.append((1.0 + np.log(tf)) * idf[col])
+    matrix = sparse.csr_matrix((values, (rows, cols)), shape=(len(documents), len(vocabulary)), dtype=np.float64)
+    return _l2_normalize(matrix)
+
+
+def skill_matrix(skill_lists: List[List[str]], skill_index: Dict[str, int]) -> sparse.csr_matrix:
+    """Matriz binária esparsa documento × skill."""
+    rows, cols = [], []
+    for row, skills in enumerate(skill_lists):
+        for col in {skill_index[s] for s in map(normalize_skill, skills) if s in skill_index}:
+            rows.append(row)
+            cols.append(col)
+    return sparse.csr_matrix((np.ones(len(rows)), (rows, cols)), shape=(len(skill_lists), len(skill_index)))
+
+
+def similarity_matrix(
+    cv_tokens: List[List[str]],
+    cv_skills: List[List[str]],
+    openings: List[Dict[str, Any]],
+    vocabulary: Dict[str, int],
+    idf: np.ndarray
+) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    Calcula, de uma vez, as matrizes candidato × vaga de similaridade textual
+    (cosseno TF-IDF), cobertura de skills e do score combinado.
+    """
+    cv_tfidf = tfidf_matrix(cv_tokens, vocabulary, idf)
+    opening_tfidf = tfidf_matrix([tokenize(opening_text(o)) for o in openings], vocabulary, idf)
+    text_sim = (cv_tfidf @ opening_tfidf.T).toarray()
+
+    opening_skills = [[*(o.get('hard_skills') or []), *(o.get('soft_skills') or [])] for o in openings]
+    skill_index = {s: i for i, s in enumerate(sorted({normalize_skill(s) for skills in opening_skills for s in skills if s}))}
+    cv_skill_m = skill_matrix(cv_skills, skill_index)
+    opening_skill_m = skill_matrix(opening_skills, skill_index)
+    # Fração das skills da vaga presentes no candidato
+    required = np.asarray(opening_skill_m.sum(axis=1)).ravel()
+    required[required == 0] = 1.0
+    coverage = (cv_skill_m @ opening_skill_m.T).toarray() / required
+
+    combined = TEXT_WEIGHT * text_sim + SKILL_WEIGHT * coverage
+    return combined, text_sim, coverage
+
+
+# ---------- PERSISTÊNCIA ----------
+class MatchStore:
+    """Armazena as top-k vagas alternativas de cada candidato e o estado do vocabulário."""
+
+    def __init__(self, db_path: str = MATCH_DB_FILE):
+        self.db_path = db_path
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def get_state(self, key: str) -> Optional[Any]:
+        with self._connect() as conn:
+            row = conn.execute("SELECT value FROM state WHERE key = ?", (key,)).fetchone()
+        return json.loads(row["value"]) if row else None
+
+    def known_openings(self) -> Dict[str, List[str]]:
+        """Vagas já avaliadas de cada CV calculado, como no último cálculo."""
+        return self.get_state('cv_openings') or {}
+
+    def save(self, results: Dict[str, List[Tuple[str, float, float, float]]], state: Dict[str, Any], replace_all: bool):
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                if replace_all:
+                    conn.execute("DELETE FROM matches")
+                for cv_digest, matches in results.items():
+                    conn.execute("DELETE FROM matches WHERE cv_digest = ?", (cv_digest,))
+                    conn.executemany(
+                        "INSERT INTO matches (cv_digest, opening_id, rank, similarity, text_similarity, skill_coverage) "
+                        "VALUES (?, ?, ?, ?, ?, ?)",
+                        [(cv_digest, opening_id, rank, sim, text, cov) for rank, (opening_id, sim, text, cov) in enumerate(matches, 1)]
+                    )
+                for key, value in state.items():
+                    conn.execute("INSERT OR REPLACE INTO state (key, value) VALUES (?, ?)", (key, json.dumps(value)))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def get_matches(self, cv_digest: str) -> List[Dict[str, Any]]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT * FROM matches WHERE cv_digest = ? ORDER BY rank", (cv_digest,)).fetchall()
+        return [dict(row) for row in rows]
+
+
+# ---------- MOTOR ----------
+def load_candidates(database) -> Dict[str, Dict[str, Any]]:
+    """Agrupa análises por digest do CV: brief (texto sob demanda), skills e vagas em que já foi avaliado."""
+    with database.read_lock():
+        briefs = {b.get('id'): b for b in database.briefs.all()}
+        analyses = database.analysis.all()
+    candidates: Dict[str, Dict[str, Any]] = {}
+    for analysis in analyses:
+        cv_digest = analysis.get('cv_digest')
+        if not cv_digest:
+            continue
+        candidate = candidates.setdefault(cv_digest, {'brief': None, 'skills': set(), 'openings': set()})
+        candidate['openings'].add(str(analysis.get('opening_id')))
+        candidate['skills'].update(analysis.get('hard_skills') or [])
+        candidate['skills'].update(analysis.get('soft_skills') or [])
+        if candidate['brief'] is None:
+            candidate['brief'] = briefs.get(analysis.get('brief_id'))
+    return candidates
+
+
+def update_match_matrix(database, openings: Dict[str, Any], store: Optional[MatchStore] = None, top_k: int = TOP_K, full: bool = False) -> int:
+    """
+    Atualiza as recomendações "também indicado para" sem chamadas à IA.
+
+    Recalcula tudo quando as vagas mudam, quando o corpus cresce além de
+    `REBUILD_GROWTH` ou com `full=True`; caso contrário só os CVs novos e os
+    avaliados em outras vagas desde o último cálculo são projetados no
+    vocabulário existente. Retorna o número de CVs calculados.
+    """
+    store = store or MatchStore()
+    opening_list = [o for o in openings.values() if o.get('id') is not None]
+    if not opening_list:
+        return 0
+    candidates = load_candidates(database)
+    if not candidates:
+        return 0
+
+    current_openings = openings_digest(openings)
+    known = store.known_openings()
+    corpus_size = store.get_state('corpus_size') or 0
+    rebuild = (
+        full
+        or store.get_state('openings_digest') != current_openings
+        or store.get_state('vocabulary') is None
+        or len(candidates) > corpus_size * (1 + REBUILD_GROWTH)
+    )
+
+    evaluated = {d: sorted(c['openings']) for d, c in candidates.items()}
+    # Sem recálculo completo: CVs novos e os que ganharam (ou perderam) vagas avaliadas
+    digests = list(candidates) if rebuild else [d for d in candidates if known.get(d) != evaluated[d]]
+    removed = [] if rebuild else [d for d in known if d not in candidates]
+    if not digests and not removed:
+        return 0
+
+    cv_tokens = [tokenize(brief_text(candidates[d]['brief'])) for d in digests]
+    if rebuild:
+        all_docs = [tokenize(brief_text(candidates[d]['brief'])) for d in candidates] if len(digests) != len(candidates) else cv_tokens
+        vocabulary, idf = build_vocabulary(all_docs + [tokenize(opening_text(o)) for o in opening_list])
+    else:
+        vocab_terms = store.get_state('vocabulary')
+        vocabulary = {t: i for i, t in enumerate(vocab_terms)}
+        idf = np.array(store.get_state('idf'), dtype=np.float64)
+
+    if digests:
+        combined, text_sim, coverage = similarity_matrix(
+            cv_tokens, [sorted(candidates[d]['skills']) for d in digests], opening_list, vocabulary, idf
+        )
+
+    opening_ids = np.array([str(o.get('id')) for o in opening_list])
+    results = {cv_digest: [] for cv_digest in removed}
+    for row, cv_digest in enumerate(digests):
+        scores = combined[row].copy()
+        # Exclui as vagas em que o candidato já foi avaliado
+        scores[np.isin(opening_ids, list(candidates[cv_digest]['openings']))] = -np.inf
+        k = min(top_k, int(np.isfinite(scores).sum()))
+        if k == 0:
+            results[cv_digest] = []
+            continue
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        results[cv_digest] = [
+            (opening_ids[i], float(scores[i]), float(text_sim[row, i]), float(coverage[row, i])) for i in top if scores[i] > 0
+        ]
+
+    state = {'cv_openings': evaluated}
+    if rebuild:
+        state.update({
+            'openings_digest': current_openings,
+            'vocabulary': sorted(vocabulary, key=vocabulary.get),
+            'idf': idf.tolist(),
+            'corpus_size': len(candidates),
+        })
+    store.save(results, state, replace_all=rebuild)
+    logger.info(f"Matriz candidato × vaga atualizada para {len(digests)} CVs ({'completa' if rebuild else 'incremental'}).")
+    return len(digests)
+
+
+if __name__ == "__main__":
+    import argparse
+    from database import AnalysisDatabase
+    from openings_db_manager import load_openings_db
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Calcula as vagas alternativas de cada candidato.")
+    parser.add_argument("--full", action="store_true", help="Recalcula a matriz inteira.")
+    args = parser.parse_args()
+    update_match_matrix(AnalysisDatabase(db_path='applicants.json'), load_openings_db(), full=args.full)
@@ -1,17 +1,21 @@
 from pydantic import BaseModel
-from typing import List
+from typing import Any, Dict, List, Optional, Union
 
 class Analysis(BaseModel):
+    """Linha da tabela 'analysis' de applicants.json, como gravada pelo process_cvs."""
     id: str
-    opening_id: int
-    opening_title: str
-    opening_folder: str
+    opening_id: Union[int, str]
     brief_id: str
-    title: str
-    soft_skills: List[str]
-    hard_skills: List[str]
-    local: str
-    nivel: str
-    disponibilidade: str
-    score: float
-    
+    cv_digest: Optional[str] = None
+    opening_version: Optional[str] = None
+    name: Optional[str] = None
+    formal_education: Optional[str] = None
+    hard_skills: List[str] = []
+    soft_skills: List[str] = []
+    score: float = 0.0
+    total_experience_years: Union[float, str, None] = None
+    tier: Optional[str] = None
+    model: Optional[str] = None
+    facts: Optional[Dict[str, Any]] = None
+    rubric_version: Optional[str] = None
+    prompt_version: Optional[str] = None
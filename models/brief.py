@@ -1,9 +1,12 @@
 from pydantic import BaseModel
+from typing import Optional
 
 class Brief(BaseModel):
+    """Linha da tabela 'briefs' de applicants.json (textos do CV no blob store)."""
     id: str
-    opening_id: int
-    opening_title: str
-    content: str
-    conclusion: str
     file: str
+    cv_path: Optional[str] = None
+    cv_digest: Optional[str] = None
+    content: Optional[str] = None
+    cv_text_ref: Optional[str] = None
+    raw_text_ref: Optional[str] = None
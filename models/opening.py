@@ -13,4 +13,6 @@ class Opening(BaseModel):
     hard_skills: List[str]
     nivel: str
     local: str
-    disponibilidade: str
\ No newline at end of file
+    disponibilidade: str
+    # Versão do modelo de prompt que extraiu a vaga (prompt_templates)
+    prompt_version: str = ""
\ No newline at end of file
@@ -0,0 +1,271 @@
+"""
+Registros compactos (dataclasses com __slots__) das linhas de análise e de
+brief gravadas em applicants.json.
+
+Espelham exatamente o que o `process_cvs` grava, sem validação de
+pydantic no caminho quente: `from_row` decodifica uma linha do TinyDB
+(inclusive as antigas, com os dados do candidato em 'structured_data') e
+`to_row` gera o dicionário gravado. `AnalysisRecord.get` imita `dict.get`
+para o código que já lê linhas como dicionários.
+"""
+import sys
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
+
+# Valor gravado quando a IA não informa o tempo de experiência
+NOT_EVALUATED = 'Não avaliado'
+
+
+def _to_float(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def _str_tuple(values) -> Tuple[str, ...]:
+    # Skills se repetem entre milhares de análises: uma única cópia de cada string
+    if not values:
+        return ()
+    try:
+        return tuple(map(sys.intern, filter(None, values)))
+    except TypeError:
+        return tuple(sys.intern(str(v)) for v in values if v)
+
+
+def _interned(value: Optional[str]) -> Optional[str]:
+    return sys.intern(value) if type(value) is str else value
+
+
+def _stored_years(years: Optional[float]):
+    if years is None:
+        return NOT_EVALUATED
+    return int(years) if years.is_integer() else years
+
+
+@dataclass(slots=True)
+class AnalysisRecord:
+    """Linha da tabela 'analysis'. `opening_id` mantém o tipo gravado (o id numérico da vaga)."""
+
+    id: Optional[str] = None
+    opening_id: Union[int, str, None] = None
+    brief_id: Optional[str] = None
+    cv_digest: Optional[str] = None
+    opening_version: Optional[str] = None
+    name: Optional[str] = None
+    formal_education: Optional[str] = None
+    hard_skills: Tuple[str, ...] = ()
+    soft_skills: Tuple[str, ...] = ()
+    score: float = 0.0
+    total_experience_years: Optional[float] = None
+    tier: Optional[str] = None
+    model: Optional[str] = None
+    facts: Optional[Dict[str, Any]] = None
+    rubric_version: Optional[str] = None
+    prompt_version: Optional[str] = None
+
+    def get(self, key: str, default=None):
+        value = getattr(self, key, default)
+        return default if value is None else value
+
+    @classmethod
+    def from_row(cls, row: Dict[str, Any]) -> "AnalysisRecord":
+        nested = row.get('structured_data')
+        if nested:
+            # Linhas antigas guardavam os dados do candidato em 'structured_data'
+            row = {**nested, **row}
+        return cls(
+            row.get('id'),
+            row.get('opening_id'),
+            row.get('brief_id'),
+            row.get('cv_digest'),
+            _interned(row.get('opening_version')),
+            row.get('name'),
+            _interned(row.get('formal_education')),
+            _str_tuple(row.get('hard_skills')),
+            _str_tuple(row.get('soft_skills')),
+            _to_float(row.get('score')) or 0.0,
+            _to_float(row.get('total_experience_years')),
+            _interned(row.get('tier')),
+            _interned(row.get('model')),
+            row.get('facts'),
+            _interned(row.get('rubric_version')),
+            _interned(row.get('prompt_version')),
+        )
+
+    @classmethod
+    def from_analysis(cls, full_analysis: Dict[str, Any], cv_digest: str, version: str) -> "AnalysisRecord":
+        """Registro de uma análise nova a partir da resposta normalizada da IA (sem ids ainda)."""
+        structured_data = full_analysis.get('structured_data') or {}
+        return cls(
+            cv_digest=cv_digest,
+            opening_version=version,
+            name=structured_data.get('name'),
+            formal_education=structured_data.get('formal_education'),
+            hard_skills=_str_tuple(structured_data.get('hard_skills')),
+            soft_skills=_str_tuple(structured_data.get('soft_skills')),
+            score=_to_float(full_analysis.get('score')) or 0.0,
+            total_experience_years=_to_float(full_analysis.get('total_experience_years')),
+            tier=full_analysis.get('tier'),
+            model=full_analysis.get('model'),
+            facts=full_analysis.get('facts'),
+            rubric_version=full_analysis.get('rubric_version'),
+            prompt_version=full_analysis.get('prompt_version'),
+        )
+
+    def to_row(self) -> Dict[str, Any]:
+        """Dicionário gravado no TinyDB. Os ids ausentes ficam de fora (o banco os atribui)."""
+        row = {
+            "cv_digest": self.cv_digest,
+            "opening_version": self.opening_version,
+            "name": self.name,
+            "formal_education": self.formal_education,
+            "hard_skills": list(self.hard_skills),
+            "soft_skills": list(self.soft_skills),
+            "score": self.score,
+            "total_experience_years": _stored_years(self.total_experience_years),
+            "tier": self.tier,
+            "model": self.model,
+            "facts": self.facts,
+            "rubric_version": self.rubric_version,
+            "prompt_version": self.prompt_version,
+        }
+        if self.id is not None:
+            row["id"] = self.id
+        if self.opening_id is not None:
+            row["opening_id"] = self.opening_id
+        if self.brief_id is not None:
+            row["brief_id"] = self.brief_id
+        return row
+
+
+@dataclass(slots=True)
+class BriefRecord:
+    """Linha da tabela 'briefs'. `cv_text` só existe em briefs antigos (antes do blob store)."""
+
+    id: Optional[str] = None
+    file: Optional[str] = None
+    cv_path: Optional[str] = None
+    cv_digest: Optional[str] = None
+    content: Optional[str] = None
+    cv_text_ref: Optional[str] = None
+    raw_text_ref: Optional[str] = None
+    cv_text: Optional[str] = None
+
+    def get(self, key: str, default=None):
+        value = getattr(self, key, default)
+        return default if value is None else value
+
+    @classmethod
+    def from_row(cls, row: Dict[str, Any]) -> "BriefRecord":
+        return cls(
+            row.get('id'),
+            row.get('file'),
+            row.get('cv_path'),
+            row.get('cv_digest'),
+            row.get('content'),
+            row.get('cv_text_ref'),
+            row.get('raw_text_ref'),
+            row.get('cv_text'),
+        )
+
+    def to_row(self) -> Dict[str, Any]:
+        row = {
+            "cv_text_ref": self.cv_text_ref,
+            "raw_text_ref": self.raw_text_ref,
+            "cv_path": self.cv_path,
+            "cv_digest": self.cv_digest,
+            "content": self.content,
+        }
+        for key in ("id", "file", "cv_text"):
+            value = getattr(self, key)
+            if value is not None:
+                row[key] = value
+        return row
+
+
+def analysis_records(rows: Iterable[Dict[str, Any]]) -> List[AnalysisRecord]:
+    from_row = AnalysisRecord.from_row
+    return [from_row(row) for row in rows]
+
+
+# ---------- BENCHMARK ----------
+def _synthetic_rows(count: int) -> List[Dict[str, Any]]:
+    import uuid
+    import random
+    skills = [f"skill-{i}" for i in range(60)]
+    versions = {opening_id: uuid.uuid4().hex * 2 for opening_id in (354120001, 317210001, 142520001)}
+    rows = []
+    for i in range(count):
+        opening_id = random.choice(list(versions))
+        rows.append({
+            "id": str(uuid.uuid4()),
+            "opening_id": opening_id,
+            "brief_id": str(uuid.uuid4()),
+            "cv_digest": uuid.uuid4().hex * 2,
+            "opening_version": versions[opening_id],
+            "name": f"Candidato {i}",
+            "formal_education": "Graduação em Administração",
+            "hard_skills": random.sample(skills, 12),
+            "soft_skills": random.sample(skills, 6),
+            "score": round(random.uniform(0, 10), 2),
+            "total_experience_years": random.randint(0, 20),
+            "tier": "large",
+            "model": "openai/gpt-oss-20b",
+            "facts": None,
+            "rubric_version": None,
+        })
+    return rows
+
+
+def benchmark(count: int = 20000) -> Dict[str, float]:
+    """Memória por análise carregada, decodificação/codificação e conversão em DataFrame: dicts x registros."""
+    import gc
+    import json
+    import time
+    import tracemalloc
+    from analytics_snapshot import records_table
+
+    encoded = json.dumps(_synthetic_rows(count))
+    results = {}
+
+    def measure(label, build):
+        started = time.perf_counter()
+        build()
+        results[f"{label}_decode_seconds"] = round(time.perf_counter() - started, 4)
+        gc.collect()
+        tracemalloc.start()
+        loaded = build()
+        current, _ = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[f"{label}_bytes_per_analysis"] = round(current / count)
+        return loaded
+
+    dicts = measure("dict", lambda: json.loads(encoded))
+    records = measure("record", lambda: analysis_records(json.loads(encoded)))
+
+    started = time.perf_counter()
+    json.dumps(dicts)
+    results["dict_encode_seconds"] = round(time.perf_counter() - started, 4)
+    started = time.perf_counter()
+    json.dumps([r.to_row() for r in records])
+    results["record_encode_seconds"] = round(time.perf_counter() - started, 4)
+
+    import pandas as pd
+    started = time.perf_counter()
+    pd.DataFrame(dicts)
+    results["dict_dataframe_seconds"] = round(time.perf_counter() - started, 4)
+    started = time.perf_counter()
+    records_table(records).to_pandas()
+    results["record_dataframe_seconds"] = round(time.perf_counter() - started, 4)
+    return results
+
+
+if __name__ == "__main__":
+    import argparse
+    import json as _json
+
+    parser = argparse.ArgumentParser(description="Compara dicts e registros compactos de análise.")
+    parser.add_argument("--bench", type=int, default=20000, metavar="N", help="Número de análises sintéticas (padrão: 20000).")
+    args = parser.parse_args()
+    print(_json.dumps(benchmark(args.bench), indent=2))
@@ -1,30 +1,191 @@
 import json
 import os
-from typing import List, Dict, Any
+import hashlib
+import logging
+import tempfile
+import threading
+from contextlib import contextmanager
+from typing import List, Dict, Any, Optional
+
+try:
+    import fcntl
+except ImportError:  # Windows: apenas o lock entre threads
+    fcntl = None
+
+logger = logging.getLogger(__name__)
 
 # Define o nome do arquivo do banco de dados
 DB_FILE = 'openings_db.json'
 
+# Campos que influenciam a análise: mudar qualquer um deles gera uma nova versão
+VERSIONED_FIELDS = (
+    'title', 'intro', 'main_activities', 'add_infos', 'pre_requisites',
+    'nivel', 'soft_skills', 'hard_skills'
+)
+
+def opening_version(opening: Dict[str, Any]) -> str:
+    """Digest do conteúdo da vaga usado para detectar análises desatualizadas."""
+    payload = json.dumps({k: opening.get(k) for k in VERSIONED_FIELDS}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+class OpeningCatalog:
+    """
+    Catálogo de vagas com cache em memória e índices secundários.
+
+    O arquivo só é relido quando seu mtime/tamanho muda; as consultas por id,
+    título e pasta (uma pasta pode ter várias vagas) são O(1). As escritas
+    são feitas sob lock de arquivo, em um arquivo temporário renomeado sobre
+    o original, então leitores nunca veem um JSON pela metade.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock_path = path + '.lock'
+        self._thread_lock = threading.RLock()
+        self._stamp = None
+        self._openings: Dict[str, Dict[str, Any]] = {}
+        self._by_id: Dict[str, Dict[str, Any]] = {}
+        self._by_title: Dict[str, Dict[str, Any]] = {}
+        self._by_folder: Dict[str, List[Dict[str, Any]]] = {}
+
+    @contextmanager
+    def _file_lock(self):
+        with self._thread_lock:
+            if fcntl is None:
+                yield
+                return
+            with open(self._lock_path, 'a') as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _file_stamp(self):
+        try:
+            st = os.stat(self.path)
+        except FileNotFoundError:
+            return None
+        return (st.st_mtime_ns, st.st_size)
+
+    def _refresh(self):
+        """Relê o arquivo se ele mudou desde a última leitura."""
+        stamp = self._file_stamp()
+        if stamp is not None and stamp == self._stamp:
+            return
+        with self._thread_lock:
+            stamp = self._file_stamp()
+            if stamp is not None and stamp == self._stamp:
+                return
+            if stamp is None:
+                # Cria o arquivo se ele não existir. Com o lock entre processos e
+                # checando de novo: outro processo pode tê-lo criado (e gravado vagas) antes
+                with self._file_lock():
+                    if self._file_stamp() is None:
+                        self._write({})
+                        return
+                self._refresh()
+                return
+            try:
+                with open(self.path, 'r', encoding='utf-8') as f:
+                    openings = json.load(f).get('openings', {})
+            except json.JSONDecodeError as e:
+                # Mantém a última versão válida em vez de apagar o catálogo
+                logger.error(f"Arquivo '{self.path}' inválido, usando a última versão carregada: {e}")
+                return
+            self._index(openings, stamp)
+
+    def _index(self, openings: Dict[str, Dict[str, Any]], stamp):
+        by_folder: Dict[str, List[Dict[str, Any]]] = {}
+        for opening in openings.values():
+            by_folder.setdefault(opening.get('folder'), []).append(opening)
+        self._openings = openings
+        self._by_id = {str(o.get('id')): o for o in openings.values() if o.get('id') is not None}
+        self._by_title = {o.get('title'): o for o in openings.values()}
+        self._by_folder = by_folder
+        self._stamp = stamp
+
+    def _write(self, openings: Dict[str, Dict[str, Any]]):
+        directory = os.path.dirname(self.path) or '.'
+        fd, tmp_path = tempfile.mkstemp(prefix='.openings_', suffix='.tmp', dir=directory)
+        try:
+            with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                json.dump({"openings": openings}, f, indent=4)
+                f.flush()
+                os.fsync(f.fileno())
+            os.replace(tmp_path, self.path)
+        except Exception:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        self._index(openings, self._file_stamp())
+
+    # ---------- CONSULTAS ----------
+    def all(self) -> Dict[str, Dict[str, Any]]:
+        self._refresh()
+        return dict(self._openings)
+
+    def by_id(self, opening_id) -> Optional[Dict[str, Any]]:
+        self._refresh()
+        return self._by_id.get(str(opening_id))
+
+    def by_title(self, title: str) -> Optional[Dict[str, Any]]:
+        self._refresh()
+        return self._by_title.get(title)
+
+    def by_folder(self, folder: str) -> List[Dict[str, Any]]:
+        self._refresh()
+        return list(self._by_folder.get(folder, []))
+
+    def folder_map(self) -> Dict[str, List[Dict[str, Any]]]:
+        """Mapa pasta → vagas (uma pasta pode alimentar várias vagas)."""
+        self._refresh()
+        return {folder: list(openings) for folder, openings in self._by_folder.items()}
+
+    # ---------- ESCRITA ----------
+    def save_all(self, openings: Dict[str, Dict[str, Any]]):
+        with self._file_lock():
+            self._write(openings)
+
+    def upsert(self, opening: Dict[str, Any]) -> str:
+        """
+        Grava a vaga. Se já existir uma vaga com o mesmo id, ela é substituída
+        na mesma chave; senão, entra na próxima chave numérica livre.
+        """
+        with self._file_lock():
+            # Relê sob o lock para não perder escritas de outros processos
+            self._stamp = None
+            self._refresh()
+            openings = dict(self._openings)
+            key = next((k for k, o in openings.items() if opening.get('id') is not None and str(o.get('id')) == str(opening.get('id'))), None)
+            if key is None:
+                numeric_keys = [int(k) for k in openings if str(k).isdigit()]
+                key = str(max(numeric_keys, default=0) + 1)
+            openings[key] = opening
+            self._write(openings)
+            return key
+
+
+_catalog: Optional[OpeningCatalog] = None
+_catalog_lock = threading.Lock()
+
+def get_catalog() -> OpeningCatalog:
+    """Catálogo de vagas compartilhado (um por processo)."""
+    global _catalog
+    if _catalog is None:
+        with _catalog_lock:
+            if _catalog is None:
+                script_dir = os.path.dirname(os.path.abspath(__file__))
+                _catalog = OpeningCatalog(os.path.join(script_dir, DB_FILE))
+    return _catalog
+
 def load_openings_db() -> Dict[str, Any]:
-    """Carrega o banco de dados de vagas do arquivo JSON."""
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    json_file_path = os.path.join(script_dir, DB_FILE)
-    
-    try:
-        with open(json_file_path, 'r', encoding='utf-8') as f:
-            data = json.load(f)
-            return data.get('openings', {})
-    except (FileNotFoundError, json.JSONDecodeError):
-        # Cria o arquivo se ele não existir ou estiver corrompido
-        save_openings_db({})
-        return {}
+    """Carrega o banco de dados de vagas (em cache enquanto o arquivo não mudar)."""
+    return get_catalog().all()
 
 def save_openings_db(openings: Dict[str, Any]):
-    """Salva o banco de dados de vagas no arquivo JSON."""
-    script_dir = os.path.dirname(os.path.abspath(__file__))
-    json_file_path = os.path.join(script_dir, DB_FILE)
-    with open(json_file_path, 'w', encoding='utf-8') as f:
-        json.dump({"openings": openings}, f, indent=4)
+    """Salva o banco de dados de vagas no arquivo JSON (escrita atômica)."""
+    get_catalog().save_all(openings)
 
 def create_new_opening(
     title: str,
@@ -44,8 +205,6 @@ def create_new_opening(
     Cria uma nova vaga com base nos dados fornecidos e a salva no banco de dados.
     Todos os campos da vaga são incluídos para análise completa.
     """
-    openings = load_openings_db()
-    
     # Cria o dicionário da nova vaga com todos os campos
     new_opening = {
         "id": opening_id,
@@ -62,11 +221,8 @@ def create_new_opening(
         "hard_skills": hard_skills
     }
     
-    # Adiciona a nova vaga ao dicionário de vagas, usando o título como chave
-    openings[title] = new_opening
-    
-    # Salva o banco de dados atualizado
-    save_openings_db(openings)
+    # Adiciona (ou substitui, se o id já existir) a vaga no catálogo
+    get_catalog().upsert(new_opening)
 
     # Cria a pasta de currículos se ela não existir
     folder_path = os.path.join("banco-de-talentos", folder)
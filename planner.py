@@ -0,0 +1,199 @@
+import math
+import hashlib
+import statistics
+from dataclasses import dataclass, asdict
+from typing import Dict, Any, Optional
+
+from token_budget import OutputTokenBudget, load_calls, cost_usd
+
+# ---------- CONFIGURAÇÃO ----------
+# Estimativa de tokens quando a API ainda não informou o uso (a mesma do token_budget)
+CHARS_PER_TOKEN = 4
+# Tokens de saída por formato de resposta enquanto não há histórico da versão do prompt
+DEFAULT_OUTPUT_TOKENS = {"full": 900, "compact": 350, "facts": 400}
+# Latência (s) por chamada sem histórico: fixa + tempo de geração
+DEFAULT_BASE_LATENCY = 1.0
+DEFAULT_OUTPUT_TOKENS_PER_SECOND = 250.0
+
+# Situação de cada par (CV, vaga) no plano
+CALL = "call"
+ANALYSED = "analysed"
+DUPLICATE = "duplicate"
+NO_TEXT = "no_text"
+
+
+def estimate_tokens(text: str) -> int:
+    return math.ceil(len(text) / CHARS_PER_TOKEN)
+
+
+@dataclass
+class CallHistory:
+    """Tokens de saída e latência por chamada esperados para uma versão de prompt."""
+
+    output_tokens: float
+    latency: float
+    samples: int
+
+    @classmethod
+    def load(cls, prompt_version: str, mode: str, budget: Optional[OutputTokenBudget] = None) -> "CallHistory":
+        """Mediana das chamadas registradas (metrics/), ou os valores padrão do formato."""
+        calls = [c for c in load_calls() if c.get("prompt_version") == prompt_version]
+        outputs = [c["output_tokens"] for c in calls if c.get("output_tokens")]
+        if not outputs and budget is not None:
+            outputs = budget.samples(prompt_version)
+        output_tokens = statistics.median(outputs) if outputs else DEFAULT_OUTPUT_TOKENS.get(mode, DEFAULT_OUTPUT_TOKENS["full"])
+        latencies = [c["latency"] for c in calls if c.get("latency")]
+        latency = statistics.median(latencies) if latencies else DEFAULT_BASE_LATENCY + output_tokens / DEFAULT_OUTPUT_TOKENS_PER_SECOND
+        return cls(float(output_tokens), float(latency), len(calls))
+
+
+@dataclass
+class OpeningPlan:
+    opening_id: str
+    title: str
+    pairs: int = 0
+    analysed: int = 0
+    no_text: int = 0
+    duplicates: int = 0
+    calls: int = 0
+    input_tokens: int = 0
+    output_tokens: int = 0
+    cost_usd: float = 0.0
+
+
+class RunPlanner:
+    """
+    Plano de uma execução sem chamar a IA: por vaga, quantos pares (CV,
+    vaga) já têm análise, quantos ficam sem texto (quarentena, extração
+    vazia ou curta), quantos repetem um prompt já planejado (cache do
+    cliente) e, para o restante, chamadas, tokens de entrada (do prompt
+    real) e de saída (do histórico da versão do prompt), custo e tempo.
+
+    O tempo de parede é o maior entre o limite de concorrência
+    (chamadas × latência / concorrência) e os limites de requisições e
+    tokens por minuto do provedor, quando informados.
+    """
+
+    def __init__(
+        self,
+        model: str,
+        history: CallHistory,
+        concurrency: int,
+        rpm: Optional[float] = None,
+        tpm: Optional[float] = None,
+        prices: Optional[Dict[str, tuple]] = None
+    ):
+        self.model = model
+        self.history = history
+        self.concurrency = max(1, concurrency)
+        self.rpm = rpm
+        self.tpm = tpm
+        self.prices = prices
+        self.openings: Dict[str, OpeningPlan] = {}
+        self._prompts = set()
+
+    def _opening(self, opening_data: Dict[str, Any]) -> OpeningPlan:
+        key = str(opening_data.get('id'))
+        if key not in self.openings:
+            self.openings[key] = OpeningPlan(key, opening_data.get('title') or key)
+        return self.openings[key]
+
+    def add(self, opening_data: Dict[str, Any], status: str, prompt: Optional[str] = None):
+        plan = self._opening(opening_data)
+        plan.pairs += 1
+        # Digest em vez do prompt: o plano de um backfill grande não guarda os textos
+        prompt_digest = hashlib.sha256(prompt.encode('utf-8')).digest() if prompt else None
+        if status == CALL and prompt_digest in self._prompts:
+            status = DUPLICATE
+        if status == ANALYSED:
+            plan.analysed += 1
+        elif status == NO_TEXT:
+            plan.no_text += 1
+        elif status == DUPLICATE:
+            plan.duplicates += 1
+        else:
+            self._prompts.add(prompt_digest)
+            input_tokens = estimate_tokens(prompt)
+            output_tokens = round(self.history.output_tokens)
+            plan.calls += 1
+            plan.input_tokens += input_tokens
+            plan.output_tokens += output_tokens
+            plan.cost_usd += cost_usd(self.model, input_tokens, output_tokens, self.prices)
+
+    def wall_seconds(self, calls: int, tokens: int) -> float:
+        limits = [calls * self.history.latency / self.concurrency]
+        if self.rpm:
+            limits.append(calls * 60.0 / self.rpm)
+        if self.tpm:
+            limits.append(tokens * 60.0 / self.tpm)
+        return max(limits)
+
+    def totals(self) -> Dict[str, Any]:
+        plans = list(self.openings.values())
+        calls = sum(p.calls for p in plans)
+        input_tokens = sum(p.input_tokens for p in plans)
+        output_tokens = sum(p.output_tokens for p in plans)
+        return {
+            "pairs": sum(p.pairs for p in plans),
+            "analysed": sum(p.analysed for p in plans),
+            "no_text": sum(p.no_text for p in plans),
+            "duplicates": sum(p.duplicates for p in plans),
+            "calls": calls,
+            "input_tokens": input_tokens,
+            "output_tokens": output_tokens,
+            "cost_usd": round(sum(p.cost_usd for p in plans), 4),
+            "wall_seconds": round(self.wall_seconds(calls, input_tokens + output_tokens), 1),
+        }
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "model": self.model,
+            "assumptions": {
+                "output_tokens_per_call": self.history.output_tokens,
+                "latency_seconds": self.history.latency,
+                "history_calls": self.history.samples,
+                "concurrency": self.concurrency,
+                "rpm": self.rpm,
+                "tpm": self.tpm,
+            },
+            "openings": [
+                {**asdict(p), "cost_usd": round(p.cost_usd, 4),
+                 "wall_seconds": round(self.wall_seconds(p.calls, p.input_tokens + p.output_tokens), 1)}
+                for p in self.openings.values()
+            ],
+            "totals": self.totals(),
+        }
+
+    def render(self) -> str:
+        """Tabela markdown por vaga, com o total e as premissas da estimativa."""
+        history = self.history
+        source = f"mediana de {history.samples} chamadas registradas" if history.samples else "padrão do formato, sem histórico"
+        lines = [
+            f"# Plano da execução ({self.model})",
+            "",
+            f"Premissas: {history.output_tokens:.0f} tokens de saída e {history.latency:.1f}s por chamada ({source}); "
+            f"concorrência {self.concurrency}; RPM {self.rpm or 'sem limite'}; TPM {self.tpm or 'sem limite'}.",
+            "",
+            "| Vaga | Pares | Já analisados | Sem texto | Repetidos | Chamadas | Tokens de entrada | Tokens de saída | Custo (USD) | Tempo |",
+            "| ---- | ----- | ------------- | --------- | --------- | -------- | ----------------- | --------------- | ----------- | ----- |",
+        ]
+        rows = [(p.title, p.pairs, p.analysed, p.no_text, p.duplicates, p.calls, p.input_tokens, p.output_tokens, p.cost_usd,
+                 self.wall_seconds(p.calls, p.input_tokens + p.output_tokens)) for p in self.openings.values()]
+        totals = self.totals()
+        rows.append(("**Total**", totals["pairs"], totals["analysed"], totals["no_text"], totals["duplicates"], totals["calls"],
+                     totals["input_tokens"], totals["output_tokens"], totals["cost_usd"], totals["wall_seconds"]))
+        for title, pairs, analysed, no_text, duplicates, calls, input_tokens, output_tokens, cost, seconds in rows:
+            lines.append(
+                f"| {title} | {pairs} | {analysed} | {no_text} | {duplicates} | {calls} | {input_tokens} | {output_tokens} "
+                f"| {cost:.4f} | {format_duration(seconds)} |"
+            )
+        lines += ["", "O tempo por vaga considera a vaga sozinha; as vagas dividem a concorrência e os limites, então o total não é a soma."]
+        return "\n".join(lines) + "\n"
+
+
+def format_duration(seconds: float) -> str:
+    if seconds < 60:
+        return f"{seconds:.0f}s"
+    if seconds < 3600:
+        return f"{seconds / 60:.1f} min"
+    return f"{seconds / 3600:.1f} h"
@@ -1,13 +1,29 @@
 import os
+import sys
+import argparse
 import threading
 import concurrent.futures
 import logging
 import json
-from typing import Dict, Any
+import time
+from typing import Dict, Any, List, Optional, Tuple
 from ai_prompts import GroqClient
-from utils_cv import extract_text_from_file
-from openings_db_manager import load_openings_db
+from concurrency import ConcurrencyController
+from token_budget import OutputTokenBudget, RunBudget, load_calls, compare_modes
+from cascade import DEFAULT_FAST_MODEL, UNCERTAINTY_BAND, MIN_CONFIDENCE
+from utils_cv import normalize_cv_text, file_digest
+from extraction_pool import ExtractionPool, EXTRACT_TIMEOUT, MEMORY_LIMIT_MB
+from blob_store import get_blob_store, brief_text, use_blob_dir, BLOB_DIR
+from work_queue import WorkQueue, default_worker_id, QUEUE_FILE
+from scheduler import schedule_tasks, parse_boosts, opening_weight
+from search_index import SearchIndex, rebuild_from_database
+from openings_db_manager import get_catalog, load_openings_db, opening_version
 from database import AnalysisDatabase
+from models.records import AnalysisRecord, BriefRecord
+from reports import candidate_label, export_opening, ARCHIVE_FORMATS
+from profiler import stage, start_profiling, stop_profiling
+from sharding import Shard, select_shard, merge_shard, shard_dirs, SHARD_DB_FILE
+from planner import RunPlanner, CallHistory, CALL, ANALYSED, NO_TEXT
 
 # ---------- CONFIGURAÇÃO ----------
 logging.basicConfig(
@@ -17,176 +33,727 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 # Configurações globais
-MAX_WORKERS = 4
-OUTPUT_DIR = "analises_cv"
-GROQ_CLIENT = GroqClient()
+# Requisições simultâneas à IA: começa em INITIAL_CONCURRENCY e o controle
+# adaptativo (AIMD) ajusta entre MIN_CONCURRENCY e MAX_CONCURRENCY.
+MIN_CONCURRENCY = 1
+INITIAL_CONCURRENCY = 4
+MAX_CONCURRENCY = 32
+# Threads do pool: quem decide quantas chamam a IA ao mesmo tempo é o controlador
+MAX_WORKERS = MAX_CONCURRENCY
+CV_BASE_DIR = "banco-de-talentos"
+CV_EXTENSIONS = ('.pdf', '.docx')
+DB_PATH = 'applicants.json'
+QUEUE_PATH = QUEUE_FILE
+# Shard em execução (--shard): os resultados ficam na pasta do shard até o --merge-shards
+ACTIVE_SHARD: Optional["Shard"] = None
 
-# Cria uma única instância do banco de dados no escopo global
-database = AnalysisDatabase(db_path='applicants.json')
 # Lock para garantir que a escrita no console não se misture
 console_lock = threading.Lock()
 
+# ---------- INSTÂNCIAS COMPARTILHADAS ----------
+# Criadas sob demanda (uma única vez por processo): importar este módulo não
+# abre o banco nem instancia o cliente da IA.
+_instances: Dict[str, Any] = {}
+_instances_lock = threading.RLock()
+
+def _get_instance(name: str, factory):
+    instance = _instances.get(name)
+    if instance is None:
+        with _instances_lock:
+            instance = _instances.get(name)
+            if instance is None:
+                instance = _instances[name] = factory()
+    return instance
+
+def get_concurrency() -> ConcurrencyController:
+    """Controle adaptativo das requisições simultâneas à IA (métricas em metrics/process_cvs.prom)."""
+    return _get_instance('concurrency', lambda: ConcurrencyController(
+        initial=INITIAL_CONCURRENCY, min_limit=MIN_CONCURRENCY, max_limit=MAX_CONCURRENCY
+    ))
+
+def get_groq_client() -> GroqClient:
+    def factory():
+        client = GroqClient()
+        client.limiter = get_concurrency()
+        client.token_budget = OutputTokenBudget()
+        return client
+    return _get_instance('groq_client', factory)
+
+def get_database() -> AnalysisDatabase:
+    return _get_instance('database', lambda: AnalysisDatabase(db_path=DB_PATH))
+
+def get_search_index() -> SearchIndex:
+    """Índice de busca atualizado a cada análise salva."""
+    return _get_instance('search_index', SearchIndex)
+
+def get_extractor() -> ExtractionPool:
+    """Extração de texto em processos isolados (timeout, limite de memória e quarentena)."""
+    return _get_instance('extractor', ExtractionPool)
+
+def get_analysed_pairs() -> "AnalysedPairs":
+    """Pares (CV, vaga) já analisados, carregados do banco na primeira consulta."""
+    return _get_instance('analysed_pairs', lambda: AnalysedPairs(get_database()))
+
+def get_analytics():
+    """Snapshot colunar das análises (dashboard e exportação)."""
+    def factory():
+        from analytics_snapshot import AnalyticsSnapshot  # pyarrow
+        return AnalyticsSnapshot()
+    return _get_instance('analytics', factory)
+
+# ---------- FUNÇÕES AUXILIARES ----------
+class AnalysedPairs:
+    """
+    Pares (CV, vaga) com análise no banco, o digest do CV analisado e os ids
+    da análise e do brief. Substitui a checagem de existência do arquivo .md:
+    uma leitura do banco por processo em vez de uma consulta ao sistema de
+    arquivos por tarefa.
+    """
+
+    def __init__(self, database: AnalysisDatabase):
+        briefs = {b.id: b.cv_path or b.file for b in database.brief_records()}
+        # Análises antigas não guardam o digest do CV: None (desconhecido)
+        self._digests: Dict[Tuple[str, str], Optional[str]] = {}
+        self._ids: Dict[Tuple[str, str], Tuple[str, str]] = {}
+        for analysis in database.analysis_records():
+            cv_path = briefs.get(analysis.brief_id)
+            if cv_path:
+                key = self._key(cv_path, analysis.opening_id)
+                self._digests[key] = analysis.cv_digest or None
+                self._ids[key] = (analysis.id, analysis.brief_id)
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(cv_path: str, opening_id) -> Tuple[str, str]:
+        return os.path.abspath(cv_path), str(opening_id)
+
+    def contains(self, cv_path: str, opening_id) -> bool:
+        return self._key(cv_path, opening_id) in self._digests
+
+    def digest(self, cv_path: str, opening_id) -> Optional[str]:
+        """Digest do CV na última análise do par; None se não há análise ou se ela é antiga (sem digest)."""
+        return self._digests.get(self._key(cv_path, opening_id))
+
+    def ids(self, cv_path: str, opening_id) -> Optional[Tuple[str, str]]:
+        """(id da análise, id do brief) da última análise do par neste banco, ou None."""
+        return self._ids.get(self._key(cv_path, opening_id))
+
+    def add(self, cv_path: str, opening_id, cv_digest: str, analysis_id: str, brief_id: str):
+        key = self._key(cv_path, opening_id)
+        with self._lock:
+            self._digests[key] = cv_digest
+            self._ids[key] = (analysis_id, brief_id)
+
+    def update(self, other: "AnalysedPairs"):
+        """
+        Inclui os pares de outro banco (ex.: o principal, em uma execução de
+        shard). Só os digests: os ids daquele banco não valem neste.
+        """
+        with self._lock:
+            for key, cv_digest in other._digests.items():
+                self._digests.setdefault(key, cv_digest)
+
+def build_folder_to_opening(job_openings: Optional[Dict[str, Any]] = None) -> Dict[str, List[Dict[str, Any]]]:
+    """
+    Mapeia cada pasta de currículos para as vagas que ela alimenta
+    (várias vagas podem compartilhar a mesma pasta).
+    """
+    if job_openings is None:
+        return get_catalog().folder_map()
+    folder_to_opening: Dict[str, List[Dict[str, Any]]] = {}
+    for data in job_openings.values():
+        folder_to_opening.setdefault(data['folder'], []).append(data)
+    return folder_to_opening
+
+def budget_exhausted() -> bool:
+    """True quando o limite de gasto da execução (--budget-*) foi atingido."""
+    budget = get_groq_client().budget
+    return budget is not None and budget.exhausted()
+
 # ---------- FUNÇÃO DE PROCESSAMENTO ----------
-def process_single_cv(cv_path: str, opening_data: Dict[str, Any]):
-    """Processa um único CV e gera a análise de alinhamento."""
+def process_single_cv(cv_path: str, opening_data: Dict[str, Any], force: bool = False) -> bool:
+    """Processa um único CV e gera a análise de alinhamento.
+
+    Com `force=True` a análise é refeita mesmo que o par já tenha análise
+    (usado pelo modo de observação quando o CV é substituído).
+    Retorna True se a análise existe ao final (nova ou já existente).
+    """
     
-    # 🌟 Lógica de checagem de duplicidade:
-    # Cria o nome do arquivo de análise que seria gerado
-    candidate_name = os.path.basename(cv_path).split('.')[0]
-    safe_name = "".join(c for c in candidate_name if c.isalnum() or c in (' ', '.', '_')).rstrip()
-    safe_opening_title = "".join(c for c in opening_data.get('title', 'vaga_desconhecida') if c.isalnum() or c in (' ', '_')).rstrip().replace(' ', '_')
-    output_folder = os.path.join(OUTPUT_DIR, opening_data.get('folder', 'outros'))
-    output_file = os.path.join(output_folder, f"{safe_name}_{safe_opening_title}.md")
-
-    # Verifica se o arquivo de análise já existe
-    if os.path.exists(output_file):
+    # 🌟 Lógica de checagem de duplicidade (no banco, sem acessar o disco)
+    candidate_name = candidate_label(cv_path)
+    if not force and get_analysed_pairs().contains(cv_path, opening_data.get('id')):
         with console_lock:
             logger.info(f"Análise para '{candidate_name}' na vaga '{opening_data.get('title')}' já existe. Pulando.")
-        return
+        return True
     
     # 🌟 Fim da checagem de duplicidade 🌟
 
-    MAX_RETRIES = 5
-    retries = 0
-    full_analysis = None
-    
-    try:
-        with console_lock:
-            logger.info(f"--- Processando CV: {os.path.basename(cv_path)} para a vaga '{opening_data.get('title', 'N/A')}' (ID: {opening_data.get('id', 'N/A')}) ---")
+    if budget_exhausted():
+        return False
+
+    with console_lock:
+        logger.info(f"--- Processando CV: {os.path.basename(cv_path)} para a vaga '{opening_data.get('title', 'N/A')}' (ID: {opening_data.get('id', 'N/A')}) ---")
+
+    extracted = extract_cv_text(cv_path)
+    if extracted is None:
+        return False
+    raw_text, cv_text, cleaned_cv_text = extracted
 
-        cv_text = extract_text_from_file(cv_path)
+    with stage("llm", cv_path):
+        full_analysis = request_full_analysis(cleaned_cv_text, opening_data, os.path.basename(cv_path))
+    if not full_analysis:
+        return False
+
+    # CV substituído: atualiza a análise existente do par em vez de criar outra
+    existing = find_pair_analysis(cv_path, opening_data.get('id')) if force else None
+    save_analysis(cv_path, opening_data, raw_text, cv_text, full_analysis, existing)
+    return True
+
+def find_pair_analysis(cv_path: str, opening_id) -> Optional[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """(análise, brief) mais recente do par (CV, vaga), ou None se o par não tem análise neste banco."""
+    ids = get_analysed_pairs().ids(cv_path, opening_id)
+    if ids is None:
+        return None
+    database = get_database()
+    analysis, brief = database.get_analysis_by_id(ids[0]), database.get_brief_by_id(ids[1])
+    # Removidos por outro processo (ex.: exclusão da vaga no app): trata como par novo
+    return (analysis, brief) if analysis and brief else None
+
+def extract_cv_text(cv_path: str) -> Optional[Tuple[str, str, str]]:
+    """
+    Extrai o texto do CV. Retorna (texto bruto, texto normalizado, texto
+    enviado à IA) ou None se a extração falhar, o arquivo estiver em
+    quarentena ou o conteúdo for muito curto.
+    """
+    try:
+        with stage("extract", cv_path):
+            raw_text = get_extractor().extract(cv_path)
+        if raw_text is None:
+            return None
+        with stage("normalize", cv_path):
+            cv_text = normalize_cv_text(raw_text)
         
         if not cv_text or len(cv_text.split()) < 50:
             with console_lock:
                 logger.error(f"Falha na extração de texto do CV {os.path.basename(cv_path)} ou conteúdo muito curto. Pulando.")
-            return
+            return None
 
         cleaned_cv_text = ' '.join(cv_text.split()[:4000])
         
     except Exception as e:
         with console_lock:
             logger.error(f"Erro ao extrair texto do CV {os.path.basename(cv_path)}: {e}")
-        return
+        return None
+    return raw_text, cv_text, cleaned_cv_text
+
+def save_analysis(
+    cv_path: str,
+    opening_data: Dict[str, Any],
+    raw_text: str,
+    cv_text: str,
+    full_analysis: Dict[str, Any],
+    existing: Optional[Tuple[Dict[str, Any], Dict[str, Any]]] = None,
+    cv_digest: Optional[str] = None
+) -> str:
+    """
+    Persiste uma análise (brief, análise e índices). Com `existing` (a
+    análise e o brief atuais do par), substitui os dois mantendo os ids;
+    sem ele, insere novos. `cv_digest` é o digest do CV que foi analisado;
+    sem ele, o arquivo é lido de novo. O relatório .md é montado sob
+    demanda (reports.py). Retorna o id da análise.
+    """
+    opening_id = opening_data.get("id")
+    cv_digest = cv_digest or file_digest(cv_path)
+    conclusion = full_analysis.get('conclusion', 'Conclusão não gerada.')
+    # Textos completos vão para o blob store; o brief guarda só as referências
+    with stage("save", cv_path):
+        blob_store = get_blob_store()
+        brief_data = BriefRecord(
+            cv_text_ref=blob_store.put(cv_text),
+            raw_text_ref=blob_store.put(raw_text),
+            cv_path=cv_path,
+            cv_digest=cv_digest,
+            content=conclusion
+        ).to_row()
+        database = get_database()
+        analysis_to_save = build_analysis_record(full_analysis, cv_digest, opening_version(opening_data))
+        if existing is None:
+            brief_id = database.add_brief_data(brief_data=brief_data, file_path=cv_path)
+            analysis_id = database.add_analysis_data(opening_id, brief_id, analysis_to_save)
+        else:
+            # Mesmos ids: o índice de busca e o snapshot trocam a entrada antiga
+            analysis_id, brief_id = existing[0]['id'], existing[1]['id']
+            database.update_brief(brief_id, {**brief_data, "file": cv_path})
+            database.replace_analysis(analysis_id, analysis_to_save)
+        get_analysed_pairs().add(cv_path, opening_id, cv_digest, analysis_id, brief_id)
+    with stage("index", cv_path):
+        publish_analysis(analysis_id, opening_id, brief_id, analysis_to_save, cv_text, cv_path)
+    with console_lock:
+        logger.info(f"Análise de {candidate_label(cv_path)} ({analysis_to_save.get('name')}) salva no banco de dados para a vaga '{opening_data.get('title')}'")
+    return analysis_id
+
+def build_opening_json(opening_data: Dict[str, Any]) -> str:
+    """Descrição da vaga enviada à IA (título, nível exigido e descrição)."""
+    job_description = (
+        (opening_data.get('intro') or '') + ' ' + 
+        (opening_data.get('main_activities') or '') + ' ' + 
+        (opening_data.get('add_infos') or '') + ' ' +
+        (opening_data.get('pre_requisites') or '')
+    ).strip()
+    return json.dumps({
+        "title": opening_data.get('title', ''),
+        "nivel": opening_data.get('nivel') or 'não especificado',
+        "description": job_description
+    }, ensure_ascii=False)
+
+def request_full_analysis(cleaned_cv_text: str, opening_data: Dict[str, Any], label: str) -> Optional[Dict[str, Any]]:
+    """Chama a IA com retentativas até obter uma análise completa (ou None)."""
+    MAX_RETRIES = 5
+    retries = 0
+    full_analysis = None
+    opening_json = build_opening_json(opening_data)
+
+    def on_field(key, value):
+        # Modo streaming: a nota chega antes da conclusão
+        if key == 'score':
+            with console_lock:
+                logger.info(f"Pontuação antecipada de {label} para a vaga '{opening_data.get('title')}': {value}")
 
     # Lógica de retentativa para a chamada da API
-    while retries < MAX_RETRIES:
+    while retries < MAX_RETRIES and not budget_exhausted():
         try:
-            job_description = (
-                opening_data.get('intro', '') + ' ' + 
-                opening_data.get('main_activities', '') + ' ' + 
-                opening_data.get('add_infos', '') + ' ' +
-                opening_data.get('pre_requisites', '')
-            ).strip()
-
-            # A sua chamada à API não tinha o `opening_json`
-            full_analysis = GROQ_CLIENT.generate_full_cv_analysis(cleaned_cv_text, job_description)
+            full_analysis = get_groq_client().generate_full_cv_analysis(cleaned_cv_text, opening_json, on_field=on_field)
             
             if full_analysis and 'conclusion' in full_analysis and 'score' in full_analysis:
-                break 
+                return full_analysis
             
             with console_lock:
-                logger.warning(f"Resposta incompleta da API para {os.path.basename(cv_path)}. Tentando novamente ({retries + 1}/{MAX_RETRIES}).")
+                logger.warning(f"Resposta incompleta da API para {label}. Tentando novamente ({retries + 1}/{MAX_RETRIES}).")
             retries += 1
             
         except Exception as e:
             with console_lock:
-                logger.error(f"Erro na requisição para {os.path.basename(cv_path)}: {e}")
+                logger.error(f"Erro na requisição para {label}: {e}")
             retries += 1
 
-    if not full_analysis or retries >= MAX_RETRIES:
-        with console_lock:
-            logger.error(f"Falha ao analisar o CV {os.path.basename(cv_path)} após {MAX_RETRIES} tentativas. Pulando.")
+    with console_lock:
+        logger.error(f"Falha ao analisar o CV {label} após {MAX_RETRIES} tentativas. Pulando.")
+    return None
+
+def build_analysis_record(full_analysis: Dict[str, Any], cv_digest: str, version: str) -> Dict[str, Any]:
+    """Linha de análise gravada no banco a partir da resposta da IA (no schema de AnalysisRecord)."""
+    return AnalysisRecord.from_analysis(full_analysis, cv_digest, version).to_row()
+
+def publish_analysis(analysis_id: str, opening_id, brief_id: str, analysis: Dict[str, Any], cv_text: str, cv_path: str):
+    """Propaga uma análise salva para o índice de busca e o snapshot colunar."""
+    if ACTIVE_SHARD is not None:
+        # Em um shard a análise só chega ao índice e ao snapshot principais no --merge-shards
         return
+    try:
+        get_search_index().add(analysis_id, opening_id, analysis, cv_text=cv_text, cv_path=cv_path)
+    except Exception as e:
+        # O índice pode ser reconstruído com --rebuild-search-index
+        logger.error(f"Erro ao indexar a análise de {os.path.basename(cv_path)}: {e}")
+    get_analytics().append({"id": analysis_id, "opening_id": opening_id, "brief_id": brief_id, **analysis})
+
+# ---------- REAVALIAÇÃO SELETIVA ----------
+def _rescore_analysis(analysis: Dict[str, Any], opening_data: Dict[str, Any], version: str) -> bool:
+    """Reavalia uma análise existente reaproveitando o texto já extraído do CV."""
+    database = get_database()
+    brief = database.get_brief_by_id(analysis.get('brief_id'))
+    cv_text = brief_text(brief)
+    label = os.path.basename((brief or {}).get('cv_path') or analysis.get('name') or analysis['id'])
+    if not cv_text:
+        logger.error(f"Texto do CV {label} não encontrado para reavaliação. Pulando.")
+        return False
+
+    cleaned_cv_text = ' '.join(cv_text.split()[:4000])
+    full_analysis = request_full_analysis(cleaned_cv_text, opening_data, label)
+    if not full_analysis:
+        return False
 
-    # Extrai os dados da análise final
+    updated = build_analysis_record(full_analysis, analysis.get('cv_digest'), version)
+    # Mantém os dados do candidato já conhecidos se a nova resposta vier incompleta
+    for field in ('name', 'formal_education', 'hard_skills', 'soft_skills'):
+        if not updated.get(field):
+            updated[field] = analysis.get(field)
     conclusion = full_analysis.get('conclusion', 'Conclusão não gerada.')
-    score = full_analysis.get('score', 0.0)
-    structured_data = full_analysis.get('structured_data', {})
-    total_experience_years = full_analysis.get('total_experience_years', 'Não avaliado')
-    
-    # Adiciona a análise ao banco de dados - Lógica movida para dentro da função
-    opening_id = opening_data.get("id")
-    brief_data = {
-        'cv_text': cv_text,
-        'cv_path': cv_path,
-        'content': conclusion
-    }
-    brief_id = database.add_brief_data(brief_data=brief_data, file_path=cv_path)
-
-    analysis_to_save = {
-        "name": structured_data.get('name'),
-        "formal_education": structured_data.get('formal_education'),
-        "hard_skills": structured_data.get('hard_skills'),
-        "soft_skills": structured_data.get('soft_skills'),
-        "score": score,
-        "total_experience_years": total_experience_years
-    }
-    
-    database.add_analysis_data(opening_id, brief_id, analysis_to_save)
-    with console_lock:
-        logger.info(f"Análise de {structured_data.get('name')} salva no banco de dados para a vaga '{opening_data.get('title')}'")
-
-    # Criação do diretório e escrita do arquivo .md
-    os.makedirs(output_folder, exist_ok=True)
-    with open(output_file, "w", encoding="utf-8") as f:
-        f.write("# Análise do Currículo\n\n")
-        f.write(f"## {candidate_name}\n")
-        f.write(f"**Vaga:** {opening_data.get('title', 'N/A')}\n") 
-        f.write(f"**Pontuação:** {score:.2f}/10\n")
-        f.write(f"**Tempo de Experiência:** {total_experience_years} anos\n\n")
-        f.write("---\n\n")
-        f.write("## Resumo do Candidato\n")
-        
-        f.write("### Nome Completo\n")
-        f.write(f"{structured_data.get('name', 'Nenhuma informação disponível')}\n\n")
-        f.write("### Habilidades Técnicas\n")
-        f.write(", ".join(structured_data.get('hard_skills', [])))
-        f.write("\n\n### Habilidades Comportamentais\n")
-        f.write(", ".join(structured_data.get('soft_skills', [])))
-        f.write("\n\n### Formação Principal\n")
-        f.write(f"{structured_data.get('formal_education', 'Nenhuma informação disponível')}\n\n")
-        
-        f.write("---\n\n")
-        f.write("## Conclusão\n")
-        f.write(conclusion)
-        
+
+    # Troca atômica: a linha existente (mesmo id) é substituída de uma vez
+    database.replace_analysis(analysis['id'], updated)
+    database.update_brief(analysis['brief_id'], {'content': conclusion})
+    cv_path = brief.get('cv_path') or brief.get('file') or ''
+    publish_analysis(analysis['id'], opening_data.get('id'), analysis['brief_id'], updated, cv_text, cv_path)
     with console_lock:
-        logger.info(f"Análise de {candidate_name} para a vaga '{opening_data.get('title', 'N/A')}' salva em {output_file}")
+        logger.info(f"Análise de {label} reavaliada para a vaga '{opening_data.get('title')}': {analysis.get('score')} -> {updated['score']}")
+    return True
 
-# ---------- FUNÇÃO PRINCIPAL ----------
-def main():
-    """Função principal para processar todos os currículos para todas as vagas."""
-    
-    cv_base_dir = "banco-de-talentos"
+def rescore_opening(opening_data: Dict[str, Any], force: bool = False) -> int:
+    """
+    Reavalia apenas as análises da vaga feitas com uma versão anterior da
+    sua definição (ou todas, com `force=True`). Retorna quantas foram atualizadas.
+    """
+    version = opening_version(opening_data)
+    stale = [
+        a for a in get_database().get_analysis_by_opening_id(opening_data.get('id'))
+        if force or a.get('opening_version') != version
+    ]
+    if not stale:
+        logger.info(f"Vaga '{opening_data.get('title')}': nenhuma análise desatualizada.")
+        return 0
+
+    logger.info(f"## Reavaliando {len(stale)} análises da vaga '{opening_data.get('title')}' (versão {version[:12]}). ##")
+    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        results = list(executor.map(lambda a: _rescore_analysis(a, opening_data, version), stale))
+    return sum(results)
+
+def run_rescore(opening_id=None, force: bool = False):
+    """Reavalia as análises desatualizadas de uma vaga (ou de todas)."""
     job_openings = load_openings_db()
+    if opening_id is None:
+        targets = list(job_openings.values())
+    else:
+        opening = get_catalog().by_id(opening_id)
+        targets = [opening] if opening else []
+    if not targets:
+        logger.error(f"Vaga '{opening_id}' não encontrada em 'openings_db.json'.")
+        return
+    total = sum(rescore_opening(opening_data, force=force) for opening_data in targets)
+    finalize_run(job_openings)
+    logger.info(f"## Reavaliação concluída: {total} análises atualizadas. ##")
 
-    if not job_openings:
-        logger.error("Nenhuma vaga encontrada para processamento. Verifique o arquivo 'openings_db.json'.")
+def export_reports(fmt: str = "zip", opening_id=None):
+    """Gera os relatórios a partir do banco, um arquivo compactado por vaga."""
+    openings = list(load_openings_db().values()) if opening_id is None else [o for o in [get_catalog().by_id(opening_id)] if o]
+    if not openings:
+        logger.error(f"Vaga '{opening_id}' não encontrada em 'openings_db.json'.")
         return
+    exported = [path for path in (export_opening(get_database(), o, fmt) for o in openings) if path]
+    logger.info(f"## {len(exported)} arquivos de relatórios exportados. ##")
 
-    # Mapeia as pastas para as vagas para um loop mais eficiente
-    folder_to_opening = {data['folder']: data for data in job_openings.values()}
+def run_rerank(opening_id=None):
+    """
+    Reaplica a rubrica (rubric.json) às análises feitas no formato de
+    fatos, sem chamadas à IA, e propaga as novas notas para a busca e o snapshot.
+    """
+    from rubric import load_rubric, rerank_opening
+    job_openings = load_openings_db()
+    targets = list(job_openings.values()) if opening_id is None else [o for o in [get_catalog().by_id(opening_id)] if o]
+    if not targets:
+        logger.error(f"Vaga '{opening_id}' não encontrada em 'openings_db.json'.")
+        return
+    rubric = load_rubric()
+    database = get_database()
+    analytics = get_analytics()
+    started = time.perf_counter()
+    total = 0
+    for opening_data in targets:
+        updates = rerank_opening(database, opening_data, rubric)
+        if not updates:
+            continue
+        total += len(updates)
+        get_search_index().update_scores({analysis_id: fields['score'] for analysis_id, fields in updates.items()})
+        for record in database.analysis_records(opening_data.get('id')):
+            if record.id in updates:
+                analytics.append(record)
+    analytics.flush()
+    analytics.compact()
+    logger.info(f"## Rubrica reaplicada: {total} notas alteradas em {time.perf_counter() - started:.2f}s, sem chamadas à IA. ##")
+
+def finalize_run(job_openings: Dict[str, Any]):
+    """Atualiza os dados derivados ao fim de uma execução: snapshot colunar e recomendações entre vagas."""
+    concurrency = _instances.get('concurrency')
+    if concurrency is not None:
+        concurrency.flush_metrics()
+        logger.info(f"Concorrência da IA ao final: {concurrency.metrics()}")
+    groq_client = _instances.get('groq_client')
+    if groq_client is not None and groq_client.hedger is not None:
+        logger.info(f"Latência da IA e cópias (hedging): {groq_client.hedger.metrics()}")
+    if groq_client is not None and groq_client.streaming:
+        logger.info(f"Streaming da IA (tempo até o primeiro resultado): {groq_client.stream_metrics()}")
+    if groq_client is not None and groq_client.token_budget is not None:
+        groq_client.token_budget.save()
+    if groq_client is not None and groq_client.prompt_cache.metrics():
+        logger.info(f"Cache de prompt do provedor (por versão do prompt): {groq_client.prompt_cache.metrics()}")
+    if groq_client is not None and groq_client.cascade is not None:
+        logger.info(f"Cascata de modelos (rápido x grande): {groq_client.cascade.metrics()}")
+    if groq_client is not None and groq_client.budget is not None:
+        logger.info(f"Gasto da execução (--budget-*): {groq_client.budget.metrics()}")
+    extractor = _instances.get('extractor')
+    if extractor is not None:
+        logger.info(f"Extração de texto isolada: {extractor.metrics()}")
+    if ACTIVE_SHARD is not None:
+        # Snapshot e matriz candidato × vaga são atualizados na mesclagem (--merge-shards)
+        return
+    try:
+        analytics = get_analytics()
+        analytics.flush()
+        analytics.compact()
+    except Exception as e:
+        logger.error(f"Erro ao atualizar o snapshot de análises: {e}")
+    try:
+        from match_matrix import update_match_matrix  # numpy/scipy
+        update_match_matrix(get_database(), job_openings)
+    except Exception as e:
+        logger.error(f"Erro ao atualizar a matriz candidato × vaga: {e}")
+
+# ---------- COMPARAÇÃO DE FORMATOS DE RESPOSTA ----------
+def compare_response_modes(sample_size: int = 10, report_file: str = os.path.join("metrics", "response_modes_report.md")) -> str:
+    """
+    Analisa uma amostra de pares (CV, vaga) nos formatos completo e compacto,
+    sem gravar nada no banco, e gera um relatório de latência e tokens por análise.
+    """
+    tasks = schedule_tasks(collect_tasks(CV_BASE_DIR, build_folder_to_opening()))[:sample_size]
+    client = get_groq_client()
+    started = time.time()
+
+    def run_pair(task):
+        cv_path, opening_data = task
+        extracted = extract_cv_text(cv_path)
+        if extracted is None:
+            return
+        for compact in (False, True):
+            client.generate_full_cv_analysis(extracted[2], build_opening_json(opening_data), compact=compact)
 
+    with concurrent.futures.ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        list(executor.map(run_pair, tasks))
+
+    report = "# Formato completo x compacto\n\n" + compare_modes(load_calls(since=started)) + "\n"
+    os.makedirs(os.path.dirname(report_file), exist_ok=True)
+    with open(report_file, "w", encoding="utf-8") as f:
+        f.write(report)
+    client.token_budget.save()
+    logger.info(f"Relatório de comparação ({len(tasks)} pares) salvo em {report_file}:\n{report}")
+    return report
+
+# ---------- FILA PERSISTENTE ----------
+def collect_tasks(cv_base_dir: str, folder_to_opening: Dict[str, List[Dict[str, Any]]]) -> List[Tuple[str, Dict[str, Any]]]:
+    """Lista os pares (arquivo do CV, vaga) encontrados em banco-de-talentos."""
     all_tasks = []
-    
-    # Itera sobre as pastas de currículos
     for folder_name in os.listdir(cv_base_dir):
         folder_path = os.path.join(cv_base_dir, folder_name)
 
         if not os.path.isdir(folder_path) or folder_name not in folder_to_opening:
             continue
 
-        opening_data = folder_to_opening[folder_name]
-        cv_files = [os.path.join(folder_path, f) for f in os.listdir(folder_path) if f.lower().endswith(('.pdf', '.docx'))]
+        cv_files = [os.path.join(folder_path, f) for f in os.listdir(folder_path) if f.lower().endswith(CV_EXTENSIONS)]
         
         if not cv_files:
             logger.warning(f"Nenhum currículo encontrado no diretório '{folder_path}'.")
             continue
 
-        logger.info(f"## Processando {len(cv_files)} currículos para a vaga '{opening_data['title']}' (Pasta: {folder_name}). ##")
-        
-        for cv_file in cv_files:
-            all_tasks.append((cv_file, opening_data))
+        for opening_data in folder_to_opening[folder_name]:
+            logger.info(f"## Processando {len(cv_files)} currículos para a vaga '{opening_data['title']}' (Pasta: {folder_name}). ##")
+            for cv_file in cv_files:
+                all_tasks.append((cv_file, opening_data))
+    return all_tasks
+
+def pending_tasks(tasks: List[Tuple[str, Dict[str, Any]]]) -> List[Tuple[str, Dict[str, Any]]]:
+    """Descarta os pares (CV, vaga) que já têm análise, para não ocuparem a cota da vaga."""
+    analysed = get_analysed_pairs()
+    return [(cv_file, opening_data) for cv_file, opening_data in tasks if not analysed.contains(cv_file, opening_data.get('id'))]
+
+def _queue_worker(queue: WorkQueue, worker_id: str) -> int:
+    """Consome tarefas da fila até ela esvaziar. Retorna quantas foram concluídas."""
+    done = 0
+    while not budget_exhausted():
+        job = queue.lease(worker_id)
+        if job is None:
+            return done
+
+        # Consulta o catálogo a cada tarefa: vagas criadas durante a execução também são atendidas
+        opening_data = get_catalog().by_id(job['opening_id'])
+        if opening_data is None or not os.path.exists(job['cv_path']):
+            queue.fail(job, worker_id, "vaga ou arquivo do CV não encontrado")
+            continue
+
+        # Heartbeat: renova o lease enquanto a análise estiver em andamento
+        stop_heartbeat = threading.Event()
+        def heartbeat():
+            while not stop_heartbeat.wait(queue.lease_seconds / 3):
+                queue.extend_lease(job, worker_id)
+        heartbeat_thread = threading.Thread(target=heartbeat, daemon=True)
+        heartbeat_thread.start()
+
+        try:
+            ok = process_single_cv(job['cv_path'], opening_data)
+        except Exception as e:
+            ok = False
+            logger.error(f"Uma das tarefas de processamento falhou: {e}")
+        finally:
+            stop_heartbeat.set()
+            heartbeat_thread.join()
+
+        if ok:
+            queue.ack(job, worker_id)
+            done += 1
+        elif budget_exhausted():
+            # Fica pendente para a próxima execução
+            queue.release(job, worker_id)
+        else:
+            queue.fail(job, worker_id, "falha na análise do CV")
+    return done
+
+def run_queue(max_workers: int = MAX_WORKERS, enqueue: bool = True, boosts: Optional[Dict[str, float]] = None, per_opening_cap: Optional[int] = None, shard: Optional[Shard] = None):
+    """
+    Modo fila: enfileira os CVs encontrados (idempotente) e consome a fila
+    compartilhada. Pode ser executado em vários processos ao mesmo tempo.
+    A fila entrega as tarefas por divisão justa ponderada entre as vagas.
+    """
+    job_openings = load_openings_db()
+    if not job_openings:
+        logger.error("Nenhuma vaga encontrada para processamento. Verifique o arquivo 'openings_db.json'.")
+        return
+
+    queue = WorkQueue(QUEUE_PATH)
+    for opening_id in boosts or {}:
+        opening = get_catalog().by_id(opening_id)
+        if opening:
+            moved = queue.reweight(opening_id, opening_weight(opening, boosts))
+            logger.info(f"Vaga '{opening.get('title')}' priorizada: {moved} tarefas pendentes reordenadas.")
+    if enqueue:
+        created = 0
+        tasks = schedule_tasks(select_shard(pending_tasks(collect_tasks(CV_BASE_DIR, build_folder_to_opening(job_openings))), shard), boosts, per_opening_cap)
+        for cv_file, opening_data in tasks:
+            created += queue.enqueue(file_digest(cv_file), opening_data.get('id'), cv_file, weight=opening_weight(opening_data, boosts))
+        logger.info(f"{created} novas tarefas adicionadas à fila.")
+
+    base_worker_id = default_worker_id()
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(_queue_worker, queue, f"{base_worker_id}:{i}") for i in range(max_workers)]
+        total = sum(f.result() for f in futures)
+
+    finalize_run(job_openings)
+
+    logger.info(f"## Fila esvaziada: {total} análises concluídas por este processo. Estado: {queue.stats()} ##\n")
+
+# ---------- PLANO DA EXECUÇÃO ----------
+def plan_run(
+    boosts: Optional[Dict[str, float]] = None,
+    per_opening_cap: Optional[int] = None,
+    shard: Optional[Shard] = None,
+    concurrency: int = MAX_CONCURRENCY,
+    rpm: Optional[float] = None,
+    tpm: Optional[float] = None
+) -> RunPlanner:
+    """
+    Estima a execução sem chamar a IA: seleciona as tarefas como `main`,
+    consulta os pares já analisados e a quarentena e monta o prompt real de
+    cada par para contar os tokens de entrada. O texto de um CV já extraído
+    antes (mesmo digest) vem do blob store; os demais são extraídos uma vez.
+    """
+    job_openings = load_openings_db()
+    all_tasks = collect_tasks(CV_BASE_DIR, build_folder_to_opening(job_openings))
+    pending = pending_tasks(all_tasks)
+    tasks = schedule_tasks(select_shard(pending, shard), boosts, per_opening_cap)
+
+    client = get_groq_client()
+    version = client.configured_prompt_version()
+    planner = RunPlanner(client.model_id, CallHistory.load(version, client.response_mode, client.token_budget), concurrency, rpm, tpm)
+    pending_keys = {(cv_file, str(o.get('id'))) for cv_file, o in pending}
+    for cv_file, opening_data in all_tasks:
+        if (cv_file, str(opening_data.get('id'))) not in pending_keys:
+            planner.add(opening_data, ANALYSED)
+
+    stored_texts = {b.cv_digest: b for b in get_database().brief_records() if b.cv_digest and b.cv_text_ref}
+    texts: Dict[str, Optional[str]] = {}
+
+    def cleaned_text(cv_file: str) -> Optional[str]:
+        if cv_file not in texts:
+            brief = stored_texts.get(file_digest(cv_file))
+            if brief is not None and not get_extractor().quarantine.get(brief.cv_digest):
+                texts[cv_file] = ' '.join(brief_text(brief).split()[:4000]) or None
+            else:
+                extracted = extract_cv_text(cv_file)
+                texts[cv_file] = extracted[2] if extracted else None
+        return texts[cv_file]
+
+    for cv_file, opening_data in tasks:
+        cv_text = cleaned_text(cv_file)
+        if cv_text is None:
+            planner.add(opening_data, NO_TEXT)
+        else:
+            planner.add(opening_data, CALL, client.build_analysis_prompt(cv_text, build_opening_json(opening_data)))
+    return planner
+
+def run_plan(report_file: Optional[str] = None, **kwargs) -> RunPlanner:
+    planner = plan_run(**kwargs)
+    report = planner.render()
+    print(report)
+    if report_file:
+        with open(report_file, 'w', encoding='utf-8') as f:
+            json.dump(planner.to_dict(), f, ensure_ascii=False, indent=2)
+        logger.info(f"Plano salvo em {report_file}")
+    return planner
+
+# ---------- SHARDS ----------
+def use_shard_store(shard: Shard):
+    """
+    Grava as análises deste processo na pasta do shard (banco, textos e
+    fila), para mesclar depois. Os pares já analisados no banco principal
+    continuam sendo pulados, e nada é publicado no índice de busca, no
+    snapshot ou na matriz principais antes da mesclagem.
+    Deve ser chamada antes de qualquer acesso ao banco.
+    """
+    global DB_PATH, QUEUE_PATH, ACTIVE_SHARD
+    main_pairs = None
+    if os.path.exists(DB_PATH):
+        main_db = AnalysisDatabase(db_path=DB_PATH)
+        main_pairs = AnalysedPairs(main_db)
+        main_db.close()
+    os.makedirs(shard.store_dir, exist_ok=True)
+    DB_PATH = os.path.join(shard.store_dir, SHARD_DB_FILE)
+    QUEUE_PATH = os.path.join(shard.store_dir, QUEUE_FILE)
+    ACTIVE_SHARD = shard
+    use_blob_dir(os.path.join(shard.store_dir, BLOB_DIR))
+    if main_pairs is not None:
+        get_analysed_pairs().update(main_pairs)
+    logger.info(f"Shard {shard.index}/{shard.count}: resultados em '{shard.store_dir}'.")
+
+def run_merge(dirs: Optional[List[str]] = None):
+    """
+    Mescla as pastas de shard (padrão: todas em shards/) no banco principal,
+    sem duplicar (digest do CV, vaga, versão do prompt), e propaga as
+    análises novas para o índice de busca e o snapshot colunar.
+    """
+    dirs = dirs or shard_dirs()
+    if not dirs:
+        logger.error("Nenhuma pasta de shard encontrada para mesclar.")
+        return
+    database = get_database()
+    total = 0
+    for shard_dir in dirs:
+        merged = merge_shard(database, shard_dir, get_blob_store())
+        for analysis, brief in merged:
+            cv_path = brief.get('cv_path') or brief.get('file') or ''
+            publish_analysis(analysis['id'], analysis.get('opening_id'), brief['id'], analysis, brief_text(brief), cv_path)
+        total += len(merged)
+    finalize_run(load_openings_db())
+    logger.info(f"## {total} análises mescladas de {len(dirs)} shards. ##")
+
+# ---------- FUNÇÃO PRINCIPAL ----------
+def main(boosts: Optional[Dict[str, float]] = None, per_opening_cap: Optional[int] = None, shard: Optional[Shard] = None):
+    """
+    Função principal para processar todos os currículos para todas as vagas.
+
+    As tarefas são intercaladas entre as vagas (divisão justa ponderada,
+    CV mais novo primeiro), então todas as vagas recebem análises desde o
+    início mesmo quando uma pasta concentra milhares de CVs. Com `shard`,
+    só os pares (CV, vaga) daquele shard são processados.
+    """
+    
+    cv_base_dir = CV_BASE_DIR
+    job_openings = load_openings_db()
+
+    if not job_openings:
+        logger.error("Nenhuma vaga encontrada para processamento. Verifique o arquivo 'openings_db.json'.")
+        return
+
+    # Mapeia as pastas para as vagas para um loop mais eficiente
+    folder_to_opening = build_folder_to_opening(job_openings)
+
+    # Itera sobre as pastas de currículos
+    all_tasks = schedule_tasks(select_shard(pending_tasks(collect_tasks(cv_base_dir, folder_to_opening)), shard), boosts, per_opening_cap)
 
     if not all_tasks:
         logger.info("Nenhum currículo para processar. Finalizando.")
@@ -201,7 +768,119 @@ def main():
             except Exception as e:
                 logger.error(f"Uma das tarefas de processamento falhou: {e}")
     
+    finalize_run(job_openings)
     logger.info("## Processamento de todos os currículos concluído. ##\n")
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Processa os currículos de banco-de-talentos.")
+    parser.add_argument("--watch", action="store_true", help="Mantém o processo ativo e analisa novos CVs assim que chegam.")
+    parser.add_argument("--catch-up", action="store_true", help="No modo --watch, processa os CVs pendentes antes de observar.")
+    parser.add_argument("--queue", action="store_true", help="Usa a fila persistente compartilhada (work_queue.db); pode rodar em vários processos.")
+    parser.add_argument("--no-enqueue", action="store_true", help="No modo --queue, apenas consome a fila sem varrer as pastas.")
+    parser.add_argument("--rescore", action="store_true", help="Reavalia só as análises feitas com uma versão antiga da vaga.")
+    parser.add_argument("--opening-id", help="No modo --rescore, restringe a uma vaga.")
+    parser.add_argument("--force", action="store_true", help="No modo --rescore, reavalia todas as análises da vaga.")
+    parser.add_argument("--rebuild-search-index", action="store_true", help="Reconstrói o índice de busca a partir de applicants.json e sai.")
+    parser.add_argument("--requeue-dead", action="store_true", help="Devolve à fila as tarefas em dead-letter e sai.")
+    parser.add_argument("--boost", action="append", metavar="ID[=FATOR]", help="Prioriza uma vaga urgente (peso x4 ou x FATOR). Pode ser repetido.")
+    parser.add_argument("--per-opening-cap", type=int, help="Máximo de CVs analisados por vaga nesta execução.")
+    parser.add_argument("--hedge", action="store_true", help="Envia uma cópia das requisições mais lentas que o percentil --hedge-percentile.")
+    parser.add_argument("--hedge-percentile", type=float, default=95, help="Percentil de latência que dispara a cópia (padrão: 95).")
+    parser.add_argument("--hedge-budget", type=float, default=0.05, help="Fração máxima das requisições que pode ser duplicada (padrão: 0.05).")
+    parser.add_argument("--hedge-model", help="Modelo usado na cópia (padrão: o mesmo). A chave pode vir de GROQ_HEDGE_API_KEY.")
+    parser.add_argument("--batch", action="store_true", help="Envia os CVs pendentes pela API de batch (JSONL) e ingere os resultados.")
+    parser.add_argument("--batch-id", help="No modo --batch, retoma o acompanhamento/ingestão de um batch já enviado.")
+    parser.add_argument("--batch-poll-interval", type=float, default=30.0, help="No modo --batch, intervalo (s) entre consultas ao status.")
+    parser.add_argument("--stream", action="store_true", help="Lê as respostas em streaming, validando o JSON e abortando respostas inválidas cedo.")
+    parser.add_argument("--compact", action="store_true", help="Pede à IA o formato de resposta compacto (conclusão montada localmente).")
+    parser.add_argument("--compare-modes", type=int, metavar="N", help="Compara latência e tokens dos formatos completo e compacto em N pares (CV, vaga) e sai.")
+    parser.add_argument("--extract-timeout", type=float, default=EXTRACT_TIMEOUT, help=f"Tempo máximo (s) de extração de texto por arquivo; quem estoura vai para a quarentena (padrão: {EXTRACT_TIMEOUT:.0f}).")
+    parser.add_argument("--extract-memory-mb", type=int, default=MEMORY_LIMIT_MB, help=f"Limite de memória de cada processo de extração (padrão: {MEMORY_LIMIT_MB}).")
+    parser.add_argument("--no-extract-isolation", action="store_true", help="Extrai o texto na própria thread, sem processos separados (sem timeout nem limite de memória).")
+    parser.add_argument("--export-reports", choices=ARCHIVE_FORMATS, help="Exporta os relatórios .md de cada vaga em um único arquivo (analises_cv/<pasta>/<vaga>.zip ou .tar.gz) e sai. Aceita --opening-id.")
+    parser.add_argument("--facts", action="store_true", help="A IA só extrai fatos; a nota é calculada localmente pela rubrica (rubric.json).")
+    parser.add_argument("--rerank", action="store_true", help="Reaplica a rubrica às análises em formato de fatos (sem chamadas à IA) e sai. Aceita --opening-id.")
+    parser.add_argument("--cascade", action="store_true", help="Usa um modelo rápido para os casos claros e o modelo grande só para notas na faixa de incerteza.")
+    parser.add_argument("--cascade-model", default=DEFAULT_FAST_MODEL, help=f"Modelo rápido da cascata (padrão: {DEFAULT_FAST_MODEL}).")
+    parser.add_argument("--cascade-band", type=float, nargs=2, default=UNCERTAINTY_BAND, metavar=("MIN", "MAX"), help="Faixa de notas reavaliadas pelo modelo grande (padrão: 4 8).")
+    parser.add_argument("--cascade-min-confidence", type=float, default=MIN_CONFIDENCE, help=f"Confiança mínima para aceitar a nota do modelo rápido (padrão: {MIN_CONFIDENCE}).")
+    parser.add_argument("--cascade-shadow", action="store_true", help="Roda os dois modelos em todo CV (vale o grande) e registra as divergências em metrics/cascade_shadow.jsonl.")
+    parser.add_argument("--shard", metavar="i/N", help="Processa só a fatia i de N do backfill (por digest do CV e vaga) e grava em shards/shard-i-of-N/. Vale para a execução normal, --queue e --batch.")
+    parser.add_argument("--merge-shards", nargs="*", metavar="DIR", help="Mescla pastas de shard (padrão: todas em shards/) no banco principal e sai.")
+    parser.add_argument("--plan", nargs="?", const="", metavar="ARQUIVO.json", help="Estima pares pendentes, chamadas, tokens, custo e tempo por vaga sem chamar a IA e sai (opcionalmente grava o plano em JSON). Respeita --compact/--facts, --per-opening-cap e --shard.")
+    parser.add_argument("--rpm", type=float, default=float(os.getenv("GROQ_RPM") or 0) or None, help="Limite de requisições por minuto do provedor usado no --plan (padrão: GROQ_RPM).")
+    parser.add_argument("--tpm", type=float, default=float(os.getenv("GROQ_TPM") or 0) or None, help="Limite de tokens por minuto do provedor usado no --plan (padrão: GROQ_TPM).")
+    parser.add_argument("--budget-usd", type=float, help="Para de iniciar análises quando o custo da execução atingir este valor (USD).")
+    parser.add_argument("--budget-tokens", type=int, help="Para de iniciar análises após este total de tokens (entrada + saída).")
+    parser.add_argument("--budget-calls", type=int, help="Para de iniciar análises após este número de chamadas à IA.")
+    parser.add_argument("--profile", action="store_true", help="Perfil de CPU e memória por estágio e tipo de arquivo; grava profiles/process_cvs-<data>/ (cpu.folded, wait.folded, summary.txt).")
+    parser.add_argument("--profile-top", type=int, default=20, metavar="N", help="Linhas de cada lista de pontos quentes no resumo do --profile (padrão: 20).")
+    args = parser.parse_args()
+    shard = None
+    if args.shard:
+        if args.watch or args.merge_shards is not None:
+            parser.error("--shard não se aplica a --watch nem a --merge-shards.")
+        try:
+            shard = Shard.parse(args.shard)
+        except ValueError as e:
+            parser.error(str(e))
+        use_shard_store(shard)
+    boosts = parse_boosts(args.boost)
+    extractor = get_extractor()
+    extractor.timeout, extractor.memory_mb = args.extract_timeout, args.extract_memory_mb
+    extractor.isolated = not args.no_extract_isolation
+    if args.profile:
+        if extractor.isolated:
+            # Os processos de extração ficam fora do alcance do perfil
+            logger.info("--profile: extração de texto na própria thread (sem processos separados) para entrar no perfil.")
+            extractor.isolated = False
+        start_profiling("process_cvs", top_n=args.profile_top)
+    if args.compact:
+        get_groq_client().response_mode = "compact"
+    if args.facts:
+        if args.compact:
+            logger.warning("--facts substitui --compact.")
+        get_groq_client().response_mode = "facts"
+    if args.hedge:
+        get_groq_client().enable_hedging(args.hedge_percentile / 100, args.hedge_budget, args.hedge_model)
+    if args.stream:
+        if args.hedge:
+            logger.warning("--hedge não se aplica às respostas em streaming; as cópias ficam desativadas.")
+        get_groq_client().streaming = True
+    if args.cascade or args.cascade_shadow:
+        get_groq_client().enable_cascade(args.cascade_model, tuple(args.cascade_band), args.cascade_min_confidence, shadow=args.cascade_shadow)
+    if args.budget_usd is not None or args.budget_tokens is not None or args.budget_calls is not None:
+        get_groq_client().budget = RunBudget(args.budget_usd, args.budget_tokens, args.budget_calls)
+
+    # Reaproveita este módulo (cliente, banco) em vez de reimportá-lo como 'process_cvs'
+    sys.modules.setdefault('process_cvs', sys.modules[__name__])
+    try:
+        if args.watch:
+            from watch_cvs import run_watch
+            run_watch(catch_up=args.catch_up)
+        elif args.batch or args.batch_id:
+            from batch_mode import run_batch
+            run_batch(batch_id=args.batch_id, boosts=boosts, per_opening_cap=args.per_opening_cap, poll_interval=args.batch_poll_interval, shard=shard)
+        elif args.plan is not None:
+            run_plan(args.plan or None, boosts=boosts, per_opening_cap=args.per_opening_cap, shard=shard, rpm=args.rpm, tpm=args.tpm)
+        elif args.merge_shards is not None:
+            run_merge(args.merge_shards)
+        elif args.compare_modes:
+            compare_response_modes(args.compare_modes)
+        elif args.export_reports:
+            export_reports(args.export_reports, opening_id=args.opening_id)
+        elif args.rerank:
+            run_rerank(opening_id=args.opening_id)
+        elif args.rescore:
+            run_rescore(opening_id=args.opening_id, force=args.force)
+        elif args.rebuild_search_index:
+            rebuild_from_database(get_database(), get_search_index())
+        elif args.requeue_dead:
+            logger.info(f"{WorkQueue(QUEUE_PATH).requeue_dead()} tarefas devolvidas à fila.")
+        elif args.queue:
+            run_queue(enqueue=not args.no_enqueue, boosts=boosts, per_opening_cap=args.per_opening_cap, shard=shard)
+        else:
+            main(boosts=boosts, per_opening_cap=args.per_opening_cap, shard=shard)
+    finally:
+        if args.profile:
+            stop_profiling()
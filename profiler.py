@@ -0,0 +1,299 @@
+import os
+import sys
+import json
+import time
+import threading
+import tracemalloc
+import logging
+import statistics
+from collections import Counter, defaultdict
+from contextlib import contextmanager, nullcontext
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# ---------- CONFIGURAÇÃO ----------
+PROFILE_DIR = "profiles"
+# Intervalo (s) entre amostras das pilhas das threads
+SAMPLE_INTERVAL = 0.005
+MAX_STACK_DEPTH = 64
+# Frames guardados por alocação no tracemalloc
+TRACEMALLOC_FRAMES = 1
+# Nova snapshot de um estágio só quando a memória rastreada passa o pico anterior dele
+# em pelo menos SNAPSHOT_GROWTH (fração) e SNAPSHOT_STEP_BYTES: cada snapshot custa caro
+SNAPSHOT_GROWTH = 0.10
+SNAPSHOT_STEP_BYTES = 1 << 20
+# Arquivo "caro" na extração: custo acima de mediana + OUTLIER_MADS * desvio absoluto mediano do mesmo tipo
+OUTLIER_MADS = 5.0
+OUTLIER_MIN_SECONDS = 0.05
+
+_this_file = os.path.abspath(__file__)
+
+
+def _file_type(path: Optional[str]) -> Optional[str]:
+    if not path:
+        return None
+    return os.path.splitext(path)[1].lower() or "(sem extensão)"
+
+
+def _thread_cpu_clock() -> Optional[int]:
+    # Relógio de CPU da thread atual (POSIX); sem ele as amostras contam só tempo de parede
+    try:
+        return time.pthread_getcpuclockid(threading.get_ident())
+    except (AttributeError, OSError):
+        return None
+
+
+def _frame_label(code) -> str:
+    return f"{code.co_name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+
+
+class Profiler:
+    """
+    Perfil de uma execução por estágio do pipeline e por tipo de arquivo.
+
+    - CPU: uma thread amostra a pilha das threads que estão dentro de um
+      estágio a cada SAMPLE_INTERVAL. Amostras em que o relógio de CPU da
+      thread andou vão para `cpu.folded`; as demais (espera de rede, locks,
+      disco) para `wait.folded`. Os dois arquivos estão no formato "folded"
+      (flamegraph.pl, inferno, speedscope), com o estágio e o tipo de
+      arquivo como raiz de cada pilha.
+    - Memória: o tracemalloc fica ligado e cada estágio guarda a snapshot
+      do momento em que a memória rastreada foi a maior vista ao final dele.
+    - Tempo e CPU por chamada de estágio, e o custo de extração de cada
+      arquivo, para apontar os arquivos fora da curva.
+    """
+
+    def __init__(self, label: str, out_dir: Optional[str] = None, interval: float = SAMPLE_INTERVAL, top_n: int = 20):
+        self.label = label
+        self.out_dir = out_dir or os.path.join(PROFILE_DIR, f"{label}-{time.strftime('%Y%m%d-%H%M%S')}")
+        self.interval = interval
+        self.top_n = top_n
+        self._local = threading.local()
+        # thread ident -> (pilha de (estágio, tipo de arquivo), relógio de CPU)
+        self._active: Dict[int, Tuple[List[Tuple[str, Optional[str]]], Optional[int]]] = {}
+        self._cpu_samples: Counter = Counter()
+        self._wait_samples: Counter = Counter()
+        # thread ident -> (relógio de parede, relógio de CPU) da última amostra
+        self._last_clock: Dict[int, Tuple[float, float]] = {}
+        self._calls: Dict[Tuple[str, str], List[Tuple[float, float, int]]] = defaultdict(list)
+        self._files: Dict[str, List[Tuple[str, float, float]]] = defaultdict(list)
+        self._snapshots: Dict[str, Tuple[int, Any]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._sampler: Optional[threading.Thread] = None
+        self._started = 0.0
+
+    # ---------- coleta ----------
+    def start(self):
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+        self._started = time.monotonic()
+        self._sampler = threading.Thread(target=self._sample_loop, name="profiler-sampler", daemon=True)
+        self._sampler.start()
+
+    def _sample_loop(self):
+        while not self._stop.wait(self.interval):
+            now = time.perf_counter()
+            frames = sys._current_frames()
+            with self._lock:
+                active = {ident: (list(stack), clock) for ident, (stack, clock) in self._active.items() if stack}
+            for ident, (stack, clock) in active.items():
+                frame = frames.get(ident)
+                if frame is None:
+                    continue
+                on_cpu = True
+                if clock is not None:
+                    try:
+                        cpu = time.clock_gettime(clock)
+                    except OSError:
+                        continue
+                    # Em CPU se a thread rodou pelo menos metade do intervalo desde a última amostra
+                    last_wall, last_cpu = self._last_clock.get(ident, (now - self.interval, cpu - self.interval))
+                    on_cpu = cpu - last_cpu >= (now - last_wall) / 2
+                    self._last_clock[ident] = (now, cpu)
+                stage_name, file_type = stack[-1]
+                labels = []
+                while frame is not None and len(labels) < MAX_STACK_DEPTH:
+                    if frame.f_code.co_filename != _this_file:
+                        labels.append(_frame_label(frame.f_code))
+                    frame = frame.f_back
+                folded = ";".join([stage_name, file_type or "-"] + labels[::-1])
+                (self._cpu_samples if on_cpu else self._wait_samples)[folded] += 1
+
+    @contextmanager
+    def stage(self, name: str, path: Optional[str] = None):
+        stack = getattr(self._local, "stack", None)
+        if stack is None:
+            stack = self._local.stack = []
+            with self._lock:
+                self._active[threading.get_ident()] = (stack, _thread_cpu_clock())
+        file_type = _file_type(path) or (stack[-1][1] if stack else None)
+        with self._lock:
+            stack.append((name, file_type))
+        wall_started, cpu_started = time.perf_counter(), time.thread_time()
+        memory_started = tracemalloc.get_traced_memory()[0]
+        try:
+            yield
+        finally:
+            wall = time.perf_counter() - wall_started
+            cpu = time.thread_time() - cpu_started
+            current = tracemalloc.get_traced_memory()[0]
+            with self._lock:
+                stack.pop()
+                self._calls[(name, file_type or "-")].append((wall, cpu, current - memory_started))
+                if path and name == "extract":
+                    self._files[file_type].append((path, wall, cpu))
+                peak = self._snapshots.get(name, (0, None))[0]
+                take_snapshot = current > max(peak * (1 + SNAPSHOT_GROWTH), peak + SNAPSHOT_STEP_BYTES)
+                if take_snapshot:
+                    self._snapshots[name] = (current, None)
+            if take_snapshot:
+                snapshot = tracemalloc.take_snapshot()
+                with self._lock:
+                    self._snapshots[name] = (current, snapshot)
+
+    # ---------- relatório ----------
+    def _stage_table(self) -> List[Dict[str, Any]]:
+        rows = []
+        for (name, file_type), calls in sorted(self._calls.items()):
+            walls = [c[0] for c in calls]
+            rows.append({
+                "stage": name, "file_type": file_type, "calls": len(calls),
+                "wall_seconds": round(sum(walls), 3),
+                "cpu_seconds": round(sum(c[1] for c in calls), 3),
+                "mean_wall_ms": round(1000 * sum(walls) / len(walls), 2),
+                "max_wall_ms": round(1000 * max(walls), 2),
+                "net_alloc_kib": round(sum(c[2] for c in calls) / 1024, 1),
+            })
+        return rows
+
+    def _hotspots(self, samples: Counter) -> Dict[str, List[Tuple[str, int]]]:
+        """Funções com mais amostras no topo da pilha (próprias) e em qualquer posição (acumuladas)."""
+        own, cumulative = Counter(), Counter()
+        for folded, count in samples.items():
+            frames = folded.split(";")[2:]
+            if not frames:
+                continue
+            own[frames[-1]] += count
+            for label in set(frames):
+                cumulative[label] += count
+        return {"self": own.most_common(self.top_n), "cumulative": cumulative.most_common(self.top_n)}
+
+    def _memory_tops(self) -> Dict[str, List[Dict[str, Any]]]:
+        # Filtra depois de agrupar: filter_traces percorre cada alocação em Python
+        ignore = (tracemalloc.__file__, _this_file)
+        tops = {}
+        for name, (current, snapshot) in sorted(self._snapshots.items()):
+            if snapshot is None:
+                continue
+            stats = [s for s in snapshot.statistics("lineno") if s.traceback[0].filename not in ignore][:self.top_n]
+            tops[name] = [
+                {"where": f"{s.traceback[0].filename}:{s.traceback[0].lineno}", "kib": round(s.size / 1024, 1), "blocks": s.count}
+                for s in stats
+            ]
+        return tops
+
+    def _outliers(self) -> List[Dict[str, Any]]:
+        """Arquivos cuja extração custou muito mais que a dos demais do mesmo tipo."""
+        outliers = []
+        for file_type, files in self._files.items():
+            if len(files) < 5:
+                continue
+            costs = [wall for _, wall, _ in files]
+            median = statistics.median(costs)
+            mad = statistics.median(abs(c - median) for c in costs) or 1e-3
+            threshold = max(median + OUTLIER_MADS * mad, OUTLIER_MIN_SECONDS)
+            for path, wall, cpu in files:
+                if wall > threshold:
+                    outliers.append({
+                        "file": path, "file_type": file_type, "wall_seconds": round(wall, 3),
+                        "cpu_seconds": round(cpu, 3), "median_seconds": round(median, 3),
+                    })
+        return sorted(outliers, key=lambda o: -o["wall_seconds"])
+
+    def stop(self) -> str:
+        """Encerra a coleta e grava cpu.folded, wait.folded, summary.json e summary.txt. Retorna a pasta."""
+        self._stop.set()
+        if self._sampler is not None:
+            self._sampler.join()
+        elapsed = time.monotonic() - self._started
+        peak_traced = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        os.makedirs(self.out_dir, exist_ok=True)
+        for filename, samples in (("cpu.folded", self._cpu_samples), ("wait.folded", self._wait_samples)):
+            with open(os.path.join(self.out_dir, filename), 'w', encoding='utf-8') as f:
+                f.writelines(f"{stack} {count}\n" for stack, count in samples.most_common())
+
+        summary = {
+            "label": self.label,
+            "elapsed_seconds": round(elapsed, 2),
+            "sample_interval_ms": self.interval * 1000,
+            "cpu_samples": sum(self._cpu_samples.values()),
+            "wait_samples": sum(self._wait_samples.values()),
+            "stages": self._stage_table(),
+            "cpu_hotspots": self._hotspots(self._cpu_samples),
+            "wait_hotspots": self._hotspots(self._wait_samples),
+            "memory_top": self._memory_tops(),
+            "peak_traced_mib": round(peak_traced / (1 << 20), 1),
+            "extraction_outliers": self._outliers(),
+        }
+        with open(os.path.join(self.out_dir, "summary.json"), 'w', encoding='utf-8') as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
+        with open(os.path.join(self.out_dir, "summary.txt"), 'w', encoding='utf-8') as f:
+            f.write(render_summary(summary))
+        logger.info(f"Perfil da execução gravado em '{self.out_dir}' (cpu.folded, wait.folded, summary.txt).")
+        return self.out_dir
+
+
+def render_summary(summary: Dict[str, Any]) -> str:
+    lines = [
+        f"# Perfil: {summary['label']} ({summary['elapsed_seconds']}s, {summary['cpu_samples']} amostras em CPU, "
+        f"{summary['wait_samples']} em espera, pico de {summary['peak_traced_mib']} MiB rastreados)",
+        "",
+        "## Estágios (por tipo de arquivo)",
+        f"{'estágio':<12} {'tipo':<8} {'chamadas':>8} {'parede (s)':>11} {'CPU (s)':>9} {'média (ms)':>11} {'máx (ms)':>10} {'alocado (KiB)':>14}",
+    ]
+    for row in summary["stages"]:
+        lines.append(
+            f"{row['stage']:<12} {row['file_type']:<8} {row['calls']:>8} {row['wall_seconds']:>11} {row['cpu_seconds']:>9} "
+            f"{row['mean_wall_ms']:>11} {row['max_wall_ms']:>10} {row['net_alloc_kib']:>14}"
+        )
+    for title, key in (("CPU", "cpu_hotspots"), ("espera", "wait_hotspots")):
+        for kind, label_kind in (("self", "próprias"), ("cumulative", "acumuladas")):
+            lines += ["", f"## Pontos quentes ({title}, amostras {label_kind})"]
+            lines += [f"{count:>7}  {label}" for label, count in summary[key][kind]]
+    for stage_name, tops in summary["memory_top"].items():
+        # O tracemalloc só vê o que foi alocado depois de ligado: é memória viva criada na execução
+        lines += ["", f"## Memória viva no pico do estágio '{stage_name}'"]
+        lines += [f"{t['kib']:>10} KiB  {t['blocks']:>7} blocos  {t['where']}" for t in tops]
+    lines += ["", "## Arquivos fora da curva na extração"]
+    lines += [
+        f"{o['wall_seconds']:>8}s (mediana {o['median_seconds']}s, CPU {o['cpu_seconds']}s)  {o['file']}"
+        for o in summary["extraction_outliers"]
+    ] or ["Nenhum."]
+    return "\n".join(lines) + "\n"
+
+
+_profiler: Optional[Profiler] = None
+
+
+def start_profiling(label: str, top_n: int = 20) -> Profiler:
+    """Liga o perfil da execução; `stage()` passa a registrar os estágios."""
+    global _profiler
+    _profiler = Profiler(label, top_n=top_n)
+    _profiler.start()
+    return _profiler
+
+
+def stop_profiling() -> Optional[str]:
+    global _profiler
+    profiler, _profiler = _profiler, None
+    return profiler.stop() if profiler is not None else None
+
+
+def stage(name: str, path: Optional[str] = None):
+    """Marca um estágio do pipeline (sem custo quando o perfil está desligado)."""
+    if _profiler is None:
+        return nullcontext()
+    return _profiler.stage(name, path)
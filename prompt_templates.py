@@ -0,0 +1,106 @@
+import hashlib
+import threading
+from dataclasses import dataclass, field
+from string import Template
+from typing import Dict, Any, Optional
+
+
+@dataclass(frozen=True)
+class PromptTemplate:
+    """
+    Prompt em três partes, da mais estável para a mais variável: `static`
+    (instruções, rubrica e formato de saída, idêntico em toda chamada),
+    `context` (o que muda por vaga) e `variable` (o que muda por chamada,
+    ex.: o CV). Mantendo o prefixo longo e fixo no início, o cache de prompt
+    do provedor reaproveita as instruções entre chamadas.
+
+    `context` e `variable` usam placeholders de `string.Template` ($nome),
+    então chaves de JSON no texto não precisam ser escapadas.
+    `version` (nome + digest das três partes) muda sempre que o texto muda.
+    """
+
+    name: str
+    static: str
+    context: str = ""
+    variable: str = ""
+    version: str = field(init=False)
+
+    def __post_init__(self):
+        digest = hashlib.sha256("\x00".join((self.static, self.context, self.variable)).encode('utf-8')).hexdigest()[:12]
+        object.__setattr__(self, 'version', f"{self.name}-{digest}")
+
+    def render(self, **fields: Any) -> str:
+        return self.static + Template(self.context).substitute(fields) + Template(self.variable).substitute(fields)
+
+
+_registry: Dict[str, PromptTemplate] = {}
+_registry_lock = threading.Lock()
+
+
+def register(template: PromptTemplate) -> PromptTemplate:
+    """Registra (ou substitui) um modelo de prompt pelo nome."""
+    with _registry_lock:
+        _registry[template.name] = template
+    return template
+
+
+def get_template(name: str) -> PromptTemplate:
+    return _registry[name]
+
+
+def registered_versions() -> Dict[str, str]:
+    """{nome: versão} de todos os modelos registrados."""
+    with _registry_lock:
+        return {name: template.version for name, template in _registry.items()}
+
+
+def cached_input_tokens(response) -> Optional[int]:
+    """
+    Tokens de entrada servidos do cache de prompt do provedor, ou None se
+    a resposta não informa (`prompt_tokens_details.cached_tokens` da API
+    compatível com a OpenAI, ou `input_token_details.cache_read` do langchain).
+    """
+    token_usage = (getattr(response, "response_metadata", None) or {}).get("token_usage") or {}
+    details = token_usage.get("prompt_tokens_details") or token_usage.get("input_tokens_details")
+    if isinstance(details, dict) and details.get("cached_tokens") is not None:
+        return int(details["cached_tokens"])
+    usage = getattr(response, "usage_metadata", None) or {}
+    cache_read = (usage.get("input_token_details") or {}).get("cache_read")
+    return int(cache_read) if cache_read is not None else None
+
+
+class PromptCacheStats:
+    """Taxa de acerto do cache de prompt do provedor, por versão de modelo de prompt."""
+
+    def __init__(self):
+        self._stats: Dict[str, Dict[str, int]] = {}
+        self._lock = threading.Lock()
+
+    def record(self, version: str, response):
+        usage = getattr(response, "usage_metadata", None) or {}
+        input_tokens = usage.get("input_tokens") or 0
+        cached = cached_input_tokens(response)
+        with self._lock:
+            stats = self._stats.setdefault(version, {'calls': 0, 'reported': 0, 'input_tokens': 0, 'cached_tokens': 0, 'hits': 0})
+            stats['calls'] += 1
+            if cached is None:
+                return
+            stats['reported'] += 1
+            stats['input_tokens'] += input_tokens
+            stats['cached_tokens'] += cached
+            stats['hits'] += cached > 0
+
+    def metrics(self) -> Dict[str, Dict[str, Any]]:
+        """Por versão: chamadas, quantas informaram o cache, fração de chamadas com acerto e de tokens do cache."""
+        with self._lock:
+            stats = {version: dict(s) for version, s in self._stats.items()}
+        return {
+            version: {
+                'calls': s['calls'],
+                'reported': s['reported'],
+                'hit_rate': round(s['hits'] / s['reported'], 3) if s['reported'] else None,
+                'cached_token_ratio': round(s['cached_tokens'] / s['input_tokens'], 3) if s['input_tokens'] else None,
+            }
+            for version, s in stats.items()
+        }
+
@@ -0,0 +1,156 @@
+import io
+import os
+import time
+import tarfile
+import zipfile
+import logging
+from string import Template
+from typing import Dict, Any, Iterator, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# ---------- CONFIGURAÇÃO ----------
+EXPORT_DIR = "analises_cv"
+ARCHIVE_FORMATS = ("zip", "tar")
+
+# Mesmo layout dos antigos arquivos .md gravados por análise
+REPORT_TEMPLATE = Template("""# Análise do Currículo
+
+## $candidate_name
+**Vaga:** $opening_title
+**Pontuação:** $score/10
+**Tempo de Experiência:** $years anos
+
+---
+
+## Resumo do Candidato
+### Nome Completo
+$name
+
+### Habilidades Técnicas
+$hard_skills
+
+### Habilidades Comportamentais
+$soft_skills
+
+### Formação Principal
+$formal_education
+
+---
+
+## Conclusão
+$conclusion""")
+
+NO_INFO = 'Nenhuma informação disponível'
+
+
+def candidate_label(cv_path: str) -> str:
+    return os.path.basename(cv_path or '').split('.')[0]
+
+
+def _safe_title(opening_data: Dict[str, Any]) -> str:
+    title = opening_data.get('title') or 'vaga_desconhecida'
+    return "".join(c for c in title if c.isalnum() or c in (' ', '_')).rstrip().replace(' ', '_')
+
+
+def report_filename(cv_path: str, opening_data: Dict[str, Any]) -> str:
+    """Nome do relatório de um CV para uma vaga (o mesmo dos antigos arquivos .md)."""
+    safe_name = "".join(c for c in candidate_label(cv_path) if c.isalnum() or c in (' ', '.', '_')).rstrip()
+    return f"{safe_name}_{_safe_title(opening_data)}.md"
+
+
+def _years(value) -> str:
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return 'Não avaliado' if value is None else str(value)
+
+
+def render_report(opening_data: Dict[str, Any], analysis, brief) -> str:
+    """
+    Relatório markdown de uma análise, montado sob demanda a partir da
+    linha de análise e do brief (conclusão). Aceita dicts ou registros.
+    """
+    brief = brief or {}
+    try:
+        score = f"{float(analysis.get('score') or 0.0):.2f}"
+    except (TypeError, ValueError):
+        score = str(analysis.get('score'))
+    return REPORT_TEMPLATE.substitute(
+        candidate_name=candidate_label(brief.get('cv_path') or brief.get('file') or analysis.get('name') or ''),
+        opening_title=opening_data.get('title', 'N/A'),
+        score=score,
+        years=_years(analysis.get('total_experience_years')),
+        name=analysis.get('name') or NO_INFO,
+        hard_skills=", ".join(analysis.get('hard_skills') or []),
+        soft_skills=", ".join(analysis.get('soft_skills') or []),
+        formal_education=analysis.get('formal_education') or NO_INFO,
+        conclusion=brief.get('content') or 'Conclusão não gerada.',
+    )
+
+
+def iter_reports(database, opening_data: Dict[str, Any]) -> Iterator[Tuple[str, str]]:
+    """
+    (nome do arquivo, markdown) de cada análise da vaga. Um CV reanalisado
+    (substituído) aparece uma vez, com a análise mais recente.
+    """
+    analyses = database.analysis_records(opening_data.get('id'))
+    if not analyses:
+        return
+    briefs = {b.id: b for b in database.brief_records()}
+    latest = {}
+    for analysis in analyses:
+        brief = briefs.get(analysis.brief_id)
+        cv_path = (brief.cv_path or brief.file) if brief else analysis.name
+        latest[report_filename(cv_path or analysis.id, opening_data)] = (analysis, brief)
+    for filename, (analysis, brief) in latest.items():
+        yield filename, render_report(opening_data, analysis, brief)
+
+
+def write_archive(fileobj, reports: Iterator[Tuple[str, str]], fmt: str = "zip") -> int:
+    """Grava os relatórios em um único zip ou tar.gz, um por vez (sem arquivos intermediários)."""
+    count = 0
+    if fmt == "zip":
+        with zipfile.ZipFile(fileobj, 'w', compression=zipfile.ZIP_DEFLATED) as archive:
+            for filename, text in reports:
+                archive.writestr(filename, text)
+                count += 1
+    else:
+        with tarfile.open(fileobj=fileobj, mode='w:gz') as archive:
+            now = time.time()
+            for filename, text in reports:
+                data = text.encode('utf-8')
+                info = tarfile.TarInfo(filename)
+                info.size, info.mtime = len(data), now
+                archive.addfile(info, io.BytesIO(data))
+                count += 1
+    return count
+
+
+def archive_name(opening_data: Dict[str, Any], fmt: str = "zip") -> str:
+    return f"{_safe_title(opening_data)}.{'zip' if fmt == 'zip' else 'tar.gz'}"
+
+
+def export_opening(database, opening_data: Dict[str, Any], fmt: str = "zip", dest_dir: str = EXPORT_DIR) -> Optional[str]:
+    """
+    Exporta os relatórios da vaga para `dest_dir/<pasta>/<vaga>.zip`
+    (ou .tar.gz). Retorna o caminho do arquivo, ou None se não há análises.
+    """
+    folder = os.path.join(dest_dir, opening_data.get('folder') or 'outros')
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, archive_name(opening_data, fmt))
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'wb') as f:
+        count = write_archive(f, iter_reports(database, opening_data), fmt)
+    if not count:
+        os.remove(tmp_path)
+        return None
+    os.replace(tmp_path, path)
+    logger.info(f"{count} relatórios da vaga '{opening_data.get('title')}' exportados para {path}")
+    return path
+
+
+def archive_bytes(database, opening_data: Dict[str, Any], fmt: str = "zip") -> bytes:
+    """O mesmo arquivo de `export_opening`, em memória (download pela interface)."""
+    buffer = io.BytesIO()
+    write_archive(buffer, iter_reports(database, opening_data), fmt)
+    return buffer.getvalue()
@@ -0,0 +1,208 @@
+import os
+import re
+import json
+import time
+import hashlib
+import logging
+import unicodedata
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# ---------- CONFIGURAÇÃO ----------
+# Pesos opcionais sobrescrevendo DEFAULT_RUBRIC (mesmas chaves, mesclado por cima)
+RUBRIC_FILE = "rubric.json"
+
+# Os mesmos critérios que o prompt completo pede para a IA calcular
+DEFAULT_RUBRIC: Dict[str, Any] = {
+    # (até N anos, pontos); None = sem limite superior
+    "experience_bands": [[1, 0.5], [2, 1.0], [3, 1.5], [5, 2.0], [10, 2.5], [None, 4.0]],
+    # Relevância da experiência (0 a 1) vira -peso a +peso
+    "experience_relevance": 3.0,
+    "matched_hard_skill": 0.5,
+    "missing_hard_skill": -0.5,
+    "soft_skill": 0.5,
+    "max_soft_skills": 8,
+    "education": 1.0,
+    "differential": 0.5,
+    "max_differential_points": 2.0,
+    "seniority": {
+        # Anos esperados por nível, na ordem em que os termos são procurados em `nivel`
+        "levels": [
+            ["tech lead", [7, 15]], ["supervisor", [7, 15]], ["coordenador", [7, 15]],
+            ["senior", [5, 10]], ["pleno", [3, 5]], ["junior", [1, 2]],
+            ["estagi", [0, 1]], ["assistente", [0, 1]],
+        ],
+        # Faixa da nota final conforme o tempo de experiência x o esperado
+        "bands": {
+            "ideal": [7.5, 9.0],
+            "far_below": [1.0, 3.0],
+            "below": [3.0, 5.0],
+            "far_above": [4.0, 6.0],
+            "above": [6.0, 7.0],
+        },
+        # Diferença (anos) a partir da qual o candidato está "muito" abaixo/acima
+        "far_gap_years": 2,
+    },
+}
+
+_rubric_cache: Dict[str, Any] = {}
+
+
+def _merge(base: Dict[str, Any], override: Dict[str, Any]) -> Dict[str, Any]:
+    merged = dict(base)
+    for key, value in override.items():
+        merged[key] = _merge(base[key], value) if isinstance(value, dict) and isinstance(base.get(key), dict) else value
+    return merged
+
+
+def load_rubric(path: str = RUBRIC_FILE) -> Dict[str, Any]:
+    """DEFAULT_RUBRIC com os pesos de `rubric.json` por cima (relido quando o arquivo muda)."""
+    try:
+        mtime = os.stat(path).st_mtime_ns
+    except FileNotFoundError:
+        return DEFAULT_RUBRIC
+    cached = _rubric_cache.get(path)
+    if cached and cached[0] == mtime:
+        return cached[1]
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            rubric = _merge(DEFAULT_RUBRIC, json.load(f))
+    except json.JSONDecodeError as e:
+        logger.error(f"'{path}' inválido ({e}). Usando os pesos padrão.")
+        return DEFAULT_RUBRIC
+    _rubric_cache[path] = (mtime, rubric)
+    return rubric
+
+
+def rubric_version(rubric: Optional[Dict[str, Any]] = None) -> str:
+    """Digest dos pesos: muda sempre que a rubrica muda."""
+    payload = json.dumps(rubric or load_rubric(), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()[:12]
+
+
+def _plain(text: str) -> str:
+    nfkd = unicodedata.normalize('NFKD', text or '')
+    return ''.join(c for c in nfkd if not unicodedata.combining(c)).lower()
+
+
+def expected_years(nivel: Optional[str], rubric: Optional[Dict[str, Any]] = None) -> Optional[Tuple[float, float]]:
+    """
+    Anos de experiência esperados para o `nivel` da vaga: uma faixa
+    explícita ("júnior: 1 a 3 anos") ou a do termo de senioridade.
+    None quando o nível não é reconhecido (sem ajuste de senioridade).
+    """
+    text = _plain(nivel)
+    explicit = re.search(r"(\d+(?:[.,]\d+)?)\s*(?:a|-|ate)\s*(\d+(?:[.,]\d+)?)\s*anos?", text)
+    if explicit:
+        low, high = (float(v.replace(',', '.')) for v in explicit.groups())
+        return min(low, high), max(low, high)
+    for term, (low, high) in (rubric or load_rubric())["seniority"]["levels"]:
+        if term in text:
+            return float(low), float(high)
+    return None
+
+
+def _number(value, default: float = 0.0) -> float:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return default
+
+
+def _as_list(value) -> List[str]:
+    if not isinstance(value, list):
+        return []
+    return [str(item).strip() for item in value if str(item).strip()]
+
+
+def facts_from_response(data: Dict[str, Any]) -> Dict[str, Any]:
+    """Fatos extraídos pela IA no formato de resposta 'facts', com nomes legíveis."""
+    return {
+        "years": _number(data.get("y")),
+        "experience_relevance": min(1.0, max(0.0, _number(data.get("r"), 0.5))),
+        "matched_hard_skills": _as_list(data.get("hm")),
+        "missing_hard_skills": _as_list(data.get("hx")),
+        "soft_skills": _as_list(data.get("k"))[:8],
+        "education_relevance": min(1.0, max(0.0, _number(data.get("ed")))),
+        "differentials": _as_list(data.get("d")),
+    }
+
+
+def score_facts(facts: List[Dict[str, Any]], nivel: Optional[str], rubric: Optional[Dict[str, Any]] = None):
+    """
+    Aplica a rubrica aos fatos de todos os candidatos de uma vaga de uma
+    vez (numpy). Retorna um array com as notas finais (0 a 10).
+    """
+    import numpy as np
+
+    rubric = rubric or load_rubric()
+    count = lambda key: np.array([len(f.get(key) or []) for f in facts], dtype=np.float64)
+    years = np.array([_number(f.get("years")) for f in facts], dtype=np.float64)
+    relevance = np.array([_number(f.get("experience_relevance"), 0.5) for f in facts], dtype=np.float64)
+    education = np.array([_number(f.get("education_relevance")) for f in facts], dtype=np.float64)
+
+    edges = np.array([np.inf if limit is None else limit for limit, _ in rubric["experience_bands"]], dtype=np.float64)
+    points = np.array([p for _, p in rubric["experience_bands"]], dtype=np.float64)
+    band_index = np.minimum(np.searchsorted(edges, years, side='right'), len(points) - 1)
+
+    raw = (
+        points[band_index]
+        + rubric["experience_relevance"] * (2 * relevance - 1)
+        + rubric["matched_hard_skill"] * count("matched_hard_skills")
+        + rubric["missing_hard_skill"] * count("missing_hard_skills")
+        + rubric["soft_skill"] * np.minimum(count("soft_skills"), rubric["max_soft_skills"])
+        + rubric["education"] * education
+        + np.minimum(rubric["differential"] * count("differentials"), rubric["max_differential_points"])
+    )
+    raw = np.clip(raw, 0.0, 10.0)
+
+    expected = expected_years(nivel, rubric)
+    if expected is None:
+        return np.round(raw, 2)
+
+    # Ajuste final: a faixa da nota depende do tempo de experiência x o esperado,
+    # e a nota inicial define a posição dentro da faixa
+    seniority = rubric["seniority"]
+    far = seniority["far_gap_years"]
+    below = expected[0] - years
+    above = years - expected[1]
+    conditions = [below >= far, below > 0, above > far, above > 0]
+    names = ["far_below", "below", "far_above", "above"]
+    bands = seniority["bands"]
+    low = np.select(conditions, [bands[n][0] for n in names], default=bands["ideal"][0])
+    high = np.select(conditions, [bands[n][1] for n in names], default=bands["ideal"][1])
+    return np.round(low + (high - low) * raw / 10.0, 2)
+
+
+def score_one(facts: Dict[str, Any], nivel: Optional[str], rubric: Optional[Dict[str, Any]] = None) -> float:
+    return float(score_facts([facts], nivel, rubric)[0])
+
+
+def rerank_opening(database, opening_data: Dict[str, Any], rubric: Optional[Dict[str, Any]] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Recalcula as notas de todas as análises da vaga que guardam fatos,
+    sem chamadas à IA. Grava as notas alteradas em uma única escrita e
+    retorna {analysis_id: campos atualizados}.
+    """
+    rubric = rubric or load_rubric()
+    version = rubric_version(rubric)
+    analyses = [a for a in database.analysis_records(opening_data.get('id')) if a.facts]
+    if not analyses:
+        return {}
+
+    started = time.perf_counter()
+    scores = score_facts([a.facts for a in analyses], opening_data.get('nivel'), rubric)
+    elapsed = time.perf_counter() - started
+    updates = {
+        a.id: {"score": float(score), "rubric_version": version}
+        for a, score in zip(analyses, scores)
+        if a.score != float(score) or a.rubric_version != version
+    }
+    if updates:
+        database.update_analyses(updates)
+    logger.info(
+        f"Vaga '{opening_data.get('title')}': {len(analyses)} análises reavaliadas pela rubrica "
+        f"em {elapsed * 1000:.1f} ms ({len(updates)} notas alteradas)."
+    )
+    return updates
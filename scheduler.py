@@ -0,0 +1,120 @@
+import os
+import heapq
+import threading
+import logging
+from typing import Dict, Any, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# ---------- CONFIGURAÇÃO ----------
+# Multiplicador de peso aplicado por --boost quando nenhum fator é informado
+BOOST_FACTOR = 4.0
+
+
+def opening_weight(opening: Dict[str, Any], boosts: Optional[Dict[str, float]] = None) -> float:
+    """
+    Peso de uma vaga na divisão da capacidade: campo opcional `priority`
+    da vaga (padrão 1) multiplicado pelo boost informado na execução.
+    """
+    try:
+        weight = float(opening.get('priority') or 1.0)
+    except (TypeError, ValueError):
+        weight = 1.0
+    weight *= (boosts or {}).get(str(opening.get('id')), 1.0)
+    return max(weight, 0.01)
+
+
+def parse_boosts(values: Optional[List[str]]) -> Dict[str, float]:
+    """Converte `--boost ID` / `--boost ID=FATOR` em {id: fator}."""
+    boosts = {}
+    for value in values or []:
+        opening_id, _, factor = value.partition('=')
+        try:
+            boosts[opening_id.strip()] = float(factor) if factor else BOOST_FACTOR
+        except ValueError:
+            logger.warning(f"Boost inválido '{value}', usando {BOOST_FACTOR}.")
+            boosts[opening_id.strip()] = BOOST_FACTOR
+    return boosts
+
+
+def _mtime(path: str) -> float:
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0.0
+
+
+class FairScheduler:
+    """
+    Escalonador com uma fila por vaga e divisão justa ponderada (stride
+    scheduling): a próxima tarefa sai da vaga com o menor "passo"
+    (tarefas servidas / peso). Dentro de cada vaga, o CV mais novo sai
+    primeiro. `per_opening_cap` limita quantas tarefas de cada vaga são
+    entregues nesta execução.
+    """
+
+    def __init__(self, boosts: Optional[Dict[str, float]] = None, per_opening_cap: Optional[int] = None):
+        self.boosts = boosts or {}
+        self.per_opening_cap = per_opening_cap
+        # id da vaga -> heap de (-mtime, seq, cv_path, opening)
+        self._queues: Dict[str, list] = {}
+        self._weights: Dict[str, float] = {}
+        self._pass: Dict[str, float] = {}
+        self._served: Dict[str, int] = {}
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def add(self, cv_path: str, opening: Dict[str, Any]):
+        key = str(opening.get('id'))
+        with self._lock:
+            if key not in self._queues or not self._queues[key]:
+                # Vaga (re)ativada começa no passo atual, sem "crédito" acumulado
+                active = [self._pass[k] for k, q in self._queues.items() if q and k != key]
+                self._pass[key] = max(self._pass.get(key, 0.0), min(active, default=0.0))
+                self._queues.setdefault(key, [])
+                self._weights[key] = opening_weight(opening, self.boosts)
+            self._seq += 1
+            heapq.heappush(self._queues[key], (-_mtime(cv_path), self._seq, cv_path, opening))
+
+    def add_many(self, tasks: List[Tuple[str, Dict[str, Any]]]):
+        for cv_path, opening in tasks:
+            self.add(cv_path, opening)
+
+    def next(self) -> Optional[Tuple[str, Dict[str, Any]]]:
+        """Próxima tarefa (cv_path, vaga), ou None se não houver."""
+        with self._lock:
+            candidates = [
+                key for key, queue in self._queues.items()
+                if queue and (self.per_opening_cap is None or self._served.get(key, 0) < self.per_opening_cap)
+            ]
+            if not candidates:
+                return None
+            key = min(candidates, key=lambda k: (self._pass[k], -self._weights[k]))
+            _, _, cv_path, opening = heapq.heappop(self._queues[key])
+            self._served[key] = self._served.get(key, 0) + 1
+            self._pass[key] += 1.0 / self._weights[key]
+            return cv_path, opening
+
+    def drain(self) -> List[Tuple[str, Dict[str, Any]]]:
+        """Todas as tarefas na ordem de atendimento (respeitando o limite por vaga)."""
+        ordered = []
+        while True:
+            task = self.next()
+            if task is None:
+                return ordered
+            ordered.append(task)
+
+    def __len__(self) -> int:
+        with self._lock:
+            return sum(len(q) for q in self._queues.values())
+
+
+def schedule_tasks(
+    tasks: List[Tuple[str, Dict[str, Any]]],
+    boosts: Optional[Dict[str, float]] = None,
+    per_opening_cap: Optional[int] = None
+) -> List[Tuple[str, Dict[str, Any]]]:
+    """Ordena as tarefas por divisão justa entre as vagas."""
+    scheduler = FairScheduler(boosts=boosts, per_opening_cap=per_opening_cap)
+    scheduler.add_many(tasks)
+    return scheduler.drain()
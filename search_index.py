@@ -0,0 +1,260 @@
+import re
+import sqlite3
+import logging
+from contextlib import contextmanager
+from typing import Optional, Dict, Any, List, Iterable
+
+from ai_prompts import normalize_text
+from blob_store import brief_text
+
+logger = logging.getLogger(__name__)
+
+# ---------- CONFIGURAÇÃO ----------
+SEARCH_INDEX_FILE = "search_index.db"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS candidates (
+    rowid            INTEGER PRIMARY KEY,
+    analysis_id      TEXT NOT NULL UNIQUE,
+    opening_id       TEXT,
+    name             TEXT,
+    formal_education TEXT,
+    score            REAL,
+    experience_years REAL,
+    cv_path          TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_candidates_opening ON candidates (opening_id, score);
+CREATE TABLE IF NOT EXISTS candidate_skills (
+    skill       TEXT NOT NULL,
+    candidate   INTEGER NOT NULL REFERENCES candidates (rowid),
+    PRIMARY KEY (skill, candidate)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_candidate_skills_candidate ON candidate_skills (candidate);
+CREATE VIRTUAL TABLE IF NOT EXISTS candidates_fts USING fts5 (
+    name, formal_education, skills, cv_text,
+    tokenize = 'unicode61 remove_diacritics 2'
+);
+"""
+
+# Pesos do bm25 por coluna: nome, formação, skills, texto do CV
+_BM25_WEIGHTS = "2.0, 1.5, 3.0, 1.0"
+
+
+def normalize_skill(skill: str) -> str:
+    """Forma canônica de uma skill para o filtro por facetas."""
+    return re.sub(r"\s+", " ", normalize_text(skill)).lower()
+
+
+def _to_float(value) -> Optional[float]:
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        return None
+
+
+def to_fts_query(query: str) -> str:
+    """
+    Converte a busca do usuário em uma expressão FTS5 segura:
+    trechos entre aspas viram frases, as demais palavras são combinadas com AND.
+    """
+    terms = []
+    for phrase, word in re.findall(r'"([^"]+)"|(\S+)', query):
+        text = (phrase or word).replace('"', ' ').strip()
+        if text:
+            terms.append(f'"{text}"')
+    return " ".join(terms)
+
+
+class SearchIndex:
+    """
+    Índice de busca (SQLite FTS5) sobre todos os candidatos analisados.
+
+    É atualizado incrementalmente pelo `process_cvs` a cada análise salva e
+    permite buscas ranqueadas por palavra-chave/frase, filtro por skills e
+    filtros por vaga, pontuação e anos de experiência.
+    """
+
+    def __init__(self, db_path: str = SEARCH_INDEX_FILE):
+        self.db_path = db_path
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    # ---------- ESCRITA ----------
+    def add(self, analysis_id: str, opening_id, analysis: Dict[str, Any], cv_text: str = "", cv_path: str = ""):
+        """Indexa (ou reindexa) uma análise."""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                self._add(conn, analysis_id, opening_id, analysis, cv_text, cv_path)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    def _add(self, conn, analysis_id, opening_id, analysis, cv_text, cv_path):
+        self._remove(conn, analysis_id)
+        hard_skills = analysis.get('hard_skills') or []
+        soft_skills = analysis.get('soft_skills') or []
+        cur = conn.execute(
+            "INSERT INTO candidates (analysis_id, opening_id, name, formal_education, score, experience_years, cv_path) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)",
+            (
+                analysis_id,
+                str(opening_id),
+                analysis.get('name'),
+                analysis.get('formal_education'),
+                _to_float(analysis.get('score')),
+                _to_float(analysis.get('total_experience_years')),
+                cv_path,
+            )
+        )
+        rowid = cur.lastrowid
+        skills = {normalize_skill(s) for s in [*hard_skills, *soft_skills] if s}
+        conn.executemany(
+            "INSERT OR IGNORE INTO candidate_skills (skill, candidate) VALUES (?, ?)",
+            [(skill, rowid) for skill in skills]
+        )
+        conn.execute(
+            "INSERT INTO candidates_fts (rowid, name, formal_education, skills, cv_text) VALUES (?, ?, ?, ?, ?)",
+            (rowid, analysis.get('name') or '', analysis.get('formal_education') or '', ", ".join([*hard_skills, *soft_skills]), cv_text or '')
+        )
+
+    def _remove(self, conn, analysis_id: str):
+        row = conn.execute("SELECT rowid FROM candidates WHERE analysis_id = ?", (analysis_id,)).fetchone()
+        if row is None:
+            return
+        rowid = row["rowid"]
+        conn.execute("DELETE FROM candidates_fts WHERE rowid = ?", (rowid,))
+        conn.execute("DELETE FROM candidate_skills WHERE candidate = ?", (rowid,))
+        conn.execute("DELETE FROM candidates WHERE rowid = ?", (rowid,))
+
+    def update_scores(self, scores: Dict[str, float]):
+        """Atualiza só a pontuação de análises já indexadas ({analysis_id: nota})."""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.executemany("UPDATE candidates SET score = ? WHERE analysis_id = ?", [(s, a) for a, s in scores.items()])
+            conn.execute("COMMIT")
+
+    def remove_opening(self, opening_id):
+        """Remove do índice todas as análises de uma vaga."""
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            for row in conn.execute("SELECT analysis_id FROM candidates WHERE opening_id = ?", (str(opening_id),)).fetchall():
+                self._remove(conn, row["analysis_id"])
+            conn.execute("COMMIT")
+
+    def rebuild(self, rows: Iterable[Dict[str, Any]]):
+        """Recria o índice a partir de linhas {analysis, cv_text, cv_path}."""
+        count = 0
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            conn.execute("DELETE FROM candidates_fts")
+            conn.execute("DELETE FROM candidate_skills")
+            conn.execute("DELETE FROM candidates")
+            for row in rows:
+                analysis = row['analysis']
+                self._add(conn, analysis['id'], analysis.get('opening_id'), analysis, row.get('cv_text', ''), row.get('cv_path', ''))
+                count += 1
+            conn.execute("COMMIT")
+            conn.execute("INSERT INTO candidates_fts (candidates_fts) VALUES ('optimize')")
+        logger.info(f"Índice de busca recriado com {count} candidatos.")
+        return count
+
+    # ---------- CONSULTA ----------
+    def search(
+        self,
+        query: str = "",
+        skills: Optional[List[str]] = None,
+        opening_id=None,
+        min_score: Optional[float] = None,
+        max_score: Optional[float] = None,
+        min_years: Optional[float] = None,
+        max_years: Optional[float] = None,
+        limit: int = 50
+    ) -> List[Dict[str, Any]]:
+        """
+        Busca candidatos. Com `query`, ordena por relevância (bm25);
+        sem ela, ordena pela pontuação. Todas as `skills` informadas
+        precisam estar presentes.
+        """
+        where, params = [], []
+        fts_query = to_fts_query(query) if query else ""
+        if fts_query:
+            sql = (
+                f"SELECT c.*, bm25(candidates_fts, {_BM25_WEIGHTS}) AS rank, "
+                "snippet(candidates_fts, 3, '**', '**', '…', 12) AS snippet "
+                "FROM candidates_fts JOIN candidates c ON c.rowid = candidates_fts.rowid"
+            )
+            where.append("candidates_fts MATCH ?")
+            params.append(fts_query)
+            order = "rank"
+        else:
+            sql = "SELECT c.*, NULL AS rank, NULL AS snippet FROM candidates c"
+            order = "c.score DESC"
+
+        wanted = sorted({normalize_skill(s) for s in skills or [] if s})
+        if wanted:
+            placeholders = ", ".join("?" * len(wanted))
+            where.append(
+                f"c.rowid IN (SELECT candidate FROM candidate_skills WHERE skill IN ({placeholders}) "
+                "GROUP BY candidate HAVING COUNT(*) = ?)"
+            )
+            params.extend([*wanted, len(wanted)])
+        if opening_id is not None:
+            where.append("c.opening_id = ?")
+            params.append(str(opening_id))
+        for column, op, value in (
+            ("c.score", ">=", min_score), ("c.score", "<=", max_score),
+            ("c.experience_years", ">=", min_years), ("c.experience_years", "<=", max_years),
+        ):
+            if value is not None:
+                where.append(f"{column} {op} ?")
+                params.append(value)
+
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += f" ORDER BY {order} LIMIT ?"
+        params.append(limit)
+
+        with self._connect() as conn:
+            return [dict(row) for row in conn.execute(sql, params).fetchall()]
+
+    def skill_facets(self, opening_id=None, limit: int = 50) -> List[Dict[str, Any]]:
+        """Skills mais frequentes (opcionalmente de uma vaga) com suas contagens."""
+        sql = "SELECT s.skill, COUNT(*) AS count FROM candidate_skills s"
+        params = []
+        if opening_id is not None:
+            sql += " JOIN candidates c ON c.rowid = s.candidate WHERE c.opening_id = ?"
+            params.append(str(opening_id))
+        sql += " GROUP BY s.skill ORDER BY count DESC LIMIT ?"
+        params.append(limit)
+        with self._connect() as conn:
+            return [dict(row) for row in conn.execute(sql, params).fetchall()]
+
+
+def rebuild_from_database(database, index: Optional[SearchIndex] = None) -> int:
+    """Reconstrói o índice a partir das análises e briefs do TinyDB."""
+    index = index or SearchIndex()
+    with database.read_lock():
+        briefs = {b.get('id'): b for b in database.briefs.all()}
+        analyses = database.analysis.all()
+
+    def rows():
+        for analysis in analyses:
+            brief = briefs.get(analysis.get('brief_id'), {})
+            yield {
+                'analysis': analysis,
+                'cv_text': brief_text(brief),
+                'cv_path': brief.get('cv_path') or brief.get('file', ''),
+            }
+
+    return index.rebuild(rows())
@@ -0,0 +1,155 @@
+import os
+import hashlib
+import logging
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Tuple
+
+from utils_cv import file_digest
+from blob_store import BlobStore, BLOB_DIR
+
+logger = logging.getLogger(__name__)
+
+# ---------- CONFIGURAÇÃO ----------
+SHARD_DIR = "shards"
+SHARD_DB_FILE = "applicants.json"
+
+
+def shard_of(cv_digest: str, opening_id, count: int) -> int:
+    """Shard (0 a count-1) do par (CV, vaga): o mesmo em qualquer máquina e versão do Python."""
+    key = f"{cv_digest}:{opening_id}".encode('utf-8')
+    return int.from_bytes(hashlib.sha256(key).digest()[:8], 'big') % count
+
+
+@dataclass(frozen=True)
+class Shard:
+    """
+    Fatia `index` de `count` (1 a count) de um backfill dividido entre
+    máquinas. Cada par (CV, vaga) pertence a exatamente um shard, escolhido
+    pelo digest do CV e o id da vaga, então as máquinas não precisam
+    combinar nada além de N e dos mesmos arquivos e vagas.
+    """
+
+    index: int
+    count: int
+
+    @classmethod
+    def parse(cls, spec: str) -> "Shard":
+        """'i/N' (ex.: '2/4') -> Shard(2, 4)."""
+        try:
+            index, count = (int(part) for part in spec.split('/'))
+        except ValueError:
+            raise ValueError(f"shard inválido '{spec}': use i/N, ex.: 2/4")
+        if count < 1 or not 1 <= index <= count:
+            raise ValueError(f"shard inválido '{spec}': i deve estar entre 1 e N")
+        return cls(index, count)
+
+    @property
+    def name(self) -> str:
+        return f"shard-{self.index}-of-{self.count}"
+
+    @property
+    def store_dir(self) -> str:
+        """Pasta com o banco (applicants.json) e os textos (cv_texts/) deste shard."""
+        return os.path.join(SHARD_DIR, self.name)
+
+    def owns(self, cv_digest: str, opening_id) -> bool:
+        return shard_of(cv_digest, opening_id, self.count) == self.index - 1
+
+
+def select_shard(tasks: List[Tuple[str, Dict[str, Any]]], shard: Optional[Shard]) -> List[Tuple[str, Dict[str, Any]]]:
+    """Mantém só os pares (CV, vaga) do shard (todos, sem shard). Cada arquivo é lido uma vez."""
+    if shard is None:
+        return tasks
+    digests: Dict[str, str] = {}
+    selected = []
+    for cv_file, opening_data in tasks:
+        digest = digests.get(cv_file)
+        if digest is None:
+            try:
+                digest = digests[cv_file] = file_digest(cv_file)
+            except OSError as e:
+                logger.warning(f"CV {os.path.basename(cv_file)} ilegível ({e}). Pulando.")
+                continue
+        if shard.owns(digest, opening_data.get('id')):
+            selected.append((cv_file, opening_data))
+    logger.info(f"Shard {shard.index}/{shard.count}: {len(selected)} de {len(tasks)} pares (CV, vaga) pendentes.")
+    return selected
+
+
+def dedupe_key(analysis: Dict[str, Any], brief: Optional[Dict[str, Any]]) -> Optional[Tuple[str, str, str]]:
+    """(digest do CV, vaga, versão do prompt): duas análises com a mesma chave são equivalentes. None sem digest."""
+    cv_digest = analysis.get('cv_digest') or (brief or {}).get('cv_digest')
+    if not cv_digest:
+        return None
+    return cv_digest, str(analysis.get('opening_id')), analysis.get('prompt_version') or ""
+
+
+def path_key(analysis: Dict[str, Any], brief: Optional[Dict[str, Any]]) -> Optional[Tuple[str, str]]:
+    """(arquivo do CV, vaga): identifica as análises antigas, gravadas sem o digest do CV."""
+    cv_path = (brief or {}).get('cv_path') or (brief or {}).get('file')
+    return (os.path.abspath(cv_path), str(analysis.get('opening_id'))) if cv_path else None
+
+
+def merge_shard(database, shard_dir: str, store: BlobStore) -> List[Tuple[Dict[str, Any], Dict[str, Any]]]:
+    """
+    Copia para `database` as análises de um shard que ainda não estão lá
+    (pela chave de `dedupe_key`), com seus briefs e os textos referenciados.
+    Um par (CV, vaga) com análise antiga, sem digest, no banco principal
+    também não é copiado. Idempotente: mesclar o mesmo shard de novo não
+    copia nada.
+    Retorna os pares (análise, brief) copiados.
+    """
+    from database import AnalysisDatabase
+
+    db_path = os.path.join(shard_dir, SHARD_DB_FILE)
+    if not os.path.exists(db_path):
+        logger.error(f"'{db_path}' não encontrado. Shard ignorado.")
+        return []
+    shard_db = AnalysisDatabase(db_path=db_path)
+    shard_store = BlobStore(os.path.join(shard_dir, BLOB_DIR))
+
+    with database.read_lock():
+        main_briefs = {b['id']: b for b in database.briefs.all()}
+        main_analyses = database.analysis.all()
+    seen, legacy_pairs = set(), set()
+    for a in main_analyses:
+        brief = main_briefs.get(a.get('brief_id'))
+        key = dedupe_key(a, brief)
+        if key is not None:
+            seen.add(key)
+        elif path_key(a, brief) is not None:
+            legacy_pairs.add(path_key(a, brief))
+    shard_briefs = {b['id']: b for b in shard_db.briefs.all()}
+
+    merged = []
+    for analysis in shard_db.analysis.all():
+        brief = shard_briefs.get(analysis.get('brief_id'))
+        key = dedupe_key(analysis, brief)
+        if brief is None or key in seen or path_key(analysis, brief) in legacy_pairs:
+            continue
+        if key is not None:
+            seen.add(key)
+        elif path_key(analysis, brief) is not None:
+            legacy_pairs.add(path_key(analysis, brief))
+        for ref in (brief.get('cv_text_ref'), brief.get('raw_text_ref')):
+            if ref and not store.exists(ref):
+                text = shard_store.get(ref)
+                if text is not None:
+                    store.put(text)
+        merged.append((dict(analysis), dict(brief)))
+    shard_db.close()
+
+    new_briefs = {brief['id']: brief for _, brief in merged if brief['id'] not in main_briefs}
+    database.import_rows(list(new_briefs.values()), [analysis for analysis, _ in merged])
+    logger.info(f"Shard '{shard_dir}': {len(merged)} análises novas mescladas.")
+    return merged
+
+
+def shard_dirs(base_dir: str = SHARD_DIR) -> List[str]:
+    """Pastas de shard em `base_dir` (as copiadas de outras máquinas também)."""
+    if not os.path.isdir(base_dir):
+        return []
+    return sorted(
+        os.path.join(base_dir, name) for name in os.listdir(base_dir)
+        if os.path.exists(os.path.join(base_dir, name, SHARD_DB_FILE))
+    )
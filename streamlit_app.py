@@ -1,16 +1,72 @@
+import hashlib
+from typing import Tuple
+
 import streamlit as st
 import pandas as pd
 from st_aggrid import AgGrid, GridOptionsBuilder, GridUpdateMode
 from database import AnalysisDatabase
-from openings_db_manager import load_openings_db, create_new_opening
-import json
+from openings_db_manager import get_catalog, load_openings_db, create_new_opening, opening_version
+from search_index import SearchIndex
+from reports import archive_bytes, archive_name, render_report, report_filename
 
 # ---------- CONFIGURAÇÃO ----------
 COL_PONTUACAO = "Pontuação"
-database = AnalysisDatabase(db_path='applicants.json')
 st.set_page_config(layout='wide', page_title='Analisador de Talentos')
 
+# O Streamlit reexecuta o script a cada interação: os recursos são criados
+# uma única vez por processo e reaproveitados entre as execuções.
+@st.cache_resource
+def get_database() -> AnalysisDatabase:
+    return AnalysisDatabase(db_path='applicants.json')
+
+@st.cache_resource
+def get_search_index() -> SearchIndex:
+    return SearchIndex()
+
+@st.cache_resource
+def get_match_store():
+    from match_matrix import MatchStore  # numpy/scipy
+    return MatchStore()
+
+@st.cache_resource
+def get_analytics():
+    from analytics_snapshot import AnalyticsSnapshot  # pyarrow
+    return AnalyticsSnapshot()
+
+# Colunas do snapshot usadas pela aba de análise
+ANALYSIS_COLUMNS = ['id', 'brief_id', 'cv_digest', 'name', 'formal_education', 'hard_skills', 'soft_skills', 'score', 'total_experience_years', 'updated_at']
+
 # ---------- FUNÇÕES DO APP ----------
+def load_opening_dataframe(opening_id) -> Tuple[pd.DataFrame, tuple]:
+    """
+    Carrega as análises de uma vaga do snapshot colunar (memory-map, só as
+    colunas necessárias). Usa o TinyDB se o snapshot ainda não foi gerado.
+    Retorna também a versão das análises, usada como chave do cache dos relatórios.
+    """
+    table = get_analytics().read(opening_id, ANALYSIS_COLUMNS)
+    if table.num_rows:
+        df = table.to_pandas()
+        return df, snapshot_version(df)
+    from analytics_snapshot import records_table
+    records = get_database().analysis_records(opening_id)
+    return records_table(records, updated_at=0.0).select(ANALYSIS_COLUMNS).to_pandas(), content_version(records)
+
+def snapshot_version(df: pd.DataFrame) -> tuple:
+    """Versão das análises de uma vaga no snapshot: muda quando uma análise é gravada, refeita ou removida."""
+    return len(df), float(df['updated_at'].max())
+
+def content_version(records) -> tuple:
+    """Versão das análises lidas do TinyDB (sem snapshot, não há data de gravação): digest do conteúdo de cada análise."""
+    digest = hashlib.sha1()
+    for r in records:
+        digest.update(repr((r.id, r.cv_digest, r.score, r.prompt_version, r.opening_version)).encode('utf-8'))
+    return len(records), digest.hexdigest()
+
+@st.cache_data(max_entries=8, show_spinner="Gerando os relatórios...")
+def opening_archive(opening_id, version: tuple, _opening_data) -> bytes:
+    """Arquivo .zip dos relatórios de uma vaga, refeito só quando a vaga ou suas análises mudam."""
+    return archive_bytes(get_database(), _opening_data)
+
 def show_analysis_tab():
     """Exibe a interface de análise de vagas existentes."""
     openings = load_openings_db()
@@ -23,22 +79,20 @@ def show_analysis_tab():
     option = st.selectbox('Escolha a vaga:', opening_titles)
 
     if option:
-        selected_opening = openings.get(option)
+        selected_opening = get_catalog().by_title(option)
         if not selected_opening:
             st.warning("Vaga selecionada não encontrada.")
             return
 
         opening_id = selected_opening.get("id")
-        data = database.get_analysis_by_opening_id(opening_id)
-
-        if data:
-            df = pd.DataFrame(data)
-            df['name'] = df['structured_data'].apply(lambda x: x.get('name'))
-            df['formal_education'] = df['structured_data'].apply(lambda x: x.get('formal_education'))
-            df['hard_skills'] = df['structured_data'].apply(lambda x: ", ".join(x.get('hard_skills', [])))
-            df['soft_skills'] = df['structured_data'].apply(lambda x: ", ".join(x.get('soft_skills', [])))
+        df, analyses_version = load_opening_dataframe(opening_id)
+
+        if not df.empty:
+            version = (opening_version(selected_opening), selected_opening.get('title'), *analyses_version)
+            df['hard_skills'] = df['hard_skills'].map(lambda x: ", ".join(x) if x is not None else "")
+            df['soft_skills'] = df['soft_skills'].map(lambda x: ", ".join(x) if x is not None else "")
             df['score'] = df['score'].fillna(0)
-            df['total_experience_years'] = df['total_experience_years'].fillna('N/A')
+            df['total_experience_years'] = df['total_experience_years'].astype(object).where(df['total_experience_years'].notna(), 'N/A')
 
             df = df.rename(columns={
                 'name': 'Nome',
@@ -49,7 +103,7 @@ def show_analysis_tab():
                 'total_experience_years': 'Experiência (Anos)'
             })
             
-            df = df[['Nome', 'Formação', 'Habilidades Técnicas', 'Competências Comportamentais', 'Experiência (Anos)', COL_PONTUACAO, 'brief_id', 'id']]
+            df = df[['Nome', 'Formação', 'Habilidades Técnicas', 'Competências Comportamentais', 'Experiência (Anos)', COL_PONTUACAO, 'brief_id', 'id', 'cv_digest']]
             df[COL_PONTUACAO] = pd.to_numeric(df[COL_PONTUACAO], errors='coerce').fillna(0)
             
             gb = GridOptionsBuilder.from_dataframe(df)
@@ -72,22 +126,102 @@ def show_analysis_tab():
             selected_applicants = response.get('selected_rows', [])
             applicants_df = pd.DataFrame(selected_applicants)
 
+            st.download_button(
+                'Baixar relatórios (.zip)',
+                data=opening_archive(opening_id, version, selected_opening),
+                file_name=archive_name(selected_opening),
+                mime='application/zip'
+            )
+
             if st.button('Limpar Análise'):
+                database = get_database()
                 database.delete_all_briefs_by_opening_id(opening_id)
                 database.delete_all_analysis_by_opening_id(opening_id)
+                get_search_index().remove_opening(opening_id)
+                get_analytics().compact(exclude_openings=[opening_id])
                 st.experimental_rerun()
 
             if not applicants_df.empty:
                 st.subheader('Análise Detalhada')
+                analyses = {a.id: a for a in get_database().analysis_records(opening_id)}
                 for idx, row in applicants_df.iterrows():
-                    brief_data = database.get_brief_by_id(row['brief_id'])
+                    brief_data = get_database().get_brief_by_id(row['brief_id'])
                     if brief_data:
                         st.markdown(brief_data.get('content', ''))
+                        analysis = analyses.get(row['id'])
+                        if analysis:
+                            cv_path = brief_data.get('cv_path') or brief_data.get('file') or analysis.name or row['id']
+                            st.download_button(
+                                'Baixar relatório (.md)',
+                                data=render_report(selected_opening, analysis, brief_data),
+                                file_name=report_filename(cv_path, selected_opening),
+                                mime='text/markdown',
+                                key=f"report_{row['id']}"
+                            )
+                    show_alternative_openings(row.get('cv_digest'), openings)
         else:
             st.info("Nenhuma análise encontrada para esta vaga.")
     else:
         st.info("Selecione uma vaga para visualizar os candidatos.")
 
+def show_alternative_openings(cv_digest, openings):
+    """Mostra as outras vagas em que o candidato também se encaixa."""
+    if not cv_digest:
+        return
+    id_to_title = {str(o.get('id')): o.get('title') for o in openings.values()}
+    matches = [m for m in get_match_store().get_matches(cv_digest) if m['opening_id'] in id_to_title]
+    if matches:
+        suggestions = ", ".join(f"{id_to_title[m['opening_id']]} ({m['similarity']:.2f})" for m in matches)
+        st.caption(f"Também indicado para: {suggestions}")
+
+def show_search_tab():
+    """Busca candidatos de todas as vagas por palavra-chave, frase e skills."""
+    st.subheader('Buscar Candidatos')
+    openings = load_openings_db()
+    id_to_title = {str(o.get('id')): o.get('title') for o in openings.values()} if openings else {}
+
+    query = st.text_input('Palavras-chave', help='Use aspas para buscar frases exatas. Ex: "power bi" vendas')
+    col1, col2 = st.columns(2)
+    with col1:
+        facets = get_search_index().skill_facets(limit=200)
+        skills = st.multiselect('Skills (todas obrigatórias)', [f['skill'] for f in facets])
+        opening_title = st.selectbox('Vaga', ['Todas'] + list(id_to_title.values()))
+    with col2:
+        min_score, max_score = st.slider(COL_PONTUACAO, 0.0, 10.0, (0.0, 10.0), step=0.5)
+        min_years, max_years = st.slider('Experiência (Anos)', 0, 40, (0, 40))
+
+    opening_id = None
+    if opening_title != 'Todas':
+        opening_id = next(i for i, t in id_to_title.items() if t == opening_title)
+
+    results = get_search_index().search(
+        query=query,
+        skills=skills,
+        opening_id=opening_id,
+        min_score=min_score if min_score > 0 else None,
+        max_score=max_score if max_score < 10 else None,
+        min_years=min_years if min_years > 0 else None,
+        max_years=max_years if max_years < 40 else None,
+        limit=200
+    )
+
+    if not results:
+        st.info("Nenhum candidato encontrado.")
+        return
+
+    df = pd.DataFrame(results)
+    df['opening_id'] = df['opening_id'].map(lambda i: id_to_title.get(i, i))
+    df = df.rename(columns={
+        'name': 'Nome',
+        'opening_id': 'Vaga',
+        'formal_education': 'Formação',
+        'score': COL_PONTUACAO,
+        'experience_years': 'Experiência (Anos)',
+        'snippet': 'Trecho'
+    })
+    st.caption(f"{len(df)} candidatos encontrados.")
+    st.dataframe(df[['Nome', 'Vaga', 'Formação', 'Experiência (Anos)', COL_PONTUACAO, 'Trecho']], width='stretch')
+
 def show_create_opening_tab():
     """Exibe o formulário para criar novas vagas."""
     st.subheader('Criar Nova Vaga')
@@ -143,10 +277,12 @@ def show_create_opening_tab():
 
 # ---------- NAVEGAÇÃO E EXECUÇÃO PRINCIPAL ----------
 def main():
-    tab1, tab2 = st.tabs(["Análise de Vagas", "Criar Nova Vaga"])
+    tab1, tab2, tab3 = st.tabs(["Análise de Vagas", "Buscar Candidatos", "Criar Nova Vaga"])
     with tab1:
         show_analysis_tab()
     with tab2:
+        show_search_tab()
+    with tab3:
         show_create_opening_tab()
 
 if __name__ == "__main__":
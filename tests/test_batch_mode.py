@@ -0,0 +1,97 @@
+"""
+Modo batch de ponta a ponta contra o servidor local (fake_llm_server.py):
+renderização, envio, acompanhamento e ingestão no TinyDB.
+"""
+import os
+import random
+import threading
+
+import pytest
+
+import batch_mode
+import blob_store
+import openings_db_manager
+import process_cvs
+from fake_llm_server import API_PREFIX, make_server
+from load_test import build_cvs, build_openings
+
+CVS = 5
+OPENINGS = 2  # As duas vagas compartilham a pasta: 5 CVs x 2 vagas = 10 pares
+
+
+@pytest.fixture
+def workspace(tmp_path, monkeypatch):
+    server = make_server(0, batch_delay=0.2)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    base_url = f"http://127.0.0.1:{server.server_port}"
+    monkeypatch.setenv("GROQ_API_BASE", base_url)
+    monkeypatch.setenv("GROQ_BATCH_BASE_URL", f"{base_url}{API_PREFIX}")
+    monkeypatch.setenv("GROQ_API_KEY", "test")
+    monkeypatch.chdir(tmp_path)
+
+    rng = random.Random(0)
+    job_openings = build_openings(OPENINGS, rng)
+    catalog = openings_db_manager.OpeningCatalog(str(tmp_path / openings_db_manager.DB_FILE))
+    catalog.save_all(job_openings)
+    monkeypatch.setattr(openings_db_manager, "_catalog", catalog)
+    monkeypatch.setattr(blob_store, "_default_store", None)
+    build_cvs(process_cvs.CV_BASE_DIR, sorted({o["folder"] for o in job_openings.values()}), CVS, rng)
+
+    process_cvs._instances.clear()
+    # Extração no próprio processo: os CVs sintéticos são pequenos e confiáveis
+    process_cvs.get_extractor().isolated = False
+    try:
+        yield server
+    finally:
+        process_cvs._instances.clear()
+        server.shutdown()
+
+
+def _requests(server) -> int:
+    return server.RequestHandlerClass.state.stats.snapshot()["requests"]
+
+
+def _analyses() -> int:
+    return len(process_cvs.get_database().analysis_records())
+
+
+def test_run_batch_ingests_every_pair_and_second_run_is_noop(workspace):
+    batch_mode.run_batch(poll_interval=0.1)
+    assert _analyses() == CVS * OPENINGS
+    requests_after_first = _requests(workspace)
+
+    batch_mode.run_batch(poll_interval=0.1)
+    assert _analyses() == CVS * OPENINGS
+    assert _requests(workspace) == requests_after_first
+
+
+def test_ingest_uses_digest_recorded_at_render_time(workspace):
+    tasks = process_cvs.pending_tasks(process_cvs.collect_tasks(process_cvs.CV_BASE_DIR, process_cvs.build_folder_to_opening()))
+    os.makedirs(batch_mode.BATCH_DIR, exist_ok=True)
+    requests_path = os.path.join(batch_mode.BATCH_DIR, "teste.requests.jsonl")
+    manifest_path = os.path.join(batch_mode.BATCH_DIR, "teste.manifest.jsonl")
+    assert batch_mode.render_batch(tasks, requests_path, manifest_path) == CVS * OPENINGS
+    digests = {os.path.abspath(cv_path): process_cvs.file_digest(cv_path) for cv_path, _ in tasks}
+
+    # Entre o envio e a ingestão, um CV some e outro é editado
+    moved, edited = sorted(digests)[:2]
+    os.remove(moved)
+    with open(edited, 'ab') as f:
+        f.write(b"\0")
+
+    api = batch_mode.BatchAPI()
+    batch_id = batch_mode.submit(api, requests_path, manifest_path)
+    batch_mode.poll(api, batch_id, interval=0.1)
+    # Uma linha corrompida no resultado não interrompe a ingestão das demais
+    output_path = os.path.join(batch_mode.BATCH_DIR, f"{batch_id}.output.jsonl")
+    api.download(batch_mode._load_state(batch_id)["output_file_id"], output_path)
+    with open(output_path, 'a', encoding='utf-8') as f:
+        f.write("{linha corrompida\n")
+
+    saved, failed = batch_mode.ingest(api, batch_id)
+    assert (saved, failed) == (CVS * OPENINGS, 1)
+    database = process_cvs.get_database()
+    briefs = {b.id: b for b in database.brief_records()}
+    for analysis in database.analysis_records():
+        brief = briefs[analysis.brief_id]
+        assert analysis.cv_digest == digests[os.path.abspath(brief.cv_path)]
@@ -0,0 +1,55 @@
+"""Validação incremental do JSON das respostas em streaming (json_stream.py)."""
+import json
+
+import pytest
+
+from json_stream import IncrementalJSONParser, StreamAbort, parse_stream
+
+OBJECT = '{"score": 7.5, "hard_skills": ["sql", "python"], "conclusion": "Perfil aderente, {com} chaves."}'
+
+
+def feed_by_char(parser: IncrementalJSONParser, text: str) -> bool:
+    done = False
+    for char in text:
+        done = parser.feed(char)
+    return done
+
+
+@pytest.mark.parametrize("prefix", ["", "  \n", "`", "``", "```", "```\n", "```json", "```json\n", "\n```JSON  \n"])
+def test_accepts_fence_prefixes_fed_char_by_char(prefix):
+    parser = IncrementalJSONParser()
+    assert feed_by_char(parser, prefix + OBJECT + "\n```")
+    assert json.loads(parser.text()) == json.loads(OBJECT)
+
+
+def test_delivers_each_top_level_field_as_it_closes():
+    seen = []
+    parser = IncrementalJSONParser(lambda key, value: seen.append((key, value, parser.done)))
+    feed_by_char(parser, OBJECT)
+    assert seen == [
+        ("score", 7.5, False),
+        ("hard_skills", ["sql", "python"], False),
+        ("conclusion", "Perfil aderente, {com} chaves.", False),
+    ]
+
+
+@pytest.mark.parametrize("text", [
+    "Aqui está a análise: {",
+    "```json\nSegue o resultado",
+    "````",
+    '{"score": **7**}',
+    '{"score": 7]',
+    '{"score": 7, "name" "Ana"}',
+])
+def test_aborts_as_soon_as_the_response_cannot_be_json(text):
+    with pytest.raises(StreamAbort):
+        feed_by_char(IncrementalJSONParser(), text)
+
+
+def test_parse_stream_stops_at_the_closing_brace():
+    chunks = iter(['```json\n{"score": 8', ', "name": "Ana"}', "\n```", "texto que não deveria ser lido"])
+    text, fields = parse_stream(chunks)
+    assert fields == {"score": 8, "name": "Ana"}
+    assert text == '{"score": 8, "name": "Ana"}'
+    # O restante do stream não é consumido
+    assert list(chunks) == ["\n```", "texto que não deveria ser lido"]
@@ -0,0 +1,79 @@
+"""Fila persistente com leases (work_queue.py): expiração, retentativas e dead-letter."""
+import pytest
+
+import work_queue
+from work_queue import DEAD, DONE, LEASED, PENDING, WorkQueue
+
+LEASE = 60.0
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(work_queue.time, "time", clock)
+    return clock
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    queue = WorkQueue(str(tmp_path / "queue.db"), lease_seconds=LEASE, max_attempts=2)
+    queue.enqueue("digest-a", 1, "a.pdf")
+    return queue
+
+
+def test_expired_lease_is_reclaimed_by_another_worker(queue, clock):
+    job = queue.lease("w1")
+    assert queue.lease("w2") is None
+
+    clock.now += LEASE + 1
+    reclaimed = queue.lease("w2")
+    assert (reclaimed["cv_digest"], reclaimed["attempts"], reclaimed["lease_owner"]) == ("digest-a", 2, "w2")
+    # O worker antigo perdeu o lease: não confirma nem renova a tarefa
+    assert not queue.ack(job, "w1")
+    assert not queue.extend_lease(job, "w1")
+    assert queue.ack(reclaimed, "w2")
+    assert queue.stats()[DONE] == 1
+
+
+def test_heartbeat_keeps_the_lease(queue, clock):
+    job = queue.lease("w1")
+    clock.now += LEASE * 0.9
+    assert queue.extend_lease(job, "w1")
+    clock.now += LEASE * 0.9
+    assert queue.lease("w2") is None
+    assert queue.stats()[LEASED] == 1
+
+
+def test_failures_go_to_dead_letter_after_max_attempts(queue):
+    assert queue.fail(queue.lease("w1"), "w1", "erro 1")
+    assert queue.stats()[PENDING] == 1
+    assert queue.fail(queue.lease("w1"), "w1", "erro 2")
+    assert queue.stats()[DEAD] == 1
+    assert queue.lease("w1") is None
+
+    assert queue.requeue_dead() == 1
+    assert queue.lease("w1")["attempts"] == 1
+
+
+def test_expired_lease_at_max_attempts_goes_to_dead_letter(queue, clock):
+    # Dois workers que caíram no meio da tarefa: o lease expira nas duas vezes
+    queue.lease("w1")
+    clock.now += LEASE + 1
+    queue.lease("w2")
+    clock.now += LEASE + 1
+    assert queue.lease("w3") is None
+    assert queue.stats()[DEAD] == 1
+
+
+def test_release_does_not_count_the_attempt(queue):
+    job = queue.lease("w1")
+    assert queue.release(job, "w1")
+    assert queue.lease("w1")["attempts"] == 1
@@ -0,0 +1,247 @@
+import os
+import json
+import time
+import tempfile
+import threading
+import logging
+from collections import deque
+from typing import Dict, Any, List, Optional
+
+logger = logging.getLogger(__name__)
+
+# ---------- CONFIGURAÇÃO ----------
+OUTPUT_TOKENS_FILE = os.path.join("metrics", "output_tokens.json")
+CALL_LOG_FILE = os.path.join("metrics", "llm_calls.jsonl")
+MAX_TOKENS_CEILING = 6000
+MAX_TOKENS_FLOOR = 256
+# Amostras por versão de prompt antes de reduzir o max_tokens
+MIN_SAMPLES = 20
+WINDOW = 500
+PERCENTILE = 0.99
+# Folga sobre o percentil observado
+HEADROOM = 1.3
+# Preços de referência (USD por milhão de tokens de entrada, saída); confira a tabela do provedor
+PRICES_PER_MILLION = {
+    "openai/gpt-oss-20b": (0.075, 0.30),
+    "openai/gpt-oss-120b": (0.15, 0.60),
+    "llama-3.1-8b-instant": (0.05, 0.08),
+    "llama-3.3-70b-versatile": (0.59, 0.79),
+}
+DEFAULT_PRICE = PRICES_PER_MILLION["openai/gpt-oss-20b"]
+
+
+def _percentile(values: List[float], p: float) -> Optional[float]:
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(p * len(ordered)))]
+
+
+class OutputTokenBudget:
+    """
+    Distribuição de tokens de saída por versão de prompt, persistida entre
+    execuções, usada para definir o `max_tokens` de cada chamada: o p99
+    observado com 30% de folga, entre MAX_TOKENS_FLOOR e MAX_TOKENS_CEILING.
+    Respostas cortadas por limite (finish_reason 'length') entram como uma
+    amostra do dobro do limite usado, empurrando o percentil para cima.
+
+    Cada chamada também é registrada em `metrics/llm_calls.jsonl` para o
+    relatório de comparação entre os formatos de resposta.
+    """
+
+    def __init__(self, path: str = OUTPUT_TOKENS_FILE, call_log: Optional[str] = CALL_LOG_FILE):
+        self.path = path
+        self.call_log = call_log
+        self._samples: Dict[str, deque] = {}
+        self._lock = threading.Lock()
+        self._save_lock = threading.Lock()
+        self._dirty = 0
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                for version, values in json.load(f).items():
+                    self._samples[version] = deque(values, maxlen=WINDOW)
+        except (FileNotFoundError, json.JSONDecodeError):
+            pass
+
+    def versions(self) -> List[str]:
+        with self._lock:
+            return list(self._samples)
+
+    def samples(self, version: str) -> List[int]:
+        """Tokens de saída observados para a versão do prompt (mais recentes por último)."""
+        with self._lock:
+            return list(self._samples.get(version) or [])
+
+    def max_tokens(self, version: Optional[str]) -> int:
+        with self._lock:
+            samples = list(self._samples.get(version) or [])
+        if len(samples) < MIN_SAMPLES:
+            return MAX_TOKENS_CEILING
+        return int(min(MAX_TOKENS_CEILING, max(MAX_TOKENS_FLOOR, _percentile(samples, PERCENTILE) * HEADROOM)))
+
+    def record(
+        self,
+        version: str,
+        mode: str,
+        output_tokens: int,
+        latency: float,
+        max_tokens: int,
+        truncated: bool = False,
+        input_tokens: Optional[int] = None
+    ):
+        """
+        Registra uma chamada. Nunca levanta exceção: chamado com a resposta
+        já paga em mãos, uma falha ao gravar as métricas só é registrada no log.
+        """
+        sample = min(MAX_TOKENS_CEILING, max_tokens * 2) if truncated else output_tokens
+        with self._lock:
+            self._samples.setdefault(version, deque(maxlen=WINDOW)).append(sample)
+            self._dirty += 1
+            save = self._dirty >= 20
+            if self.call_log:
+                try:
+                    os.makedirs(os.path.dirname(self.call_log) or '.', exist_ok=True)
+                    with open(self.call_log, 'a', encoding='utf-8') as f:
+                        f.write(json.dumps({
+                            "ts": time.time(), "mode": mode, "prompt_version": version,
+                            "latency": round(latency, 3), "output_tokens": output_tokens,
+                            "input_tokens": input_tokens, "max_tokens": max_tokens, "truncated": truncated,
+                        }) + "\n")
+                except OSError as e:
+                    logger.warning(f"Não foi possível registrar a chamada em '{self.call_log}': {e}")
+        if save:
+            try:
+                self.save()
+            except Exception as e:
+                logger.warning(f"Não foi possível gravar '{self.path}': {e}")
+
+    def save(self):
+        # Uma gravação por vez; cada uma em seu próprio arquivo temporário
+        with self._save_lock:
+            with self._lock:
+                data = {version: list(values) for version, values in self._samples.items()}
+                self._dirty = 0
+            directory = os.path.dirname(self.path) or '.'
+            os.makedirs(directory, exist_ok=True)
+            fd, tmp_path = tempfile.mkstemp(prefix=os.path.basename(self.path) + '.', suffix='.tmp', dir=directory)
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    json.dump(data, f)
+                os.replace(tmp_path, self.path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+                raise
+
+
+def cost_usd(model: Optional[str], input_tokens: int, output_tokens: int, prices: Optional[Dict[str, tuple]] = None) -> float:
+    price_in, price_out = (prices or PRICES_PER_MILLION).get(model or "", DEFAULT_PRICE)
+    return (input_tokens * price_in + output_tokens * price_out) / 1_000_000
+
+
+class RunBudget:
+    """
+    Limite de gasto de uma execução (USD, tokens e/ou chamadas). Cada
+    chamada é reservada ao começar (o limite de chamadas é exato) e o custo
+    e os tokens são contados com o uso real informado pela API ao terminar,
+    então USD e tokens podem passar um pouco do limite (até uma chamada por
+    slot de concorrência). Esgotado, nenhuma tarefa nova começa.
+    """
+
+    def __init__(self, max_usd: Optional[float] = None, max_tokens: Optional[int] = None, max_calls: Optional[int] = None):
+        self.max_usd = max_usd
+        self.max_tokens = max_tokens
+        self.max_calls = max_calls
+        self._spent = {'usd': 0.0, 'tokens': 0, 'calls': 0}
+        self._lock = threading.Lock()
+        self._warned = False
+
+    def _exhausted(self) -> bool:
+        spent = self._spent
+        return (
+            (self.max_usd is not None and spent['usd'] >= self.max_usd)
+            or (self.max_tokens is not None and spent['tokens'] >= self.max_tokens)
+            or (self.max_calls is not None and spent['calls'] >= self.max_calls)
+        )
+
+    def reserve(self) -> bool:
+        """Conta uma chamada que vai começar; False se o orçamento já acabou."""
+        with self._lock:
+            if self._exhausted():
+                allowed = False
+            else:
+                self._spent['calls'] += 1
+                allowed = True
+        if not allowed:
+            self.exhausted()
+        return allowed
+
+    def charge(self, model: Optional[str], input_tokens: int, output_tokens: int):
+        """Soma o uso de uma chamada reservada com `reserve`."""
+        with self._lock:
+            self._spent['usd'] += cost_usd(model, input_tokens, output_tokens)
+            self._spent['tokens'] += input_tokens + output_tokens
+
+    def exhausted(self) -> bool:
+        with self._lock:
+            exhausted = self._exhausted()
+        if exhausted and not self._warned:
+            self._warned = True
+            logger.warning(f"Orçamento da execução esgotado ({self.metrics()}). Nenhuma tarefa nova será iniciada.")
+        return exhausted
+
+    def metrics(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                'usd': round(self._spent['usd'], 4), 'tokens': self._spent['tokens'], 'calls': self._spent['calls'],
+                'max_usd': self.max_usd, 'max_tokens': self.max_tokens, 'max_calls': self.max_calls,
+            }
+
+
+def load_calls(path: str = CALL_LOG_FILE, since: Optional[float] = None) -> List[Dict[str, Any]]:
+    calls = []
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            for line in f:
+                if line.strip():
+                    call = json.loads(line)
+                    if since is None or call.get("ts", 0) >= since:
+                        calls.append(call)
+    except FileNotFoundError:
+        pass
+    return calls
+
+
+def compare_modes(calls: List[Dict[str, Any]]) -> str:
+    """Tabela markdown com latência e tokens por análise em cada formato de resposta."""
+    lines = [
+        "| Formato | Chamadas | Latência média (s) | p50 (s) | p95 (s) | Tokens de saída (média) | p95 tokens | Tokens de entrada (média) | Cortadas |",
+        "| ------- | -------- | ------------------ | ------- | ------- | ----------------------- | ---------- | ------------------------- | -------- |",
+    ]
+    for mode in sorted({c.get("mode") for c in calls}):
+        rows = [c for c in calls if c.get("mode") == mode]
+        latencies = [c["latency"] for c in rows]
+        outputs = [c["output_tokens"] for c in rows]
+        inputs = [c["input_tokens"] for c in rows if c.get("input_tokens") is not None]
+        truncated = sum(1 for c in rows if c.get("truncated"))
+        lines.append(
+            f"| {mode} | {len(rows)} | {sum(latencies) / len(rows):.2f} | {_percentile(latencies, 0.5):.2f} | {_percentile(latencies, 0.95):.2f} "
+            f"| {sum(outputs) / len(rows):.0f} | {_percentile(outputs, 0.95):.0f} "
+            f"| {(sum(inputs) / len(inputs)) if inputs else float('nan'):.0f} | {truncated} |"
+        )
+    return "\n".join(lines)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    parser = argparse.ArgumentParser(description="Orçamento de tokens de saída e comparação entre formatos de resposta.")
+    parser.add_argument("--report", action="store_true", help="Compara latência e tokens por análise entre os formatos registrados.")
+    args = parser.parse_args()
+    if args.report:
+        calls = load_calls()
+        print(compare_modes(calls) if calls else f"Nenhuma chamada registrada em '{CALL_LOG_FILE}'.")
+        budget = OutputTokenBudget(call_log=None)
+        for version in budget.versions():
+            print(f"max_tokens atual da versão {version}: {budget.max_tokens(version)}")
@@ -1,20 +1,29 @@
-import fitz
-import docx
 import re
+import hashlib
 import unicodedata
 import logging
 from io import StringIO
-from pdfminer.high_level import extract_text_to_fp
 
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+def file_digest(file_path: str) -> str:
+    """Calcula o SHA-256 do conteúdo do arquivo (identidade do CV)."""
+    h = hashlib.sha256()
+    with open(file_path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 16), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
 def _extract_text_with_pymupdf(file_path: str) -> str:
     """Extrai texto de PDFs usando PyMuPDF."""
     try:
+        import fitz
         with fitz.open(file_path) as pdf:
             text = "\n".join(page.get_text() for page in pdf)
         return text
+    except MemoryError:
+        raise
     except Exception as e:
         logger.warning(f"Falha na extração de PDF com PyMuPDF para {file_path}: {e}")
         return ""
@@ -22,17 +31,24 @@ def _extract_text_with_pymupdf(file_path: str) -> str:
 def _extract_text_with_pdfminer(file_path: str) -> str:
     """Extrai texto de PDFs usando pdfminer.six."""
     try:
+        from pdfminer.high_level import extract_text_to_fp
         output_string = StringIO()
         with open(file_path, 'rb') as in_file:
             extract_text_to_fp(in_file, output_string)
         text = output_string.getvalue()
         return text
+    except MemoryError:
+        raise
     except Exception as e:
         logger.error(f"Falha na extração de PDF com pdfminer.six para {file_path}: {e}")
         return ""
 
 def extract_text_from_file(file_path: str) -> str:
     """Extrai texto de PDFs e DOCXs de forma robusta, com fallback para PDFs."""
+    return normalize_cv_text(extract_raw_text_from_file(file_path))
+
+def extract_raw_text_from_file(file_path: str) -> str:
+    """Extrai o texto bruto (sem normalização) de PDFs e DOCXs."""
     text = ""
     try:
         if file_path.lower().endswith(".pdf"):
@@ -44,17 +60,25 @@ def extract_text_from_file(file_path: str) -> str:
                 text = _extract_text_with_pdfminer(file_path)
 
         elif file_path.lower().endswith(".docx"):
+            import docx
             doc = docx.Document(file_path)
             text = "\n".join([p.text for p in doc.paragraphs])
         else:
             logger.warning(f"Formato de arquivo não suportado: {file_path}")
             return ""
 
+    except MemoryError:
+        # Propaga para o processo de extração isolado registrar o arquivo em quarentena
+        raise
     except Exception as e:
         logger.error(f"Erro geral ao ler {file_path}: {e}")
         return ""
 
-    # Normaliza e limpa o texto apenas uma vez, no final da função
+    return text
+
+def normalize_cv_text(text: str) -> str:
+    """Normaliza o texto extraído: espaços, acentos e cedilha."""
+    # Normaliza e limpa o texto apenas uma vez, no final da extração
     text = re.sub(r"\s+", " ", text).strip()
     nfkd_form = unicodedata.normalize('NFD', text)
     text = "".join([c for c in nfkd_form if not unicodedata.combining(c)])
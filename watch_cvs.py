@@ -0,0 +1,249 @@
+import os
+import time
+import threading
+import logging
+import concurrent.futures
+from typing import Dict, Any, List, Tuple
+
+from watchdog.observers import Observer
+from watchdog.events import FileSystemEventHandler
+
+import process_cvs
+from process_cvs import (
+    CV_BASE_DIR,
+    CV_EXTENSIONS,
+    MAX_WORKERS,
+    build_folder_to_opening,
+    process_single_cv,
+)
+from scheduler import schedule_tasks
+from utils_cv import file_digest
+from openings_db_manager import DB_FILE
+
+logger = logging.getLogger(__name__)
+
+# ---------- CONFIGURAÇÃO ----------
+# Tempo (s) sem novos eventos e com tamanho estável para considerar o arquivo completo
+DEBOUNCE_SECONDS = 2.0
+# Intervalo (s) de verificação dos arquivos pendentes
+POLL_INTERVAL = 0.25
+
+
+# ---------- DEBOUNCE ----------
+class Debouncer:
+    """
+    Agrupa eventos repetidos de um mesmo arquivo e só libera o caminho
+    quando ele fica `delay` segundos sem eventos e com tamanho estável.
+    """
+
+    def __init__(self, callback, delay: float = DEBOUNCE_SECONDS):
+        self.callback = callback
+        self.delay = delay
+        self._pending: Dict[str, Tuple[float, int]] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="cv-debouncer", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def touch(self, path: str):
+        """Registra (ou renova) um evento para o caminho."""
+        with self._lock:
+            self._pending[path] = (time.monotonic() + self.delay, _file_size(path))
+
+    def discard(self, path: str):
+        with self._lock:
+            self._pending.pop(path, None)
+
+    def _run(self):
+        while not self._stop.wait(POLL_INTERVAL):
+            now = time.monotonic()
+            ready = []
+            with self._lock:
+                for path, (deadline, size) in list(self._pending.items()):
+                    if deadline > now:
+                        continue
+                    current_size = _file_size(path)
+                    if current_size < 0:
+                        # Arquivo removido antes de ficar pronto
+                        del self._pending[path]
+                    elif current_size != size:
+                        # Ainda está sendo escrito: reagenda
+                        self._pending[path] = (now + self.delay, current_size)
+                    else:
+                        del self._pending[path]
+                        ready.append(path)
+            for path in ready:
+                try:
+                    self.callback(path)
+                except Exception as e:
+                    logger.error(f"Erro ao enfileirar '{path}': {e}")
+
+
+def _file_size(path: str) -> int:
+    try:
+        return os.path.getsize(path)
+    except OSError:
+        return -1
+
+
+# ---------- EVENTOS DO SISTEMA DE ARQUIVOS ----------
+class CVEventHandler(FileSystemEventHandler):
+    """Encaminha criações/alterações de PDF/DOCX e mudanças no banco de vagas."""
+
+    def __init__(self, watcher: "CVWatcher"):
+        self.watcher = watcher
+
+    def on_created(self, event):
+        if not event.is_directory:
+            self.watcher.on_file_event(event.src_path)
+
+    def on_modified(self, event):
+        if not event.is_directory:
+            self.watcher.on_file_event(event.src_path)
+
+    def on_moved(self, event):
+        if not event.is_directory:
+            self.watcher.on_file_removed(event.src_path)
+            self.watcher.on_file_event(event.dest_path)
+
+    def on_deleted(self, event):
+        if not event.is_directory:
+            self.watcher.on_file_removed(event.src_path)
+
+
+# ---------- OBSERVADOR ----------
+class CVWatcher:
+    """
+    Mantém um pool de workers aquecido (cliente LLM, banco e mapa de vagas
+    já carregados) e enfileira cada CV novo ou alterado assim que ele chega.
+    """
+
+    def __init__(self, cv_base_dir: str = CV_BASE_DIR, max_workers: int = MAX_WORKERS):
+        # Aquece as instâncias compartilhadas antes do primeiro CV chegar
+        process_cvs.get_groq_client().client
+        process_cvs.get_database()
+        process_cvs.get_search_index()
+        process_cvs.get_analytics()
+        self.cv_base_dir = os.path.abspath(cv_base_dir)
+        self.openings_file = os.path.join(os.path.dirname(os.path.abspath(process_cvs.__file__)), DB_FILE)
+        self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="cv-worker")
+        self.debouncer = Debouncer(self._enqueue)
+        self.observer = Observer()
+        self._in_flight = set()
+        self._in_flight_lock = threading.Lock()
+        self.folder_to_opening: Dict[str, List[Dict[str, Any]]] = {}
+        self.reload_openings()
+
+    def reload_openings(self):
+        self.folder_to_opening = build_folder_to_opening()
+        logger.info(f"Mapa de vagas carregado: {len(self.folder_to_opening)} pastas monitoradas.")
+
+    def _openings_for(self, path: str) -> List[Dict[str, Any]]:
+        """Retorna as vagas de `banco-de-talentos/<pasta>/arquivo` (uma pasta pode ter várias)."""
+        rel = os.path.relpath(path, self.cv_base_dir)
+        parts = rel.split(os.sep)
+        if len(parts) != 2 or parts[0] == os.pardir:
+            return []
+        return self.folder_to_opening.get(parts[0], [])
+
+    def on_file_event(self, path: str):
+        if os.path.abspath(path) == self.openings_file:
+            self.reload_openings()
+            return
+        if path.lower().endswith(CV_EXTENSIONS) and self._openings_for(path):
+            self.debouncer.touch(path)
+
+    def on_file_removed(self, path: str):
+        self.debouncer.discard(path)
+
+    def _enqueue(self, cv_path: str):
+        for opening_data in self._openings_for(cv_path):
+            self._enqueue_for(cv_path, opening_data)
+
+    def _enqueue_for(self, cv_path: str, opening_data: Dict[str, Any]):
+        analysed_pairs = process_cvs.get_analysed_pairs()
+        force = False
+        if analysed_pairs.contains(cv_path, opening_data.get('id')):
+            analysed_digest = analysed_pairs.digest(cv_path, opening_data.get('id'))
+            # Análise antiga, sem digest: não há como saber se o CV mudou, então é mantida
+            # Nas demais, só reprocessa se o conteúdo do CV mudou desde a última análise
+            if analysed_digest is None or analysed_digest == file_digest(cv_path):
+                return
+            force = True
+
+        key = (cv_path, opening_data.get('id'))
+        with self._in_flight_lock:
+            if key in self._in_flight:
+                return
+            self._in_flight.add(key)
+
+        logger.info(f"CV detectado: {os.path.basename(cv_path)} -> vaga '{opening_data.get('title')}'. Enfileirando.")
+        future = self.executor.submit(process_single_cv, cv_path, opening_data, force)
+        future.add_done_callback(lambda f, k=key: self._on_done(k, f))
+
+    def _on_done(self, key, future: concurrent.futures.Future):
+        with self._in_flight_lock:
+            self._in_flight.discard(key)
+        try:
+            future.result()
+        except Exception as e:
+            logger.error(f"Uma das tarefas de processamento falhou: {e}")
+        # Torna a nova análise visível no snapshot colunar sem esperar o fim da execução
+        process_cvs.get_analytics().flush()
+
+    def catch_up(self):
+        """
+        Enfileira os CVs que já estavam na pasta antes do início da observação,
+        intercalando as vagas (divisão justa, CV mais novo primeiro).
+        """
+        tasks = []
+        for folder_name, openings in self.folder_to_opening.items():
+            folder_path = os.path.join(self.cv_base_dir, folder_name)
+            if not os.path.isdir(folder_path):
+                continue
+            for f in os.listdir(folder_path):
+                if f.lower().endswith(CV_EXTENSIONS):
+                    tasks.extend((os.path.join(folder_path, f), opening_data) for opening_data in openings)
+        for cv_path, opening_data in schedule_tasks(tasks):
+            self._enqueue_for(cv_path, opening_data)
+
+    def start(self, catch_up: bool = False):
+        os.makedirs(self.cv_base_dir, exist_ok=True)
+        handler = CVEventHandler(self)
+        self.observer.schedule(handler, self.cv_base_dir, recursive=True)
+        self.observer.schedule(handler, os.path.dirname(self.openings_file), recursive=False)
+        self.debouncer.start()
+        self.observer.start()
+        if catch_up:
+            self.catch_up()
+        logger.info(f"## Observando '{self.cv_base_dir}' por novos currículos. ##")
+
+    def stop(self):
+        self.observer.stop()
+        self.observer.join()
+        self.debouncer.stop()
+        self.executor.shutdown(wait=True)
+        logger.info("## Observação encerrada. ##")
+
+
+def run_watch(catch_up: bool = False):
+    """Executa o modo de observação até receber Ctrl+C."""
+    watcher = CVWatcher()
+    watcher.start(catch_up=catch_up)
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        watcher.stop()
+
+
+if __name__ == "__main__":
+    run_watch()
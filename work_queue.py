@@ -0,0 +1,243 @@
+import os
+import time
+import sqlite3
+import socket
+import logging
+from contextlib import contextmanager
+from typing import Optional, Dict, Any
+
+logger = logging.getLogger(__name__)
+
+# ---------- CONFIGURAÇÃO ----------
+QUEUE_FILE = "work_queue.db"
+LEASE_SECONDS = 900
+MAX_ATTEMPTS = 3
+
+# Estados de uma tarefa
+PENDING = "pending"
+LEASED = "leased"
+DONE = "done"
+DEAD = "dead"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    cv_digest     TEXT NOT NULL,
+    opening_id    TEXT NOT NULL,
+    cv_path       TEXT NOT NULL,
+    status        TEXT NOT NULL DEFAULT 'pending',
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    lease_owner   TEXT,
+    lease_expires REAL,
+    last_error    TEXT,
+    created_at    REAL NOT NULL,
+    updated_at    REAL NOT NULL,
+    rank          REAL NOT NULL DEFAULT 0,
+    PRIMARY KEY (cv_digest, opening_id)
+);
+CREATE INDEX IF NOT EXISTS idx_jobs_status ON jobs (status, lease_expires);
+CREATE TABLE IF NOT EXISTS opening_clock (
+    opening_id    TEXT PRIMARY KEY,
+    vtime         REAL NOT NULL
+);
+"""
+
+
+def default_worker_id() -> str:
+    """Identificador único do worker: host + pid."""
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+class WorkQueue:
+    """
+    Fila persistente de tarefas (digest do CV, id da vaga) em SQLite.
+
+    Vários processos (ou containers que compartilham o volume) podem
+    consumir a mesma fila: cada tarefa é entregue com um lease que expira,
+    é confirmada com `ack` e, após `max_attempts` falhas, vai para o estado
+    'dead' (dead-letter).
+    """
+
+    def __init__(self, db_path: str = QUEUE_FILE, lease_seconds: float = LEASE_SECONDS, max_attempts: int = MAX_ATTEMPTS):
+        self.db_path = db_path
+        self.lease_seconds = lease_seconds
+        self.max_attempts = max_attempts
+        with self._connect() as conn:
+            conn.executescript(_SCHEMA)
+            columns = {row["name"] for row in conn.execute("PRAGMA table_info(jobs)")}
+            if "rank" not in columns:
+                # Filas criadas antes da divisão justa entre vagas
+                conn.execute("ALTER TABLE jobs ADD COLUMN rank REAL NOT NULL DEFAULT 0")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_rank ON jobs (status, rank)")
+
+    @contextmanager
+    def _connect(self):
+        # Uma conexão por operação: seguro entre threads e processos
+        conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+
+    # ---------- PRODUÇÃO ----------
+    def enqueue(self, cv_digest: str, opening_id, cv_path: str, weight: float = 1.0) -> bool:
+        """
+        Adiciona a tarefa se ela ainda não existir. Retorna True se foi criada.
+
+        A ordem de consumo é a de divisão justa ponderada entre as vagas
+        (weighted fair queuing): cada tarefa recebe `rank` = relógio virtual
+        da vaga + 1/peso, e o relógio de uma vaga que estava ociosa parte do
+        menor rank ainda pendente. Assim uma vaga com milhares de CVs não
+        impede que as demais sejam atendidas.
+        """
+        now = time.time()
+        opening_id = str(opening_id)
+        with self._transaction() as conn:
+            exists = conn.execute(
+                "SELECT 1 FROM jobs WHERE cv_digest = ? AND opening_id = ?", (cv_digest, opening_id)
+            ).fetchone()
+            if exists:
+                return False
+            rank = self._virtual_start(conn, opening_id) + 1.0 / max(weight, 0.01)
+            conn.execute(
+                "INSERT INTO jobs (cv_digest, opening_id, cv_path, status, created_at, updated_at, rank) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (cv_digest, opening_id, cv_path, PENDING, now, now, rank)
+            )
+            conn.execute(
+                "INSERT INTO opening_clock (opening_id, vtime) VALUES (?, ?) "
+                "ON CONFLICT (opening_id) DO UPDATE SET vtime = excluded.vtime",
+                (opening_id, rank)
+            )
+            return True
+
+    def _virtual_start(self, conn, opening_id: str) -> float:
+        """max(relógio da vaga, tempo virtual atual da fila)."""
+        row = conn.execute(
+            "SELECT (SELECT MIN(rank) FROM jobs WHERE status IN (?, ?)) AS now_pending, "
+            "(SELECT MAX(vtime) FROM opening_clock) AS max_clock, "
+            "(SELECT vtime FROM opening_clock WHERE opening_id = ?) AS clock",
+            (PENDING, LEASED, opening_id)
+        ).fetchone()
+        virtual_now = row["now_pending"] if row["now_pending"] is not None else (row["max_clock"] or 0.0)
+        return max(row["clock"] or 0.0, virtual_now)
+
+    def reweight(self, opening_id, weight: float) -> int:
+        """
+        Redistribui as tarefas pendentes de uma vaga com um novo peso
+        (ex.: boost de uma vaga urgente), mantendo a ordem entre elas.
+        """
+        opening_id = str(opening_id)
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT cv_digest FROM jobs WHERE opening_id = ? AND status = ? ORDER BY rank, created_at",
+                (opening_id, PENDING)
+            ).fetchall()
+            if not rows:
+                return 0
+            start = conn.execute(
+                "SELECT MIN(rank) AS r FROM jobs WHERE status IN (?, ?) AND opening_id <> ?",
+                (PENDING, LEASED, opening_id)
+            ).fetchone()["r"] or 0.0
+            step = 1.0 / max(weight, 0.01)
+            conn.executemany(
+                "UPDATE jobs SET rank = ? WHERE cv_digest = ? AND opening_id = ?",
+                [(start + (i + 1) * step, row["cv_digest"], opening_id) for i, row in enumerate(rows)]
+            )
+            conn.execute(
+                "INSERT INTO opening_clock (opening_id, vtime) VALUES (?, ?) "
+                "ON CONFLICT (opening_id) DO UPDATE SET vtime = excluded.vtime",
+                (opening_id, start + len(rows) * step)
+            )
+            return len(rows)
+
+    # ---------- CONSUMO ----------
+    def lease(self, worker_id: str) -> Optional[Dict[str, Any]]:
+        """
+        Reserva a próxima tarefa disponível (pendente ou com lease expirado).
+        Tarefas expiradas que já atingiram `max_attempts` vão para 'dead'.
+        """
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, last_error = COALESCE(last_error, 'lease expirado'), updated_at = ? "
+                "WHERE status = ? AND lease_expires < ? AND attempts >= ?",
+                (DEAD, now, LEASED, now, self.max_attempts)
+            )
+            row = conn.execute(
+                "SELECT * FROM jobs WHERE status = ? OR (status = ? AND lease_expires < ?) "
+                "ORDER BY rank, created_at LIMIT 1",
+                (PENDING, LEASED, now)
+            ).fetchone()
+            if row is None:
+                return None
+            conn.execute(
+                "UPDATE jobs SET status = ?, attempts = attempts + 1, lease_owner = ?, lease_expires = ?, updated_at = ? "
+                "WHERE cv_digest = ? AND opening_id = ?",
+                (LEASED, worker_id, now + self.lease_seconds, now, row["cv_digest"], row["opening_id"])
+            )
+            job = dict(row)
+            job["attempts"] += 1
+            job["lease_owner"] = worker_id
+            return job
+
+    def extend_lease(self, job: Dict[str, Any], worker_id: str) -> bool:
+        """Renova o lease de uma tarefa em andamento (heartbeat)."""
+        return self._update_owned(
+            job, worker_id,
+            "status = ?, lease_expires = ?",
+            (LEASED, time.time() + self.lease_seconds)
+        )
+
+    def ack(self, job: Dict[str, Any], worker_id: str) -> bool:
+        """Confirma a conclusão da tarefa."""
+        return self._update_owned(job, worker_id, "status = ?, lease_owner = NULL, lease_expires = NULL, last_error = NULL", (DONE,))
+
+    def fail(self, job: Dict[str, Any], worker_id: str, error: str) -> bool:
+        """Devolve a tarefa à fila, ou a envia para 'dead' após `max_attempts`."""
+        status = DEAD if job["attempts"] >= self.max_attempts else PENDING
+        if status == DEAD:
+            logger.error(f"Tarefa {job['cv_path']} (vaga {job['opening_id']}) movida para dead-letter: {error}")
+        return self._update_owned(job, worker_id, "status = ?, lease_owner = NULL, lease_expires = NULL, last_error = ?", (status, error))
+
+    def release(self, job: Dict[str, Any], worker_id: str) -> bool:
+        """Devolve a tarefa à fila sem contar a tentativa (ex.: orçamento da execução esgotado)."""
+        return self._update_owned(job, worker_id, "status = ?, attempts = attempts - 1, lease_owner = NULL, lease_expires = NULL", (PENDING,))
+
+    def _update_owned(self, job: Dict[str, Any], worker_id: str, assignments: str, params: tuple) -> bool:
+        # Só o dono atual do lease pode alterar a tarefa
+        with self._transaction() as conn:
+            cur = conn.execute(
+                f"UPDATE jobs SET {assignments}, updated_at = ? "
+                "WHERE cv_digest = ? AND opening_id = ? AND status = ? AND lease_owner = ?",
+                (*params, time.time(), job["cv_digest"], job["opening_id"], LEASED, worker_id)
+            )
+            return cur.rowcount > 0
+
+    # ---------- ADMINISTRAÇÃO ----------
+    def requeue_dead(self) -> int:
+        """Devolve as tarefas em dead-letter à fila, zerando as tentativas."""
+        with self._transaction() as conn:
+            cur = conn.execute(
+                "UPDATE jobs SET status = ?, attempts = 0, last_error = NULL, updated_at = ? WHERE status = ?",
+                (PENDING, time.time(), DEAD)
+            )
+            return cur.rowcount
+
+    def stats(self) -> Dict[str, int]:
+        with self._connect() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) AS n FROM jobs GROUP BY status").fetchall()
+        counts = {PENDING: 0, LEASED: 0, DONE: 0, DEAD: 0}
+        counts.update({row["status"]: row["n"] for row in rows})
+        return counts